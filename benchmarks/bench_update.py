@@ -0,0 +1,278 @@
+# Benchmarks for the wsRP2040128.update() hot loop, the scheduler
+# tick() and the demo screens, run against the host stand-ins in host/.
+#
+#   python benchmarks/bench_update.py --iterations 500 --output bench.json
+#
+# The update loop runs for a fixed number of update() calls.  The other
+# loops run the scheduler at their normal pacing for a fixed time, so
+# each phase runs at its own rate; a pass there is one tick().  Every
+# benchmark reports per-phase timings and rates (IMU read, decode, gesture, battery, display),
+# heap churn per iteration, garbage collections and peak heap as JSON
+# so regressions show up as numbers.
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import host
+
+state = host.install()
+
+import circuit
+
+# The loops benchmarked, each is driven until it has made the
+# requested number of passes
+LOOPS = ('update', 'tick', 'demo', 'ball_demo', 'banner_demo', 'main_menu')
+
+# The methods timed for each phase, as (phase, object name, method)
+PHASES = (
+    ('imu_read', 'imu', 'read_sample'),
+    ('imu_read', 'imu', 'read_fifo'),
+    ('decode', 'imu', '_fixed'),
+    ('gesture', 'hardware', '_process_sample'),
+    ('battery', 'hardware', '_update_battery'),
+    ('display', 'hardware', '_show')
+)
+
+
+# Raised from update()/tick() once a loop has run long enough
+class _Done(Exception):
+    pass
+
+
+# Running timing statistics for one phase
+class PhaseStats(object):
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, elapsed):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+    def report(self, iterations, elapsed):
+        return {
+            'calls': self.count,
+            'calls_per_second': round(self.count / (elapsed / 1e9), 1),
+            'total_ms': round(self.total / 1e6, 3),
+            'mean_us': round(self.total / self.count / 1e3, 2) if self.count else 0.0,
+            'max_us': round(self.max / 1e3, 2),
+            'per_iteration_us': round(self.total / iterations / 1e3, 2) if iterations else 0.0
+        }
+
+
+# Simulated wrist motion: the board rocks left and right with some
+# up/down acceleration.  Rocking on one axis only never completes a
+# combo, so the demo loops aren't exited early.
+def motion(t):
+    rock = math.sin(t * 6.0)
+    return (0.3 * rock, 0.2 * math.cos(t * 4.0), -1.0, 150.0 * rock, 0.0, 0.0)
+
+
+# Build a fresh board on fresh simulated hardware
+# options: the parsed command line options
+# returns: the wsRP2040128 instance
+def make_hardware(options):
+    host.reset()
+    state.imu.motion = motion
+    state.imu.noise = 0.01
+    state.battery.noise = 0.01
+    hardware = circuit.wsRP2040128(
+        accelFifo=options.fifo,
+        accelInterrupt=options.interrupt,
+        accelProfile=options.profile)
+    hardware.calibrate()
+    return hardware
+
+
+# Wrap a method so every call is timed into a PhaseStats
+# returns: nothing
+def _time_method(obj, name, stats):
+    method = getattr(obj, name)
+
+    def timed(*args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            stats.add(time.perf_counter_ns() - start)
+    setattr(obj, name, timed)
+
+
+# The method counted as one pass of a loop.  The screens run the
+# scheduler, only the update loop calls update() directly.
+def _pass_method(loop):
+    return 'update' if loop == 'update' else 'tick'
+
+
+# Make the pass method stop the loop after a number of update() calls,
+# or after a number of seconds for the scheduled loops, and call hook
+# after every pass
+# returns: a dict with the iteration count and the first call time
+def _limit_passes(hardware, loop, options, hook=None):
+    name = _pass_method(loop)
+    method = getattr(hardware, name)
+    progress = {'iterations': 0, 'start': None}
+
+    def limited():
+        if progress['start'] is None:
+            progress['start'] = time.perf_counter_ns()
+        result = method()
+        progress['iterations'] += 1
+        if hook is not None:
+            hook()
+        if name == 'update':
+            if progress['iterations'] >= options.iterations:
+                raise _Done()
+        elif time.perf_counter_ns() - progress['start'] >= options.duration * 1e9:
+            raise _Done()
+        return result
+    setattr(hardware, name, limited)
+    return progress
+
+
+# Run a loop until it has made enough passes.  Anything
+# the loop prints is swallowed so it can't end up in the report.
+# returns: nothing
+def _run_loop(hardware, loop, options):
+    with contextlib.redirect_stdout(io.StringIO()):
+        _run_loop_quietly(hardware, loop, options.sleep)
+
+
+def _run_loop_quietly(hardware, loop, sleep_time):
+    try:
+        if loop == 'update':
+            while True:
+                hardware.update()
+        elif loop == 'tick':
+            while True:
+                hardware.run_for(sleep_time)
+        elif loop == 'banner_demo':
+            hardware.banner_demo('Easily Amused', sleep_time=sleep_time)
+        else:
+            getattr(hardware, loop)(sleep_time=sleep_time)
+    except _Done:
+        pass
+
+
+# Time one loop phase by phase
+# returns: the timing part of the report
+def time_loop(loop, options):
+    hardware = make_hardware(options)
+    stats = {}
+    for phase, owner, name in PHASES:
+        obj = hardware._qmi8658 if owner == 'imu' else hardware
+        if phase not in stats:
+            stats[phase] = PhaseStats()
+        _time_method(obj, name, stats[phase])
+    progress = _limit_passes(hardware, loop, options)
+    _run_loop(hardware, loop, options)
+    elapsed = time.perf_counter_ns() - progress['start']
+    iterations = progress['iterations']
+    return {
+        'iterations': iterations,
+        'total_ms': round(elapsed / 1e6, 3),
+        'per_iteration_us': round(elapsed / iterations / 1e3, 2),
+        'iterations_per_second': round(iterations / (elapsed / 1e9), 1),
+        'phases': dict((phase, stats[phase].report(iterations, elapsed)) for phase in stats)
+    }
+
+
+# Measure heap use of one loop.  Run separately from the timing pass
+# since tracing allocations slows everything down.
+# returns: the memory part of the report
+def measure_loop(loop, options):
+    hardware = make_hardware(options)
+    collections = [0]
+
+    def on_gc(phase, info):
+        if phase == 'start':
+            collections[0] += 1
+    churn = [0]
+    peak_heap = [0]
+
+    def after_update():
+        current, peak = tracemalloc.get_traced_memory()
+        # Bytes allocated above the heap level at the end of the pass
+        churn[0] += peak - current
+        peak_heap[0] = max(peak_heap[0], peak)
+        tracemalloc.reset_peak()
+    progress = _limit_passes(hardware, loop, options, after_update)
+    gc.collect()
+    tracemalloc.start()
+    start_current, _ = tracemalloc.get_traced_memory()
+    gc.callbacks.append(on_gc)
+    try:
+        _run_loop(hardware, loop, options)
+    finally:
+        gc.callbacks.remove(on_gc)
+        end_current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    iterations = progress['iterations']
+    return {
+        'transient_bytes_per_iteration': round(churn[0] / iterations, 1),
+        'retained_bytes': end_current - start_current,
+        'retained_bytes_per_iteration': round((end_current - start_current) / iterations, 1),
+        'gc_collections': collections[0],
+        'peak_heap_bytes': peak_heap[0] - start_current
+    }
+
+
+# Parse the command line
+# returns: the options
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the wsRP2040128 update loop on the host stand-ins')
+    parser.add_argument('--iterations', type=int, default=300, help='update() calls for the update loop')
+    parser.add_argument('--duration', type=float, default=1.0, help='seconds to run each scheduled loop for')
+    parser.add_argument('--sleep', type=float, default=0.05, help='sleep_time passed to the screens')
+    parser.add_argument('--loops', default=','.join(LOOPS), help='comma separated loops to run: ' + ', '.join(LOOPS))
+    parser.add_argument('--fifo', action='store_true', help='stream the IMU through its FIFO')
+    parser.add_argument('--interrupt', action='store_true', help='only read the IMU on data-ready')
+    parser.add_argument('--profile', default='motion', help='QMI8658 profile to run with')
+    parser.add_argument('--no-memory', action='store_true', help='skip the allocation pass')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    report = {
+        'python': sys.version.split()[0],
+        'iterations': options.iterations,
+        'duration': options.duration,
+        'sleep': options.sleep,
+        'fifo': options.fifo,
+        'interrupt': options.interrupt,
+        'profile': options.profile,
+        'loops': {}
+    }
+    for loop in options.loops.split(','):
+        if loop not in LOOPS:
+            raise SystemExit('unknown loop {!r}, expected one of {}'.format(loop, ', '.join(LOOPS)))
+        result = time_loop(loop, options)
+        if not options.no_memory:
+            result['memory'] = measure_loop(loop, options)
+        report['loops'][loop] = result
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
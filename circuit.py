@@ -6,11 +6,12 @@
 # existing ones didn't work with CircuitPython.  
 # @author: Jesse R. Castro
 # @TODO: Add menu class
-# @TODO: Record accelerometer data to a file for calibration
 
 import random
+import struct
 import time
-from math import floor
+from array import array
+from math import floor, sqrt
 
 import board
 import busio
@@ -19,60 +20,915 @@ import gc9a01
 import terminalio
 import analogio
 import digitalio
+import microcontroller
 import vectorio
 
+# Edge counting for the IMU interrupt lines isn't in every build,
+# fall back to reading the pin level without it.
+try:
+    import countio
+except ImportError:
+    countio = None
+
+# Light sleep isn't available everywhere either, without it we
+# fall back to polling with time.sleep().
+try:
+    import alarm
+except ImportError:
+    alarm = None
+
+# asyncio is a library on CircuitPython, without it only the
+# scheduler loop in run_for() is available.
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
 from adafruit_display_text import label
 from adafruit_bitmap_font import bitmap_font
 
+# Millisecond timestamps wrap at TICKS_PERIOD like MicroPython's
+# ticks_ms(), so they always fit an 'l' array and stay exact however
+# long the board has been running.  Compare them with ticks_diff().
+TICKS_PERIOD = 0x40000000
+TICKS_MASK = TICKS_PERIOD - 1
+
+# The current time in whole milliseconds, wrapped at TICKS_PERIOD
+# returns: the timestamp
+def ticks_ms():
+    return (time.monotonic_ns() // 1000000) & TICKS_MASK
+
+# The time between two ticks_ms() timestamps, less than half a
+# period apart
+# newer: the later timestamp
+# older: the earlier timestamp
+# returns: newer - older in milliseconds, negative if older is later
+def ticks_diff(newer, older):
+    diff = (newer - older) & TICKS_MASK
+    if diff >= TICKS_PERIOD // 2:
+        diff -= TICKS_PERIOD
+    return diff
+
+# A fixed-size history backed by an array and a head index.  Appends
+# overwrite the oldest entry in O(1) and never allocate, so it can
+# record every sample without churning the heap.
+class RingBuffer(object):
+    # Initialize the buffer, every entry starts at zero
+    # depth: the number of entries kept
+    # typecode: the array typecode of the values
+    # width: the number of values per entry
+    # timed: if True a ticks_ms() timestamp is kept with each entry
+    # returns: nothing
+    def __init__(self, depth, typecode='h', width=1, timed=False):
+        self.depth = depth
+        self.width = width
+        self._values = array(typecode, (0 for _ in range(depth * width)))
+        self._times = None
+        if timed:
+            self._times = array('l', (0 for _ in range(depth)))
+        # Index of the slot the next append writes to
+        self._head = 0
+        # Number of entries appended, up to depth
+        self.count = 0
+
+    # Number of valid entries
+    # returns: the entry count
+    def __len__(self):
+        return self.count
+
+    # Append a single value entry (width 1)
+    # value: the value to append
+    # t: the ticks_ms() timestamp of the entry, if the buffer is timed
+    # returns: nothing
+    def append(self, value, t=0):
+        head = self._head
+        self._values[head] = value
+        if self._times is not None:
+            self._times[head] = t
+        self._advance()
+
+    # Append an entry by copying width values out of another array
+    # values: the array to copy from
+    # t: the ticks_ms() timestamp of the entry, if the buffer is timed
+    # start: the index in values of the first value to copy
+    # returns: nothing
+    def append_from(self, values, t=0, start=0):
+        head = self._head
+        base = head * self.width
+        data = self._values
+        for i in range(self.width):
+            data[base + i] = values[start + i]
+        if self._times is not None:
+            self._times[head] = t
+        self._advance()
+
+    # Move the head on after an append
+    # returns: nothing
+    def _advance(self):
+        self._head += 1
+        if self._head == self.depth:
+            self._head = 0
+        if self.count < self.depth:
+            self.count += 1
+
+    # Slot index of an entry by age
+    # age: 0 for the newest entry, 1 for the one before, ...
+    # returns: the slot index
+    def _slot(self, age):
+        slot = self._head - 1 - age
+        if slot < 0:
+            slot += self.depth
+        return slot
+
+    # Get a value by age
+    # age: 0 for the newest entry, 1 for the one before, ...
+    # field: which of the entry's width values to get
+    # returns: the value
+    def get(self, age=0, field=0):
+        return self._values[self._slot(age) * self.width + field]
+
+    # Get the timestamp of an entry by age
+    # age: 0 for the newest entry, 1 for the one before, ...
+    # returns: the ticks_ms() timestamp, 0 if the buffer isn't timed
+    def time(self, age=0):
+        if self._times is None:
+            return 0
+        return self._times[self._slot(age)]
+
+    # Forget every entry
+    # returns: nothing
+    def clear(self):
+        self._head = 0
+        self.count = 0
+
+    # Overwrite every entry with the same value and timestamp
+    # value: the value to fill with
+    # t: the ticks_ms() timestamp to fill with
+    # returns: nothing
+    def fill(self, value=0, t=0):
+        for i in range(self.depth * self.width):
+            self._values[i] = value
+        if self._times is not None:
+            for i in range(self.depth):
+                self._times[i] = t
+        self.count = self.depth
+
+# Recognizes sequences of commands ("combos" such as twist left,
+# twist right, twist left).  Registered combos are compiled into a
+# single state machine (an Aho-Corasick automaton with a dense
+# transition table), so each command costs one table lookup no
+# matter how many combos are registered.  When a combo is the start
+# of a longer one it is held back until the longer one either fires
+# or can no longer happen, so the longest match wins.
+class GestureRecognizer(object):
+    # Initialize the recognizer
+    # symbols: the command names, a command's code is its index
+    # returns: nothing
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self._alphabet = len(symbols)
+        # (name, codes, window in ms, callback) for each combo
+        self._combos = []
+        self._build()
+
+    # Register a combo.  Registering an existing name replaces it.
+    # name: the name reported when the combo fires
+    # commands: the sequence of command names (or codes)
+    # window: the whole sequence must happen within this many seconds
+    # callback: called with the name when the combo fires
+    # returns: nothing
+    def register_combo(self, name, commands, window=2.0, callback=None):
+        codes = []
+        for command in commands:
+            if isinstance(command, str):
+                command = self.symbols.index(command)
+            codes.append(command)
+        self.unregister_combo(name, rebuild=False)
+        self._combos.append((name, tuple(codes), int(window * 1000), callback))
+        self._build()
+
+    # Remove a combo
+    # name: the name the combo was registered with
+    # rebuild: if False the state machine isn't recompiled
+    # returns: nothing
+    def unregister_combo(self, name, rebuild=True):
+        for i in range(len(self._combos)):
+            if self._combos[i][0] == name:
+                self._combos.pop(i)
+                break
+        if rebuild:
+            self._build()
+
+    # Compile the registered combos into the transition table
+    # returns: nothing
+    def _build(self):
+        alphabet = self._alphabet
+        # Build the trie.  Each node remembers its depth and how long
+        # (ms) the longest window of a combo running on past it is.
+        goto = [{}]
+        ends = [[]]
+        depth = [0]
+        hold = [0]
+        longest = 1
+        for i in range(len(self._combos)):
+            codes = self._combos[i][1]
+            window = self._combos[i][2]
+            longest = max(longest, len(codes))
+            node = 0
+            for code in codes:
+                if node:
+                    hold[node] = max(hold[node], window)
+                nxt = goto[node].get(code)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto.append({})
+                    ends.append([])
+                    depth.append(depth[node] + 1)
+                    hold.append(0)
+                    goto[node][code] = nxt
+                node = nxt
+            ends[node].append(i)
+        # Breadth first fill in the failure transitions so every
+        # state has a next state for every command
+        delta = array('H', (0 for _ in range(len(goto) * alphabet)))
+        fail = [0] * len(goto)
+        queue = []
+        for code in range(alphabet):
+            nxt = goto[0].get(code, 0)
+            delta[code] = nxt
+            if nxt:
+                queue.append(nxt)
+        i = 0
+        while i < len(queue):
+            node = queue[i]
+            i += 1
+            # Longest combos first, then the ones that are suffixes
+            ends[node] = ends[node] + ends[fail[node]]
+            for code in range(alphabet):
+                nxt = goto[node].get(code)
+                if nxt is None:
+                    delta[node * alphabet + code] = delta[fail[node] * alphabet + code]
+                else:
+                    delta[node * alphabet + code] = nxt
+                    fail[nxt] = delta[fail[node] * alphabet + code]
+                    queue.append(nxt)
+        self._delta = delta
+        self._matches = [tuple(e) for e in ends]
+        self._depth = array('B', depth)
+        self._hold = array('l', hold)
+        self._times = RingBuffer(longest, 'b', timed=True)
+        self.reset()
+
+    # Forget any partially entered combo
+    # returns: nothing
+    def reset(self):
+        self._state = 0
+        # The combo held back for a longer one (-1 for none), the
+        # number of its first command, when it fires anyway, and one
+        # that fired but hasn't been returned
+        self._count = 0
+        self._pending = -1
+        self._pending_start = 0
+        self._deadline = 0
+        self._ready = None
+
+    # Feed the next command into the state machine
+    # code: the command's index in symbols
+    # t: when the command happened, a ticks_ms() timestamp
+    # returns: the name of the combo that fired, or None
+    def advance(self, code, t):
+        self._times.append(code, t)
+        self._count += 1
+        fired = None
+        state = self._delta[self._state * self._alphabet + code]
+        if self._pending >= 0 and self._depth[state] <= self._depth[self._state]:
+            # Off the path to the longer combo, the held one fires and
+            # this command starts over
+            fired = self._fire(self._pending)
+            state = self._delta[code]
+        self._state = state
+        match = self._match(state, t)
+        start = 0
+        if match >= 0:
+            start = self._count - len(self._combos[match][1]) + 1
+            if self._pending >= 0 and start > self._pending_start:
+                # Overlaps the held combo without containing it
+                match = -1
+        if match >= 0 and self._hold[state]:
+            self._pending = match
+            self._pending_start = start
+            self._deadline = (self._times.time(self._depth[state] - 1) + self._hold[state]) & TICKS_MASK
+        elif match >= 0:
+            name = self._fire(match)
+            if fired is None:
+                fired = name
+            else:
+                self._ready = name
+        elif self._pending >= 0 and not self._hold[state]:
+            # The longer combo missed its window
+            fired = self._fire(self._pending)
+        return fired
+
+    # Fire a held combo once the longer one can't happen in time.
+    # Call it regularly, e.g. for every sample.
+    # t: the current ticks_ms() timestamp
+    # returns: the name of the combo that fired, or None
+    def expire(self, t):
+        if self._ready is not None:
+            name = self._ready
+            self._ready = None
+            return name
+        if self._pending >= 0 and ticks_diff(t, self._deadline) >= 0:
+            return self._fire(self._pending)
+        return None
+
+    # The longest combo ending in a state that was entered in time
+    # state: the state machine state
+    # t: the time of the latest command
+    # returns: the combo's index, -1 if none
+    def _match(self, state, t):
+        for i in self._matches[state]:
+            codes = self._combos[i][1]
+            if ticks_diff(t, self._times.time(len(codes) - 1)) < self._combos[i][2]:
+                return i
+        return -1
+
+    # Fire a combo and start over
+    # i: the combo's index
+    # returns: the combo's name
+    def _fire(self, i):
+        name, codes, window, callback = self._combos[i]
+        self._state = 0
+        self._pending = -1
+        if callback is not None:
+            callback(name)
+        return name
+
+# A reusable container for one input event, filled in by
+# EventQueue.poll() so reading events doesn't allocate.
+class InputEvent(object):
+    def __init__(self):
+        # EventQueue.TILT, COMMAND or GESTURE
+        self.kind = 0
+        # The TILT_STATES/TILT_COMMANDS index, for a gesture the
+        # command that completed it
+        self.code = 0
+        # The tilt state, command or combo name
+        self.name = ''
+        # When it happened, a ticks_ms() timestamp
+        self.time = 0
+
+# A bounded queue of input events with subscriber callbacks.  The
+# slots are preallocated and the oldest event is dropped when the
+# queue is full, so pushing from the sensor loop never allocates.
+class EventQueue(object):
+    # Event kinds, usable as a mask to filter on
+    TILT = 0x01
+    COMMAND = 0x02
+    GESTURE = 0x04
+    ALL = 0x07
+
+    # Initialize the queue
+    # depth: the number of events kept
+    # kinds: a mask of the kinds queued, subscribers are called for
+    #        every kind either way
+    # returns: nothing
+    def __init__(self, depth=16, kinds=0x07):
+        self.depth = depth
+        self.kinds = kinds
+        self._kinds = bytearray(depth)
+        self._codes = array('b', (0 for _ in range(depth)))
+        self._names = [''] * depth
+        self._times = array('l', (0 for _ in range(depth)))
+        # Index of the oldest event
+        self._tail = 0
+        self.count = 0
+        # Events dropped because nobody read them in time
+        self.dropped = 0
+        # (callback, kinds) for each subscriber
+        self._subscribers = []
+        # Filled in by poll(), and separately for the subscribers
+        self.event = InputEvent()
+        self._notify = InputEvent()
+
+    def __len__(self):
+        return self.count
+
+    # Add an event and call the subscribers interested in it
+    # kind: TILT, COMMAND or GESTURE
+    # code: the event's code
+    # name: the event's name
+    # t: when the event happened, a ticks_ms() timestamp
+    # returns: nothing
+    def push(self, kind, code, name, t):
+        if kind & self.kinds:
+            if self.count == self.depth:
+                self._tail = (self._tail + 1) % self.depth
+                self.count -= 1
+                self.dropped += 1
+            i = (self._tail + self.count) % self.depth
+            self._kinds[i] = kind
+            self._codes[i] = code
+            self._names[i] = name
+            self._times[i] = t
+            self.count += 1
+        if self._subscribers:
+            event = self._notify
+            for callback, kinds in self._subscribers:
+                if kinds & kind:
+                    event.kind = kind
+                    event.code = code
+                    event.name = name
+                    event.time = t
+                    callback(event)
+
+    # Take the oldest event.  Events of other kinds ahead of it are
+    # discarded.
+    # kinds: a mask of the kinds wanted
+    # event: the InputEvent to fill, defaults to a shared instance
+    # returns: the event, None if there isn't one
+    def poll(self, kinds=0x07, event=None):
+        while self.count:
+            i = self._tail
+            self._tail = (i + 1) % self.depth
+            self.count -= 1
+            if self._kinds[i] & kinds:
+                if event is None:
+                    event = self.event
+                event.kind = self._kinds[i]
+                event.code = self._codes[i]
+                event.name = self._names[i]
+                event.time = self._times[i]
+                return event
+        return None
+
+    # Drop every queued event
+    # returns: nothing
+    def clear(self):
+        self._tail = 0
+        self.count = 0
+
+    # Call a function for every new event of some kinds, as it is
+    # pushed.  The event passed in is reused, copy what you keep.
+    # callback: called with an InputEvent
+    # kinds: a mask of the kinds to be called for
+    # returns: nothing
+    def subscribe(self, callback, kinds=0x07):
+        self.unsubscribe(callback)
+        self._subscribers.append((callback, kinds))
+
+    # Stop calling a subscriber
+    # callback: the function passed to subscribe()
+    # returns: nothing
+    def unsubscribe(self, callback):
+        for i in range(len(self._subscribers)):
+            if self._subscribers[i][0] == callback:
+                self._subscribers.pop(i)
+                return
+
+# What a screen awaits between steps when it isn't running under
+# asyncio.  It hands itself back to the code driving the screen (see
+# wsRP2040128._run_screen), which runs the scheduler for the duration.
+class _Pause(object):
+    def __init__(self):
+        self.duration = 0.0
+
+    def __iter__(self):
+        yield self
+
+    __await__ = __iter__
+
+# A cooperative scheduler for periodic tasks.  Every task has its own
+# period; run_due() runs only the tasks whose deadline has passed and
+# reports when the next one is due, so the caller can sleep until then
+# instead of doing every job on every pass.
+class Scheduler(object):
+    def __init__(self):
+        self._names = []
+        self._callbacks = []
+        self._periods = []
+        self._deadlines = []
+
+    def __len__(self):
+        return len(self._names)
+
+    # Add a task, replacing any task with the same name.  The task is
+    # due straight away.
+    # name: the name of the task
+    # period: seconds between runs
+    # callback: called with no arguments when the task is due.  It
+    #           can return when it next wants to run (a
+    #           time.monotonic() time), or None to wait for the period.
+    # returns: nothing
+    def add(self, name, period, callback):
+        if period <= 0:
+            raise Exception("Task period must be positive")
+        if name in self._names:
+            self.remove(name)
+        self._names.append(name)
+        self._callbacks.append(callback)
+        self._periods.append(period)
+        self._deadlines.append(time.monotonic())
+
+    # Remove a task
+    # name: the name of the task
+    # returns: nothing
+    def remove(self, name):
+        i = self._names.index(name)
+        del self._names[i]
+        del self._callbacks[i]
+        del self._periods[i]
+        del self._deadlines[i]
+
+    # Change how often a task runs, the next run is rescheduled
+    # name: the name of the task
+    # period: seconds between runs
+    # returns: nothing
+    def set_period(self, name, period):
+        if period <= 0:
+            raise Exception("Task period must be positive")
+        i = self._names.index(name)
+        self._deadlines[i] += period - self._periods[i]
+        self._periods[i] = period
+
+    # Get how often a task runs
+    # name: the name of the task
+    # returns: the period in seconds
+    def period(self, name):
+        return self._periods[self._names.index(name)]
+
+    # Get every task
+    # returns: a list of (name, period, callback) tuples
+    def tasks(self):
+        return [(self._names[i], self._periods[i], self._callbacks[i]) for i in range(len(self._names))]
+
+    # Run every task that is due, in the order they were added.  A
+    # task that fell more than a period behind is rescheduled from
+    # now rather than run repeatedly to catch up.
+    # now: the current time, defaults to time.monotonic()
+    # returns: when the next task is due, None if there are no tasks
+    def run_due(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        deadlines = self._deadlines
+        next_due = None
+        for i in range(len(deadlines)):
+            if now >= deadlines[i]:
+                deadline = self._callbacks[i]()
+                if deadline is None:
+                    deadline = deadlines[i] + self._periods[i]
+                    if deadline <= now:
+                        deadline = now + self._periods[i]
+                deadlines[i] = deadline
+            if next_due is None or deadlines[i] < next_due:
+                next_due = deadlines[i]
+        return next_due
+
+# Running timings for one stage of the update loop, in nanoseconds
+# from time.monotonic_ns().  Only the count, total, min and max are
+# kept so adding a timing never allocates a list.
+class StageTimer(object):
+    def __init__(self):
+        self.reset()
+
+    # Forget every timing
+    # returns: nothing
+    def reset(self):
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    # Record one timing
+    # elapsed: the time the stage took in nanoseconds
+    # returns: nothing
+    def add(self, elapsed):
+        if self.count == 0 or elapsed < self.min:
+            self.min = elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        self.count += 1
+        self.total += elapsed
+
+    # The average timing
+    # returns: the average in nanoseconds, 0 before any timings
+    @property
+    def average(self):
+        if self.count == 0:
+            return 0
+        return self.total // self.count
+
+    # Summarize the timings
+    # returns: a dict with the count, the total in ms and the
+    #          average, min and max in us
+    def report(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total // 1000000,
+            'avg_us': self.average // 1000,
+            'min_us': self.min // 1000,
+            'max_us': self.max // 1000
+        }
+
+# Least-squares slope over a sliding window of timestamped readings.
+# Running sums are updated as readings enter and leave the window, so
+# adding a reading and getting the slope are O(1) however long the
+# window is.  Times are integer milliseconds and the sums are exact
+# integers, so taking old readings out never accumulates error.
+class TrendTracker(object):
+    # Initialize the tracker
+    # depth: the number of readings in the window
+    # returns: nothing
+    def __init__(self, depth=32):
+        if depth < 2:
+            raise Exception("depth must be at least 2")
+        # Time (ms since _base) and value of each reading
+        self._history = RingBuffer(depth, 'l', 2)
+        self._entry = array('l', (0, 0))
+        self.reset()
+
+    def __len__(self):
+        return self._history.count
+
+    # Forget every reading
+    # returns: nothing
+    def reset(self):
+        self._history.clear()
+        self._base = None
+        self._st = 0
+        self._sv = 0
+        self._stt = 0
+        self._stv = 0
+        self._svv = 0
+
+    # Add a reading, dropping the oldest once the window is full
+    # t: the time of the reading in milliseconds
+    # value: the reading, an integer
+    # returns: nothing
+    def add(self, t, value):
+        if self._base is None:
+            self._base = t
+        t -= self._base
+        # Keep the stored times small enough for the array
+        if t > 0x3FFFFFFF:
+            t -= self._rebase()
+        history = self._history
+        if history.count == history.depth:
+            old_t = history.get(history.depth - 1, 0)
+            old_v = history.get(history.depth - 1, 1)
+            self._st -= old_t
+            self._sv -= old_v
+            self._stt -= old_t * old_t
+            self._stv -= old_t * old_v
+            self._svv -= old_v * old_v
+        self._entry[0] = t
+        self._entry[1] = value
+        history.append_from(self._entry)
+        self._st += t
+        self._sv += value
+        self._stt += t * t
+        self._stv += t * value
+        self._svv += value * value
+
+    # Move the time base up to the oldest reading and redo the sums
+    # returns: how far the base moved in milliseconds
+    def _rebase(self):
+        history = self._history
+        shift = history.get(history.count - 1, 0)
+        self._base += shift
+        self._st = 0
+        self._stt = 0
+        self._stv = 0
+        data = history._values
+        for i in range(history.count):
+            slot = history._slot(i) * 2
+            data[slot] -= shift
+            t = data[slot]
+            self._st += t
+            self._stt += t * t
+            self._stv += t * data[slot + 1]
+        return shift
+
+    # The time covered by the window
+    # returns: milliseconds between the oldest and newest readings
+    @property
+    def span(self):
+        history = self._history
+        if history.count < 2:
+            return 0
+        return history.get(0, 0) - history.get(history.count - 1, 0)
+
+    # The least-squares slope of the readings
+    # returns: the change in value per millisecond, 0.0 with fewer
+    #          than two readings
+    @property
+    def slope(self):
+        n = self._history.count
+        if n < 2:
+            return 0.0
+        denominator = n * self._stt - self._st * self._st
+        if denominator == 0:
+            return 0.0
+        return (n * self._stv - self._st * self._sv) / denominator
+
+    # The standard error of the slope, from how far the readings
+    # scatter about the fitted line.  A slope within a few standard
+    # errors of zero could just be noise.
+    # returns: the standard error in value per millisecond, 0.0 with
+    #          fewer than three readings
+    @property
+    def stderr(self):
+        n = self._history.count
+        if n < 3:
+            return 0.0
+        # Each of these is n times the centred sum
+        stt = n * self._stt - self._st * self._st
+        if stt == 0:
+            return 0.0
+        stv = n * self._stv - self._st * self._sv
+        svv = n * self._svv - self._sv * self._sv
+        residual = (svv - stv * stv / stt) / n
+        if residual <= 0:
+            return 0.0
+        return sqrt(residual / (n - 2) / (stt / n))
+
 # A generic class to describe battery status, should 
 # work with any battery that has a voltage between 3.2V
 # and 4.3V
 class Battery(object):
+    # Resting voltage (mV per cell) to state of charge (%) breakpoints
+    # of a typical LiPo discharge curve, in ascending order
+    LIPO_CURVE = (
+        (3270, 0), (3610, 5), (3690, 10), (3710, 15), (3730, 20),
+        (3750, 25), (3770, 30), (3790, 35), (3800, 40), (3820, 45),
+        (3840, 50), (3850, 55), (3870, 60), (3910, 65), (3950, 70),
+        (3980, 75), (4020, 80), (4080, 85), (4110, 90), (4150, 95),
+        (4200, 100)
+    )
+
     # Initialize the battery
+    # pin: the ADC pin the battery divider is on
+    # ttl: how long a reading is served from the cache, in seconds
+    # samples: how many ADC reads are combined into one reading
+    # median: if True the median of the reads is used instead of the
+    #         mean, which ignores the odd spike from the backlight or
+    #         radio
+    # cells: the number of cells in series
+    # curve: (mV per cell, percent) breakpoints in ascending order,
+    #        defaults to LIPO_CURVE
+    # resistance: the internal resistance of a cell in milliohms, used
+    #             with load_current to estimate the resting voltage
+    # history: how many readings the voltage trend is fitted over
+    # threshold: how fast (mV per minute) the voltage has to move to
+    #            count as charging or discharging
+    # min_span: how long (seconds) the readings have to cover before
+    #           the trend is trusted
+    # confidence: how many standard errors the trend has to be from
+    #             zero before it is trusted, so ADC noise isn't taken
+    #             for charging
     # returns: nothing
-    def __init__(self, pin=board.BAT_ADC):
+    def __init__(self, pin=board.BAT_ADC, ttl=1.0, samples=16, median=False, cells=1, curve=None, resistance=0, history=32, threshold=2.0, min_span=60.0, confidence=4.0):
         self._pin = analogio.AnalogIn(pin)
-        self._max_voltage = 4.14
-        self._min_voltage = 3.4
-        self._max_diff = self._max_voltage - self._min_voltage
-        self._diff = 0.0
+        if samples < 1:
+            raise Exception("samples must be at least 1")
+        if curve is None:
+            curve = self.LIPO_CURVE
+        if len(curve) < 2:
+            raise Exception("curve needs at least 2 breakpoints")
+        for i in range(1, len(curve)):
+            if curve[i][0] <= curve[i - 1][0]:
+                raise Exception("curve voltages must be ascending")
+        self._curve_mv = array('H', [point[0] for point in curve])
+        self._curve_percent = array('B', [point[1] for point in curve])
+        self.cells = cells
+        self.resistance = resistance
+        # The current being drawn in mA, set it when the load changes
+        # (e.g. the backlight turning on) if resistance is set
+        self.load_current = 0
+        self._trend = TrendTracker(history)
+        self.min_span = min_span
+        self.confidence = confidence
+        self.threshold = threshold
+        self.ttl = ttl
+        self.median = median
+        self._samples = array('H', (0 for _ in range(samples)))
+        # When the cached reading expires, 0 forces a reading
+        self._expires = 0.0
+        self._max_voltage = 4.14 * cells
+        self._min_voltage = 3.4 * cells
+        self._millivolts = 0
+        self._cell_millivolts = 0
         self._voltage = 0.0
-        self._percent = 0.0
+        self._percent = 0
         self._charging = False
         self._discharging = False
         self._full = False
         self._empty = False
         self._update()
 
-    # Update the battery status
+    # Read the ADC several times and combine the reads
+    # returns: the combined 16-bit ADC value
+    def _oversample(self):
+        samples = self._samples
+        n = len(samples)
+        pin = self._pin
+        for i in range(n):
+            samples[i] = pin.value
+        if not self.median:
+            total = 0
+            for i in range(n):
+                total += samples[i]
+            return total // n
+        # Insertion sort in place, there are only a few samples
+        for i in range(1, n):
+            value = samples[i]
+            j = i - 1
+            while j >= 0 and samples[j] > value:
+                samples[j + 1] = samples[j]
+                j -= 1
+            samples[j + 1] = value
+        return samples[n // 2]
+
+    # Update the battery status if the cached reading has expired
+    # force: if True take a new reading regardless
     # returns: nothing
-    def _update(self):
-        # Read the battery voltage
-        self._voltage = self._pin.value * 3.3 / 65535 * 2
-        self._diff = self._max_voltage - self._voltage
+    def _update(self, force=False):
+        now = time.monotonic()
+        if not force and now < self._expires:
+            return
+        self._expires = now + self.ttl
+        # Read the battery voltage, the pin sees half of it through a
+        # 3.3V referenced ADC
+        self._millivolts = self._oversample() * 6600 // 65535
+        self._voltage = self._millivolts * 0.001
         # Convert the voltage to a percentage
-        if self._voltage > self._max_voltage:
-            self._percent = 100.0
-        elif self._voltage < self._min_voltage:
-            self._percent = 0.0
-        else:
-            self._percent = (self._diff / self._max_diff) * 100.0 
-        # Determine the charging status
-        if self._voltage > 4.14:
-            self._charging = True
-            self._discharging = False
-            self._full = True
-            self._empty = False
-        elif self._voltage < 3.4:
-            self._charging = False
-            self._discharging = False
-            self._full = False
-            self._empty = True
-        else:
-            self._charging = False
-            self._discharging = True
-            self._full = False
-            self._empty = False
+        self._cell_millivolts = self._millivolts // self.cells + self.load_current * self.resistance // 1000
+        self._percent = self._state_of_charge(self._cell_millivolts)
+        self._trend.add(time.monotonic_ns() // 1000000, self._millivolts)
+        # Determine the charging status from the trend alone, a
+        # freshly unplugged cell still rests above _max_voltage.  The
+        # voltage only tells us it's full (or empty).  A full cell
+        # holding steady is sitting on the charger, neither charging
+        # nor discharging.
+        trend = self._fitted_trend()
+        self._full = self._voltage > self._max_voltage
+        self._empty = self._voltage < self._min_voltage
+        self._charging = trend > self.threshold
+        self._discharging = not self._charging and not self._empty and not (self._full and trend > -self.threshold)
+
+    # The voltage trend once it can be told apart from noise.  A short
+    # window or one whose readings scatter widely can fit a steep line
+    # to a steady voltage, so the trend only counts once the readings
+    # cover min_span and the slope is confidence standard errors from
+    # zero.
+    # returns: the change in mV per minute, 0.0 until it's trusted
+    def _fitted_trend(self):
+        tracker = self._trend
+        if len(tracker) < 4 or tracker.span < self.min_span * 1000:
+            return 0.0
+        slope = tracker.slope
+        if abs(slope) <= self.confidence * tracker.stderr:
+            return 0.0
+        return slope * 60000
+
+    # Look a cell voltage up on the discharge curve
+    # millivolts: the resting cell voltage in mV
+    # returns: the state of charge in percent (an integer)
+    def _state_of_charge(self, millivolts):
+        mv = self._curve_mv
+        percent = self._curve_percent
+        hi = len(mv) - 1
+        if millivolts <= mv[0]:
+            return percent[0]
+        if millivolts >= mv[hi]:
+            return percent[hi]
+        # Binary search for the breakpoints either side, then
+        # interpolate between them
+        lo = 0
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if mv[mid] <= millivolts:
+                lo = mid
+            else:
+                hi = mid
+        return percent[lo] + (millivolts - mv[lo]) * (percent[hi] - percent[lo]) // (mv[hi] - mv[lo])
+
+    # The percent lost per minute at the current voltage, from the
+    # slope of the curve segment the cell is on
+    # trend: the voltage trend in mV per minute
+    # returns: the change in percent per minute
+    def _percent_trend(self, trend):
+        mv = self._curve_mv
+        percent = self._curve_percent
+        hi = 1
+        while hi < len(mv) - 1 and mv[hi] < self._cell_millivolts:
+            hi += 1
+        return trend / self.cells * (percent[hi] - percent[hi - 1]) / (mv[hi] - mv[hi - 1])
+
+    # Take a new reading now instead of waiting for the cache to expire
+    # returns: nothing
+    def refresh(self):
+        self._update(True)
 
     # Get the battery voltage
     # returns: the battery voltage
@@ -81,8 +937,15 @@ class Battery(object):
         self._update()
         return self._voltage
 
+    # Get the battery voltage in millivolts
+    # returns: the battery voltage as an integer
+    @property
+    def millivolts(self):
+        self._update()
+        return self._millivolts
+
     # Get the battery percentage
-    # returns: the battery percentage
+    # returns: the battery percentage (0-100, an integer)
     @property
     def percent(self):
         self._update()
@@ -102,22 +965,150 @@ class Battery(object):
         self._update()
         return self._discharging
 
+    # Get whether the battery is full
+    # returns: True if the voltage is above the full threshold
+    @property
+    def full(self):
+        self._update()
+        return self._full
+
+    # Get how fast the battery voltage is changing, fitted over the
+    # last readings
+    # returns: the change in mV per minute, positive when charging,
+    #          0.0 until the trend stands out from the noise
+    @property
+    def trend(self):
+        self._update()
+        return self._fitted_trend()
+
+    # Estimate how long the battery will last at the current rate
+    # returns: the minutes left (an integer), None if the battery
+    #          isn't discharging or there aren't enough readings yet
+    @property
+    def minutes_remaining(self):
+        self._update()
+        trend = self._fitted_trend()
+        if trend > -self.threshold:
+            return None
+        rate = self._percent_trend(trend)
+        if rate >= 0:
+            return None
+        return int(self._percent / -rate)
+
+# A reusable container for a single QMI8658 reading.  The driver
+# fills the same instance on every read so that sampling does not
+# allocate anything per pass.
+class QMI8658_Sample(object):
+    # Initialize an empty sample
+    # returns: nothing
+    def __init__(self):
+        # Chip sample counter (24 bits, increments once per ODR tick)
+        self.timestamp = 0
+        # Die temperature in degrees C
+        self.temperature = 0.0
+        # Raw accelerometer x, y, z followed by gyroscope x, y, z
+        self.raw = array('h', (0, 0, 0, 0, 0, 0))
+
+# A reusable container for a batch of samples drained from the
+# QMI8658 FIFO.  Arrays are sized once for the FIFO depth and
+# refilled on every drain.
+class QMI8658_Batch(object):
+    # Initialize an empty batch
+    # size: the maximum number of samples the batch can hold
+    # returns: nothing
+    def __init__(self, size):
+        self.size = size
+        # Number of valid samples in this batch
+        self.count = 0
+        # Chip sample counter of each sample
+        self.timestamps = array('L', (0 for _ in range(size)))
+        # Raw accelerometer x, y, z and gyroscope x, y, z for each
+        # sample, 6 values per sample
+        self.raw = array('h', (0 for _ in range(size * 6)))
+
 # A class to interface with a Microchip QMI8658 6-axis IMU
 # https://www.microchip.com/wwwproducts/en/QMI8658
 # Working code already exists in micropython, this is an 
 # adaptation of that code for use with CircuitPython (see
 # micro.py for the original code)
 class QMI8658_Accelerometer(object):
+    # Accelerometer full scale in g, the index is the CTRL2 range field
+    ACC_RANGES = (2, 4, 8, 16)
+    # Gyroscope full scale in dps, the index is the CTRL3 range field
+    GYRO_RANGES = (16, 32, 64, 128, 256, 512, 1024, 2048)
+    # Output data rates in Hz and their CTRL2/CTRL3 ODR field.  With
+    # both sensors enabled the accelerometer runs at the gyro's rate.
+    ODRS = {
+        8000: 0x00,
+        4000: 0x01,
+        2000: 0x02,
+        1000: 0x03,
+        500: 0x04,
+        250: 0x05,
+        125: 0x06,
+        62.5: 0x07,
+        31.25: 0x08
+    }
+    # Resting offsets in raw counts (accel x, y, z, gyro x, y, z) at
+    # 8g/512dps, measured by hand on the original dev board.  Used
+    # until calibrate() has stored offsets for this board in NVM.
+    DEFAULT_BIAS = (-164, -41, -4547, 357, -2915, 13)
+    # Where calibrate() keeps its offsets in microcontroller.nvm:
+    # magic, version, accel range field, gyro range field, 6 offsets
+    NVM_FORMAT = '<2sBBB6h'
+    NVM_MAGIC = b'QC'
+    # Named presets for configure():
+    # (acc_range, acc_odr, gyro_range, gyro_odr, lpf)
+    PROFILES = {
+        'low-power': (8, 31.25, 512, 31.25, 0),
+        'ui': (8, 125, 512, 125, 0),
+        'motion': (8, 1000, 512, 1000, 0)
+    }
+
     # Initialize the hardware
     # address: the I2C address of the device
+    # profile: the name of the PROFILES entry to start with
     # returns: nothing
-    def __init__(self,address=0X6B, scl=board.GP7, sda=board.GP6):
+    def __init__(self,address=0X6B, scl=board.GP7, sda=board.GP6, profile='motion'):
         self._address = address
         self._bus = busio.I2C(scl,sda)
+        # Preallocated buffers so the hot path doesn't touch the heap.
+        # The burst buffer spans TIMESTAMP_L (0x30) through GZ_H (0x40):
+        # timestamp, temperature, accelerometer and gyroscope in a
+        # single bus transaction.
+        self._reg = bytearray(1)
+        self._wbuf = bytearray(2)
+        self._burst = bytearray(17)
+        self._ctrl1 = 0x60
+        self._ctrl7 = 0x03
+        self._int_pin = None
+        self._int_counter = None
+        self.interrupt_pin = None
+        self.low_power = False
+        self._resume_pin = None
+        self._fifo_status = bytearray(2)
+        # How many times a transaction had to spin waiting for the bus
+        self.lock_spins = 0
+        self._fifo_ctrl = 0x00
+        self._fifo_buf = None
+        self.batch = None
+        self.sample = QMI8658_Sample()
+        self._xyz = array('f', (0.0, 0.0, 0.0, 0.0, 0.0, 0.0))
+        # Offsets subtracted from raw counts at the current ranges, and
+        # the offsets as they were measured (with their ranges)
+        self._bias = array('i', (0, 0, 0, 0, 0, 0))
+        self._ixyz = array('i', (0, 0, 0, 0, 0, 0))
+        self.fixed_units()
+        self._cal = array('h', self.DEFAULT_BIAS)
+        self._cal_acc_range = 8
+        self._cal_gyro_range = 512
+        self.calibrated = self.load_calibration()
         if self.who_am_i():
             self.rev = self.read_revision()
         else:
             raise Exception("QMI8658 not found")
+        self.configure(*self.PROFILES[profile], write=False)
+        self.profile = profile
         self.config_apply()
     
     # Read a byte from the specified register
@@ -131,15 +1122,22 @@ class QMI8658_Accelerometer(object):
     # length: the number of bytes to read
     # returns: a list of bytes read
     def _read_block(self, register, length=1):
-        while not self._bus.try_lock():
-            pass
+        rx = bytearray(length)
+        self._read_into(register, rx)
+        return rx
+
+    # Read from the specified register into an existing buffer
+    # using a single write-then-read transaction
+    # register: the register to begin the read from
+    # buf: the buffer to fill, its length is the number of bytes read
+    # returns: nothing
+    def _read_into(self, register, buf):
+        self._reg[0] = register
+        self._lock()
         try:
-            rx = bytearray(length)
-            self._bus.writeto(self._address, bytes([register]))
-            self._bus.readfrom_into(self._address, rx)
+            self._bus.writeto_then_readfrom(self._address, self._reg, buf)
         finally:
-            self._bus.unlock()    
-        return rx
+            self._bus.unlock()
     
     # Read a 16-bit unsigned integer from the specified register
     # register: the register to begin the read from
@@ -152,14 +1150,20 @@ class QMI8658_Accelerometer(object):
     # value: the byte to write
     # returns: nothing    
     def _write_byte(self,register,value):
-        while not self._bus.try_lock():
-            pass
+        self._wbuf[0] = register
+        self._wbuf[1] = value
+        self._lock()
         try:
-            self._bus.writeto(self._address, bytes([register, value]))
-            #self._bus.writeto(self._address, bytes([value]))
+            self._bus.writeto(self._address, self._wbuf)
         finally:
             self._bus.unlock()
 
+    # Wait for the I2C bus lock
+    # returns: nothing
+    def _lock(self):
+        while not self._bus.try_lock():
+            self.lock_spins += 1
+
     # Make sure this device is what it thinks it is
     # returns: True if the device is what it thinks it is, False otherwise  
     def who_am_i(self):
@@ -179,66 +1183,522 @@ class QMI8658_Accelerometer(object):
     # details on the configuration.
     # returns: nothing    
     def config_apply(self):
-        # REG CTRL1
-        self._write_byte(0x02,0x60)
-        # REG CTRL2 : QMI8658AccRange_8g  and QMI8658AccOdr_1000Hz
-        self._write_byte(0x03,0x23)
-        # REG CTRL3 : QMI8658GyrRange_512dps and QMI8658GyrOdr_1000Hz
-        self._write_byte(0x04,0x53)
+        # REG CTRL1 : Address auto-increment, interrupt enables
+        self._write_byte(0x02,self._ctrl1)
+        # REG CTRL2 : Accelerometer range and ODR
+        self._write_byte(0x03,self._ctrl2)
+        # REG CTRL3 : Gyroscope range and ODR
+        self._write_byte(0x04,self._ctrl3)
         # REG CTRL4 : No
         self._write_byte(0x05,0x00)
-        # REG CTRL5 : Enable Gyroscope And Accelerometer Low-Pass Filter 
-        self._write_byte(0x06,0x11)
+        # REG CTRL5 : Gyroscope And Accelerometer Low-Pass Filter
+        self._write_byte(0x06,self._ctrl5)
         # REG CTRL6 : Disables Motion on Demand.
         self._write_byte(0x07,0x00)
         # REG CTRL7 : Enable Gyroscope And Accelerometer
-        self._write_byte(0x08,0x03)
+        self._write_byte(0x08,self._ctrl7)
+
+    # Set the range, output data rate and low-pass filter of both
+    # sensors and cache the matching scale factors so readings can
+    # never disagree with the configuration.
+    # acc_range: accelerometer full scale in g (see ACC_RANGES)
+    # acc_odr: accelerometer output data rate in Hz (see ODRS)
+    # gyro_range: gyroscope full scale in dps (see GYRO_RANGES)
+    # gyro_odr: gyroscope output data rate in Hz (see ODRS)
+    # lpf: low-pass filter mode 0-3 for both sensors, None disables it
+    # write: if False only cache the settings (config_apply writes them)
+    # returns: nothing
+    def configure(self, acc_range=8, acc_odr=1000, gyro_range=512, gyro_odr=1000, lpf=0, write=True):
+        if acc_range not in self.ACC_RANGES:
+            raise Exception("Accelerometer range must be one of {}".format(self.ACC_RANGES))
+        if gyro_range not in self.GYRO_RANGES:
+            raise Exception("Gyroscope range must be one of {}".format(self.GYRO_RANGES))
+        if acc_odr not in self.ODRS or gyro_odr not in self.ODRS:
+            raise Exception("ODR must be one of {}".format(sorted(self.ODRS)))
+        self._ctrl2 = (self.ACC_RANGES.index(acc_range) << 4) | self.ODRS[acc_odr]
+        self._ctrl3 = (self.GYRO_RANGES.index(gyro_range) << 4) | self.ODRS[gyro_odr]
+        if lpf is None:
+            self._ctrl5 = 0x00
+        else:
+            # gLPF_MODE/gLPF_EN in the high nibble, aLPF in the low
+            self._ctrl5 = (((lpf & 0x03) << 1) | 0x01) * 0x11
+        self.acc_range = acc_range
+        self.acc_odr = acc_odr
+        self.gyro_range = gyro_range
+        self.gyro_odr = gyro_odr
+        self.lpf = lpf
+        # Full scale maps to the int16 range, e.g. 8g -> 4096 LSB/g
+        self._acc_scale = acc_range / 32768
+        self._gyro_scale = gyro_range / 32768
+        # Every range is a power of two so counts -> units is a
+        # multiply and a shift, e.g. 8g: 4096 LSB/g -> >> 12
+        self._acc_shift = 15 - self._log2(acc_range)
+        self._gyro_shift = 15 - self._log2(gyro_range)
+        self._rescale_bias()
+        self.profile = None
+        if write:
+            self._write_byte(0x03, self._ctrl2)
+            self._write_byte(0x04, self._ctrl3)
+            self._write_byte(0x06, self._ctrl5)
+
+    # Integer base 2 logarithm of a power of two
+    # value: the power of two
+    # returns: the exponent
+    def _log2(self, value):
+        shift = 0
+        while value > 1:
+            value >>= 1
+            shift += 1
+        return shift
+
+    # Set the integer units read_fixed() reports in
+    # acc_per_g: accelerometer units per g (10 gives tenths of a g)
+    # gyro_per_dps: gyroscope units per degree per second
+    # returns: nothing
+    def fixed_units(self, acc_per_g=10, gyro_per_dps=1):
+        self._acc_mul = acc_per_g
+        self._gyro_mul = gyro_per_dps
+
+    # Convert the calibration offsets to counts at the current ranges
+    # returns: nothing
+    def _rescale_bias(self):
+        for i in range(3):
+            self._bias[i] = self._cal[i] * self._cal_acc_range // self.acc_range
+            self._bias[i+3] = self._cal[i+3] * self._cal_gyro_range // self.gyro_range
+
+    # Measure the resting offsets of both sensors.  Keep the board
+    # still while this runs.  Every axis is zeroed at rest, which is
+    # what the gesture logic expects; pass keep_gravity to leave 1g
+    # on the axis gravity is acting on instead.
+    # samples: the number of samples to average
+    # keep_gravity: if True don't remove gravity from the accelerometer
+    # save: if True store the offsets in NVM so they load at init
+    # timeout: give up if the samples don't arrive in this many seconds
+    # returns: the offsets in raw counts, accel x, y, z then gyro x, y, z
+    def calibrate(self, samples=64, keep_gravity=False, save=True, timeout=5.0):
+        sums = [0, 0, 0, 0, 0, 0]
+        last = None
+        taken = 0
+        deadline = time.monotonic() + timeout
+        while taken < samples:
+            sample = self.read_sample()
+            if sample.timestamp == last:
+                if time.monotonic() > deadline:
+                    raise Exception("QMI8658 calibration timed out")
+                time.sleep(0.001)
+                continue
+            last = sample.timestamp
+            raw = sample.raw
+            for i in range(6):
+                sums[i] += raw[i]
+            taken += 1
+        for i in range(6):
+            self._cal[i] = round(sums[i] / samples)
+        if keep_gravity:
+            one_g = round(1 / self._acc_scale)
+            axis = 0
+            for i in range(1, 3):
+                if abs(self._cal[i]) > abs(self._cal[axis]):
+                    axis = i
+            self._cal[axis] -= one_g if self._cal[axis] > 0 else -one_g
+        self._cal_acc_range = self.acc_range
+        self._cal_gyro_range = self.gyro_range
+        self._rescale_bias()
+        self.calibrated = True
+        if save:
+            self.save_calibration()
+        return list(self._cal)
+
+    # Store the calibration offsets in NVM
+    # offset: where in microcontroller.nvm to store them
+    # returns: nothing
+    def save_calibration(self, offset=0):
+        data = struct.pack(self.NVM_FORMAT, self.NVM_MAGIC, 1,
+            self.ACC_RANGES.index(self._cal_acc_range),
+            self.GYRO_RANGES.index(self._cal_gyro_range), *self._cal)
+        microcontroller.nvm[offset:offset + len(data)] = data
+
+    # Load calibration offsets stored by calibrate()
+    # offset: where in microcontroller.nvm they were stored
+    # returns: True if offsets were found, False to keep the defaults
+    def load_calibration(self, offset=0):
+        size = struct.calcsize(self.NVM_FORMAT)
+        fields = struct.unpack(self.NVM_FORMAT, bytes(microcontroller.nvm[offset:offset + size]))
+        if fields[0] != self.NVM_MAGIC or fields[1] != 1:
+            return False
+        self._cal_acc_range = self.ACC_RANGES[fields[2] & 0x03]
+        self._cal_gyro_range = self.GYRO_RANGES[fields[3] & 0x07]
+        for i in range(6):
+            self._cal[i] = fields[4 + i]
+        return True
+
+    # Apply one of the named presets in PROFILES
+    # name: 'low-power' (31.25 Hz), 'ui' (125 Hz) or 'motion' (1 kHz)
+    # returns: nothing
+    def apply_profile(self, name):
+        self.configure(*self.PROFILES[name])
+        self.profile = name
+
+    # Enable interrupt driven sampling.  Without the FIFO the chip
+    # raises data-ready on INT2 for every new sample, with the FIFO
+    # the watermark interrupt is raised on INT1.  Edges are counted
+    # in the background so data_ready() never touches the bus.
+    # NOTE: countio on the RP2040 counts with a PWM slice's B input,
+    # which only the odd GPIOs have.  INT1 (GP23) can be counted but
+    # INT2 (GP24) can't, so data-ready reads the pin level instead:
+    # it stays high until the sample is read.
+    # pin: the board pin wired to the interrupt, defaults to GP23
+    #      (INT1) in FIFO mode and GP24 (INT2) otherwise
+    # returns: nothing
+    def interrupt_enable(self, pin=None):
+        self.interrupt_disable()
+        if self.fifo_enabled:
+            # CTRL1 : INT1_EN
+            self._ctrl1 |= 0x08
+            if pin is None:
+                pin = board.GP23
+        else:
+            # CTRL1 : INT2_EN, CTRL7 : clear DRDY_DIS
+            self._ctrl1 |= 0x10
+            self._ctrl7 &= ~0x20
+            if pin is None:
+                pin = board.GP24
+        self._write_byte(0x02, self._ctrl1)
+        self._write_byte(0x08, self._ctrl7)
+        self.interrupt_pin = pin
+        if countio is not None:
+            try:
+                self._int_counter = countio.Counter(pin, edge=countio.Edge.RISE)
+            except ValueError:
+                # Not on a PWM channel B
+                self._int_counter = None
+        if self._int_counter is None:
+            self._int_pin = digitalio.DigitalInOut(pin)
+            self._int_pin.direction = digitalio.Direction.INPUT
+
+    # Go back to polling, release the interrupt pin
+    # returns: nothing
+    def interrupt_disable(self):
+        if self._int_counter is not None:
+            self._int_counter.deinit()
+            self._int_counter = None
+        if self._int_pin is not None:
+            self._int_pin.deinit()
+            self._int_pin = None
+        self.interrupt_pin = None
+        if self._ctrl1 & 0x18:
+            self._ctrl1 &= ~0x18
+            self._write_byte(0x02, self._ctrl1)
+
+    # Check if there's new data to read.  Always True when
+    # interrupts aren't enabled so callers can poll unconditionally.
+    # returns: True if a sample (or FIFO watermark) is pending
+    def data_ready(self):
+        if self._int_counter is not None:
+            if self._int_counter.count:
+                self._int_counter.reset()
+                return True
+            return False
+        if self._int_pin is not None:
+            return self._int_pin.value
+        return True
+
+    # Drop into low-power mode: the gyroscope is powered down, the
+    # accelerometer runs at its slowest low-power ODR (3 Hz) and the
+    # wake-on-motion engine is armed on INT1.
+    # threshold: the wake-on-motion threshold in mg (1-255)
+    # blanking: number of samples to ignore after arming (0-63)
+    # returns: nothing
+    def low_power_enable(self, threshold=100, blanking=4):
+        if self.low_power:
+            return
+        self._resume_pin = self.interrupt_pin
+        self.interrupt_disable()
+        # REG CTRL7 : Disable both sensors while reconfiguring
+        self._write_byte(0x08, 0x00)
+        # REG CTRL2 : Keep the range, accelerometer low-power 3 Hz
+        self._write_byte(0x03, (self._ctrl2 & 0x70) | 0x0F)
+        # REG CAL1_L : WoM threshold, CAL1_H : INT1, initial level low,
+        # blanking time
+        self._write_byte(0x0B, threshold)
+        self._write_byte(0x0C, blanking & 0x3F)
+        # CTRL_CMD_WRITE_WOM_SETTING
+        self._ctrl9(0x08)
+        # REG CTRL1 : INT1_EN
+        self._write_byte(0x02, self._ctrl1 | 0x08)
+        # REG CTRL7 : Accelerometer only
+        self._write_byte(0x08, 0x01)
+        self.low_power = True
+
+    # Disarm wake-on-motion and restore the normal configuration,
+    # including the FIFO and interrupt if they were enabled
+    # returns: nothing
+    def low_power_disable(self):
+        if not self.low_power:
+            return
+        self._write_byte(0x08, 0x00)
+        self._write_byte(0x0B, 0x00)
+        self._ctrl9(0x08)
+        self.config_apply()
+        if self.fifo_enabled:
+            self._write_byte(0x14, self._fifo_ctrl)
+            self._ctrl9(0x04)
+        self.low_power = False
+        if self._resume_pin is not None:
+            self.interrupt_enable(self._resume_pin)
+
+    # Check (and clear) the wake-on-motion flag in STATUS1
+    # returns: True if motion was detected since the last check
+    def motion_detected(self):
+        return bool(self._read_byte(0x2F) & 0x04)
+
+    # Sleep until the wake-on-motion engine fires.  Uses a light
+    # sleep pin alarm on INT1 when the alarm module is available,
+    # otherwise polls STATUS1.  low_power_enable() must be called
+    # first.
+    # timeout: give up after this many seconds, None waits forever
+    # poll: the polling interval when alarm isn't available
+    # pin: the board pin wired to INT1
+    # returns: True if woken by motion, False on timeout
+    def wait_for_motion(self, timeout=None, poll=0.1, pin=board.GP23):
+        deadline = None
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        if alarm is not None:
+            # The WoM output toggles on every event so wait for the
+            # opposite of whatever level the pin is at now
+            level = digitalio.DigitalInOut(pin)
+            level.direction = digitalio.Direction.INPUT
+            value = not level.value
+            level.deinit()
+            alarms = [alarm.pin.PinAlarm(pin=pin, value=value)]
+            if deadline is not None:
+                alarms.append(alarm.time.TimeAlarm(monotonic_time=deadline))
+            woke = alarm.light_sleep_until_alarms(*alarms)
+            return isinstance(woke, alarm.pin.PinAlarm) and self.motion_detected()
+        while not self.motion_detected():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(poll)
+        return True
+
+    # Send a command through the CTRL9 handshake: write the command,
+    # wait for CmdDone in STATUSINT, then acknowledge it.
+    # command: the CTRL9 command to execute
+    # timeout: how long to wait for CmdDone in seconds
+    # returns: nothing
+    def _ctrl9(self, command, timeout=0.1):
+        self._write_byte(0x0A, command)
+        deadline = time.monotonic() + timeout
+        while not self._read_byte(0x2D) & 0x80:
+            if time.monotonic() > deadline:
+                raise Exception("QMI8658 CTRL9 command 0x{:02x} timed out".format(command))
+        # CTRL_CMD_ACK
+        self._write_byte(0x0A, 0x00)
+
+    # Enable the hardware FIFO for accelerometer and gyroscope data.
+    # Samples collect on the chip at the full ODR and read_fifo()
+    # drains them in one bulk read.
+    # watermark: number of samples that raises the FIFO watermark flag
+    # size: FIFO depth in samples, one of 16, 32, 64 or 128
+    # stream: if True the oldest samples are dropped when the FIFO is
+    #         full, if False new samples are dropped instead
+    # returns: nothing
+    def fifo_enable(self, watermark=64, size=128, stream=True):
+        sizes = (16, 32, 64, 128)
+        if size not in sizes:
+            raise Exception("FIFO size must be one of {}".format(sizes))
+        if self._fifo_buf is None or self.batch.size != size:
+            # 12 bytes per sample, accelerometer then gyroscope
+            self._fifo_buf = bytearray(size * 12)
+            self._fifo_view = memoryview(self._fifo_buf)
+            self.batch = QMI8658_Batch(size)
+        # FIFO_CTRL : size and mode (0x02 stream, 0x01 FIFO)
+        self._fifo_ctrl = (sizes.index(size) << 2) | (0x02 if stream else 0x01)
+        # FIFO_WTM_TH
+        self._write_byte(0x13, min(watermark, size))
+        self._write_byte(0x14, self._fifo_ctrl)
+        # CTRL_CMD_RST_FIFO
+        self._ctrl9(0x04)
+
+    # Put the FIFO back into bypass mode
+    # returns: nothing
+    def fifo_disable(self):
+        self._fifo_ctrl = 0x00
+        self._write_byte(0x14, 0x00)
+        self._ctrl9(0x04)
+
+    # Check if the FIFO is enabled
+    # returns: True if the FIFO is in FIFO or stream mode
+    @property
+    def fifo_enabled(self):
+        return self._fifo_ctrl != 0x00
+
+    # Drain every sample waiting in the FIFO into a reusable batch.
+    # batch: the QMI8658_Batch to fill, defaults to self.batch
+    # returns: the filled QMI8658_Batch, batch.count is the number of
+    #          samples read (0 if the FIFO was empty)
+    def read_fifo(self, batch=None):
+        if batch is None:
+            batch = self.batch
+        # FIFO_SMPL_CNT and FIFO_STATUS give the fill level in words
+        status = self._fifo_status
+        self._read_into(0x15, status)
+        count = (((status[1] & 0x03) << 8) | status[0]) * 2 // 12
+        count = min(count, batch.size)
+        batch.count = count
+        if count == 0:
+            return batch
+        # The timestamp counter belongs to the newest sample
+        self._read_into(0x30, self._burst)
+        newest = (self._burst[2]<<16)|(self._burst[1]<<8)|(self._burst[0])
+        # CTRL_CMD_REQ_FIFO puts the FIFO in read mode, FIFO_DATA
+        # then streams out without address auto-increment
+        self._ctrl9(0x05)
+        self._read_into(0x17, self._fifo_view[:count * 12])
+        self._write_byte(0x14, self._fifo_ctrl)
+        buf = self._fifo_buf
+        raw = batch.raw
+        timestamps = batch.timestamps
+        for i in range(count):
+            self._unpack_raw(buf, i * 12, raw, i * 6)
+            timestamps[i] = (newest - (count - 1 - i)) & 0xFFFFFF
+        return batch
+
+    # Burst read timestamp, temperature, accelerometer and gyroscope
+    # data (0x30 - 0x40) in one transaction into a reusable sample.
+    # sample: the QMI8658_Sample to fill, defaults to self.sample
+    # returns: the filled QMI8658_Sample
+    def read_sample(self, sample=None):
+        if sample is None:
+            sample = self.sample
+        buf = self._burst
+        self._read_into(0x30, buf)
+        sample.timestamp = (buf[2]<<16)|(buf[1]<<8)|(buf[0])
+        sample.temperature = struct.unpack_from('<h', buf, 3)[0] / 256
+        self._unpack_raw(buf, 5, sample.raw)
+        return sample
+
+    # Decode six little-endian int16 values (accel x, y, z then gyro
+    # x, y, z) from a buffer into an existing array
+    # buf: the buffer holding the register data
+    # offset: the index of AX_L within buf
+    # raw: the array('h') to fill
+    # start: the index in raw to write the first value to
+    # returns: nothing
+    def _unpack_raw(self, buf, offset, raw, start=0):
+        (raw[start], raw[start+1], raw[start+2],
+         raw[start+3], raw[start+4], raw[start+5]) = struct.unpack_from('<6h', buf, offset)
+
+    # Remove the calibration offsets and scale raw counts to g and dps
+    # raw: the raw values, accelerometer first
+    # out: an array('f') of 6 to write the result to
+    # start: the index in raw of the sample's accelerometer x
+    # returns: out
+    def _scale(self, raw, out, start=0):
+        acc_scale = self._acc_scale
+        gyro_scale = self._gyro_scale
+        bias = self._bias
+        out[0] = (raw[start] - bias[0]) * acc_scale
+        out[1] = (raw[start+1] - bias[1]) * acc_scale
+        out[2] = (raw[start+2] - bias[2]) * acc_scale
+        out[3] = (raw[start+3] - bias[3]) * gyro_scale
+        out[4] = (raw[start+4] - bias[4]) * gyro_scale
+        out[5] = (raw[start+5] - bias[5]) * gyro_scale
+        return out
+
+    # Remove the calibration offsets and convert raw counts to the
+    # integer units set by fixed_units() without any float math.
+    # Results truncate towards zero like int() would.
+    # raw: the raw values, accelerometer first
+    # out: an array('i') of 6 to write the result to
+    # start: the index in raw of the sample's accelerometer x
+    # returns: out
+    def _fixed(self, raw, out, start=0):
+        bias = self._bias
+        mul = self._acc_mul
+        shift = self._acc_shift
+        for i in range(6):
+            if i == 3:
+                mul = self._gyro_mul
+                shift = self._gyro_shift
+            value = (raw[start+i] - bias[i]) * mul
+            if value >= 0:
+                out[i] = value >> shift
+            else:
+                out[i] = -((-value) >> shift)
+        return out
+
+    # Convert one sample of a FIFO batch to fixed_units()
+    # batch: the QMI8658_Batch to read from
+    # index: the sample within the batch
+    # out: an array('i') of 6 to write the result to
+    # returns: out
+    def batch_fixed(self, batch, index, out):
+        return self._fixed(batch.raw, out, index * 6)
+
+    # Scale one sample of a FIFO batch to g and dps
+    # batch: the QMI8658_Batch to read from
+    # index: the sample within the batch
+    # out: an array('f') of 6 to write the result to
+    # returns: out
+    def batch_xyz(self, batch, index, out):
+        return self._scale(batch.raw, out, index * 6)
 
     # Read the raw accelerometer and gyroscope data from the device
-    # returns: a list of 6 integers, the first 3 are the accelerometer
+    # NOTE: the array is reused by the next read, copy it to keep it
+    # returns: an array of 6 integers, the first 3 are the accelerometer
     #          data, the last 3 are the gyroscope data
     def read_raw_xyz(self):
-        xyz=[0,0,0,0,0,0]
-        raw_timestamp = self._read_block(0x30,3)
-        raw_acc_xyz=self._read_block(0x35,6)
-        raw_gyro_xyz=self._read_block(0x3b,6)
-        raw_xyz=self._read_block(0x35,12)
-        timestamp = (raw_timestamp[2]<<16)|(raw_timestamp[1]<<8)|(raw_timestamp[0])
-        for i in range(6):
-            # xyz[i]=(raw_acc_xyz[(i*2)+1]<<8)|(raw_acc_xyz[i*2])
-            # xyz[i+3]=(raw_gyro_xyz[((i+3)*2)+1]<<8)|(raw_gyro_xyz[(i+3)*2])
-            xyz[i] = (raw_xyz[(i*2)+1]<<8)|(raw_xyz[i*2])
-            if xyz[i] >= 32767:
-                xyz[i] = xyz[i]-65535
-        return xyz
+        return self.read_sample().raw
+
+    # Read the accelerometer and gyroscope data from the device as
+    # calibrated integers in the units set by fixed_units()
+    # out: an array('i') of 6 to write the result to.  If omitted an
+    #      internal array is used and overwritten by the next call.
+    # returns: the array of 6 integers, the first 3 are the
+    #          accelerometer data, the last 3 are the gyroscope data
+    def read_fixed(self, out=None):
+        if out is None:
+            out = self._ixyz
+        return self._fixed(self.read_sample().raw, out)
 
     # Read the accelerometer and gyroscope data from the device and return
-    # in human-readable format.
-    # returns: a list of 6 floats, the first 3 are the accelerometer
+    # in human-readable format (g and degrees per second).
+    # out: an array('f') of 6 to write the result to.  If omitted an
+    #      internal array is used and overwritten by the next call.
+    # returns: the array of 6 floats, the first 3 are the accelerometer
     #         data, the last 3 are the gyroscope data    
-    def read_xyz(self):
-        xyz=[0,0,0,0,0,0]
-        raw_xyz=self.read_raw_xyz()  
-        #QMI8658AccRange_8g
-        acc_lsb_div=(1<<12)
-        #QMI8658GyrRange_512dps
-        gyro_lsb_div = 64
-        for i in range(3):
-            xyz[i]=raw_xyz[i]/acc_lsb_div#(acc_lsb_div/1000.0)
-            xyz[i+3]=raw_xyz[i+3]*1.0/gyro_lsb_div
-        return xyz
+    def read_xyz(self, out=None):
+        if out is None:
+            out = self._xyz
+        return self._scale(self.read_sample().raw, out)
 
 # A class to interface with a GC9A01 round display
 # This class is based on the Adafruit CircuitPython GC9A01 library
 # It is modified to work with the WS RP2040 1.28" dev board and
 # helper classes have been added.
 class GC9A01_Display(object):
+    # How a tracked sprite's bounds are measured, see _track()
+    # x, y, width and height read every frame
+    SPRITE_RECTANGLE = 0
+    # x, y plus an extent measured once (circles, polygons, bitmaps)
+    SPRITE_FIXED = 1
+    # x, y plus the bounding box, measured again when the text changes
+    SPRITE_LABEL = 2
+
     # Initialize the display
     # autoshow: if True, the display will be updated after each draw operation
     #           if False, the display will not be updated until show() is called
     #           default is True
+    # palettes: how many palettes to keep for reuse, 0 gives every
+    #           shape its own palette
+    # dirty: how many rectangles a frame's changes are coalesced into,
+    #        0 (the default) leaves dirty rectangle tracking off
+    # circular: clip dirty rectangles and pushed windows to the round
+    #           panel, see visible_span()
     # returns: nothing
-    def __init__(self, autoshow=True):
+    def __init__(self, autoshow=True, palettes=32, dirty=0, circular=False):
         # Pins
         self.clk = board.GP10
         self.mosi = board.GP11
@@ -256,9 +1716,90 @@ class GC9A01_Display(object):
         self.display_bus = displayio.FourWire(self.spi, command=self.dc, chip_select=self.cs, reset=self.rst)
         self.display = gc9a01.GC9A01(self.display_bus, width=self.width, height=self.height, backlight_pin=self.bl)
 
-        self.groups = {
-            'default': displayio.Group()
-        }
+        # The panel is a circle inscribed in the square.  Row y shows
+        # columns _span_start[y] up to (not including) _span_end[y],
+        # a pixel is visible if its centre is inside the circle.
+        # The clipping is measurement only: it changes what the dirty
+        # stats count and what the host stand-in pushes.  On the device
+        # displayio computes its own refresh areas, corners included,
+        # so circular doesn't cut the SPI traffic there.
+        self.circular = circular
+        self._span_start = array('B', (0 for _ in range(self.height)))
+        self._span_end = array('B', (0 for _ in range(self.height)))
+        self.visible_pixels = 0
+        radius = self.width / 2
+        for y in range(self.height):
+            dy = y + 0.5 - self.height / 2
+            dx = (radius * radius - dy * dy) ** 0.5
+            start = max(0, int(-floor(-(radius - 0.5 - dx))))
+            end = min(self.width, int(floor(radius - 0.5 + dx)) + 1)
+            self._span_start[y] = start
+            self._span_end[y] = max(start, end)
+            self.visible_pixels += self._span_end[y] - start
+
+        # Dirty rectangle tracking, see end_frame().  Every sprite drawn
+        # is tracked with its layer, kind, extent (dx, dy, w, h from its
+        # x, y) and the bounds it covered last frame (x0, y0, x1, y1,
+        # empty when x1 <= x0).  Changes are coalesced into at most
+        # dirty rectangles, kept as x0, y0, x1, y1.
+        self.dirty_limit = dirty
+        self._sprites = []
+        self._sprite_layers = []
+        self._sprite_kinds = []
+        self._sprite_texts = []
+        self._extents = []
+        self._bounds = []
+        self._layer_counts = {}
+        self._dirty = array('h', (0 for _ in range(4 * max(dirty, 1))))
+        self._dirty_count = 0
+        self._pushed = array('h', (0 for _ in range(4 * max(dirty, 1))))
+        self.pushed_rects = 0
+        self.dirty_area = 0
+        self.dirty_frames = 0
+        self.dirty_pixels = 0
+        self.dirty_max_area = 0
+        # Goes up with every end_frame(), never reset
+        self.dirty_serial = 0
+        # A driver that can push part of the panel on request (the
+        # host stand-in) pushes exactly the windows pushed_windows()
+        # gives.  displayio works its own areas out on the device.
+        if (dirty or circular) and hasattr(self.display, 'area_source'):
+            self.display.area_source = self
+
+        # Every named group is a layer in one root group that stays on
+        # the display, bottom layer first.  Screens flip layers with
+        # show_layer()/hide_layer() instead of swapping the root.
+        self.root = displayio.Group()
+        self.groups = {}
+        self.layers = []
+        self._shown = False
+        self.add_group('default')
+
+        # Shapes drawn with the same colors share a palette.  Palettes
+        # are keyed by the color tuple, least recently used first.
+        # Changing a shared palette's colors changes every shape using
+        # it, use palettes=0 if shapes need their own.
+        self.palette_cache_size = palettes
+        self._palettes = {}
+        self._palette_order = []
+        self.palette_hits = 0
+        self.palette_misses = 0
+
+        # Frame pacing, see pace_frames()
+        self.target_fps = None
+        self.minimum_fps = 0
+        self.frames = 0
+        self.dropped_frames = 0
+        self.late_frames = 0
+        self.fps = 0.0
+        self.last_frame = 0.0
+        self._fps_frames = 0
+        self._fps_start = 0.0
+
+        # Scene batching, see begin_scene()
+        self._batch_depth = 0
+        self._batch_group = None
+        self._batch_auto_refresh = True
 
     # Turn off the backlight
     # returns: nothing
@@ -270,11 +1811,206 @@ class GC9A01_Display(object):
     def on(self):
         self.display.brightness = 1
 
-    # Add a new group to the display
+    # Get a palette for a list of colors, reusing a cached one if the
+    # same colors were used before
+    # color: a list of colors
+    # returns: the displayio.Palette
+    def _palette(self, color):
+        key = tuple(color)
+        palette = self._palettes.get(key)
+        if palette is not None:
+            self.palette_hits += 1
+            order = self._palette_order
+            if order[len(order) - 1] != key:
+                order.remove(key)
+                order.append(key)
+            return palette
+        self.palette_misses += 1
+        palette = displayio.Palette(len(color))
+        for i in range(len(color)):
+            palette[i] = color[i]
+        if self.palette_cache_size > 0:
+            self._palettes[key] = palette
+            self._palette_order.append(key)
+            if len(self._palette_order) > self.palette_cache_size:
+                del self._palettes[self._palette_order.pop(0)]
+        return palette
+
+    # Called after a draw changes a group: shows it straight away with
+    # autoshow, or remembers it for commit() while building a scene
+    # groupname: the group that changed
+    # returns: nothing
+    def _changed(self, groupname):
+        if self._batch_depth:
+            self._batch_group = groupname
+        elif self.auto_show:
+            self.show()
+
+    # Start building a scene.  Until the matching commit() nothing is
+    # shown and the panel isn't refreshed, so a screen full of draws
+    # appears as one frame.  Scenes can be nested, only the outermost
+    # commit() shows anything.
+    # returns: nothing
+    def begin_scene(self):
+        self._batch_depth += 1
+        if self._batch_depth == 1:
+            self._batch_group = None
+            self._batch_auto_refresh = self.display.auto_refresh
+            self.display.auto_refresh = False
+
+    # Finish a scene: show the layers (with autoshow, if anything
+    # was drawn) and refresh the panel once
+    # returns: nothing
+    def commit(self):
+        if self._batch_depth == 0:
+            raise Exception("commit() without begin_scene()")
+        self._batch_depth -= 1
+        if self._batch_depth:
+            return
+        if self._batch_group is not None and self.auto_show:
+            self.show()
+        self._batch_group = None
+        self.end_frame()
+        self.display.refresh()
+        self.display.auto_refresh = self._batch_auto_refresh
+
+    # Build a scene in a with block, see begin_scene()
+    #   with display.batch():
+    #       display.fill(...)
+    #       display.draw_text(...)
+    # returns: a context manager
+    def batch(self):
+        return DisplayBatch(self)
+
+    # Refresh the panel at a fixed frame rate instead of whenever
+    # displayio's auto_refresh decides to.  With pacing on, call
+    # frame() once per frame from the main loop.
+    # target_fps: the frame rate to refresh at, None turns pacing off
+    #             and auto_refresh back on
+    # minimum_fps: frames slower than this are counted as late, 0 to
+    #              not check
+    # returns: nothing
+    def pace_frames(self, target_fps=30, minimum_fps=0):
+        self.target_fps = target_fps
+        self.minimum_fps = minimum_fps
+        self.display.auto_refresh = target_fps is None
+        self.reset_frame_stats()
+
+    # Refresh the panel for this frame.  Without due, displayio paces
+    # the frames: it waits to line up with the target frame rate and
+    # skips the frame if the loop is already too late for it.  A
+    # scheduler that already calls us on time passes when the frame
+    # was due instead, the frame is refreshed straight away or
+    # dropped if its slot has passed.
+    # due: when this frame was due (a time.monotonic() time)
+    # returns: True if the panel was refreshed, False if the frame was
+    #          dropped
+    def frame(self, due=None):
+        if due is None:
+            try:
+                refreshed = self.display.refresh(target_frames_per_second=self.target_fps, minimum_frames_per_second=self.minimum_fps)
+            except RuntimeError:
+                # Below the minimum frame rate, push this frame regardless
+                self.late_frames += 1
+                refreshed = self.display.refresh()
+        elif time.monotonic() - due > 1.0 / self.target_fps:
+            refreshed = False
+        else:
+            if self.minimum_fps and time.monotonic() - self.last_frame > 1.0 / self.minimum_fps:
+                self.late_frames += 1
+            refreshed = self.display.refresh()
+        now = time.monotonic()
+        if refreshed:
+            self.frames += 1
+            self._fps_frames += 1
+            self.last_frame = now
+        else:
+            self.dropped_frames += 1
+            # Nothing was pushed, the next frame has to cover it
+            pushed = self._pushed
+            for i in range(self.pushed_rects):
+                j = i * 4
+                self._add_dirty(pushed[j], pushed[j + 1], pushed[j + 2], pushed[j + 3])
+        elapsed = now - self._fps_start
+        if elapsed >= 1.0:
+            self.fps = self._fps_frames / elapsed
+            self._fps_frames = 0
+            self._fps_start = now
+        return refreshed
+
+    # Get the frame pacing counters
+    # returns: a dict with the frames refreshed, dropped and late and
+    #          the frame rate achieved over the last second
+    def frame_stats(self):
+        return {
+            'target_fps': self.target_fps,
+            'fps': self.fps,
+            'frames': self.frames,
+            'dropped': self.dropped_frames,
+            'late': self.late_frames
+        }
+
+    # Reset the frame pacing counters
+    # returns: nothing
+    def reset_frame_stats(self):
+        self.frames = 0
+        self.dropped_frames = 0
+        self.late_frames = 0
+        self.fps = 0.0
+        self._fps_frames = 0
+        self._fps_start = time.monotonic()
+        self.last_frame = self._fps_start
+
+    # Add a new group to the display as a layer on top of the others.
+    # Adding a name again replaces that layer's group in place.
     # groupname: the name of the group to add
+    # hidden: start with the layer hidden
+    # returns: the displayio.Group
+    def add_group(self, groupname, hidden=False):
+        group = displayio.Group()
+        group.hidden = hidden
+        if groupname in self.groups:
+            index = self.root.index(self.groups[groupname])
+            self.root[index] = group
+        else:
+            self.root.append(group)
+            self.layers.append(groupname)
+            self._layer_counts[groupname] = 0
+        self.groups[groupname] = group
+        return group
+
+    # Show a layer
+    # groupname: the layer to show
+    # returns: nothing
+    def show_layer(self, groupname):
+        self.groups[groupname].hidden = False
+        self._changed(groupname)
+
+    # Hide a layer, its sprites stay in it for when it's shown again
+    # groupname: the layer to hide
+    # returns: nothing
+    def hide_layer(self, groupname):
+        self.groups[groupname].hidden = True
+        self._changed(groupname)
+
+    # Move a layer above all the others
+    # groupname: the layer to raise
     # returns: nothing
-    def add_group(self, groupname):
-        self.groups[groupname] = displayio.Group()
+    def raise_layer(self, groupname):
+        if self.layers[len(self.layers) - 1] == groupname:
+            return
+        group = self.groups[groupname]
+        self.root.remove(group)
+        self.root.append(group)
+        self.layers.remove(groupname)
+        self.layers.append(groupname)
+        # Whatever the layer now covers has to be redrawn
+        bounds = self._bounds
+        for i in range(len(self._sprites)):
+            if self._sprite_layers[i] == groupname:
+                j = i * 4
+                self._add_dirty(bounds[j], bounds[j + 1], bounds[j + 2], bounds[j + 3])
+        self._changed(groupname)
 
     # Draw a polygon on the display
     # points: a list of points, each point is a Tuple of 2 integers
@@ -284,13 +2020,11 @@ class GC9A01_Display(object):
     # groupname: the name of the group to add the polygon to
     # returns: the vectorio.Polygon object that was created
     def draw_polygon(self,points,x,y,color,groupname='default'):
-        palette = displayio.Palette(len(color))
-        for i in range(len(color)):
-            palette[i] = color[i]
+        palette = self._palette(color)
         polygon = vectorio.Polygon(pixel_shader=palette, points=points, x=x, y=y)
         self.groups[groupname].append(polygon)
-        if self.auto_show:
-            self.display.show(self.groups[groupname])
+        self._track(polygon, groupname)
+        self._changed(groupname)
         return polygon
 
     # Draw a rectangle on the display
@@ -302,13 +2036,11 @@ class GC9A01_Display(object):
     # groupname: the name of the group to add the rectangle to
     # returns: the vectorio.Rectangle object that was created
     def draw_rectangle(self,x,y,w,h,color,groupname='default'):
-        palette = displayio.Palette(len(color))
-        for i in range(len(color)):
-            palette[i] = color[i]
+        palette = self._palette(color)
         rectangle = vectorio.Rectangle(pixel_shader=palette, width=w, height=h, x=x, y=y)
         self.groups[groupname].append(rectangle)
-        if self.auto_show:
-            self.display.show(self.groups[groupname])
+        self._track(rectangle, groupname)
+        self._changed(groupname)
         return rectangle
     
     # Draw a circle on the display
@@ -319,13 +2051,11 @@ class GC9A01_Display(object):
     # groupname: the name of the group to add the circle to
     # returns: the vectorio.Circle object that was created
     def draw_circle(self,x,y,r,color,groupname='default'):
-        palette = displayio.Palette(len(color))
-        for i in range(len(color)):
-            palette[i] = color[i]
+        palette = self._palette(color)
         circle = vectorio.Circle(pixel_shader=palette, radius=r, x=x, y=y)
         self.groups[groupname].append(circle)
-        if self.auto_show:
-            self.display.show(self.groups[groupname])
+        self._track(circle, groupname)
+        self._changed(groupname)
         return circle
     
     # Draw text on the display
@@ -337,15 +2067,13 @@ class GC9A01_Display(object):
     # groupname: the name of the group to add the text to
     # returns: the label.Label object that was created
     def draw_text(self,x,y,text,color,font,groupname='default'):
-        palette = displayio.Palette(len(color))
-        for i in range(len(color)):
-            palette[i] = color[i]
-        text_area = label.Label(font, text=text, color=palette[0])
+        # Labels keep their own palette, only the color is needed
+        text_area = label.Label(font, text=text, color=color[0])
         text_area.x = x
         text_area.y = y
         self.groups[groupname].append(text_area)
-        if self.auto_show:
-            self.display.show(self.groups[groupname])
+        self._track(text_area, groupname)
+        self._changed(groupname)
         return text_area    
 
     # Draw a bitmap file on the display
@@ -380,8 +2108,8 @@ class GC9A01_Display(object):
         sprite_tile_height = bitmap.height // sprite_tiles_y
         tile_grid = displayio.TileGrid(bitmap, pixel_shader=bitmap.pixel_shader, width=1, height=1, tile_width=sprite_tile_width, tile_height=sprite_tile_height, default_tile=sprite_starting_tile, x=x, y=y)
         self.groups[groupname].append(tile_grid)
-        if self.auto_show:
-            self.display.show(self.groups[groupname])
+        self._track(tile_grid, groupname, (0, 0, sprite_tile_width, sprite_tile_height))
+        self._changed(groupname)
         return tile_grid
 
     # Fill the display with a color
@@ -391,15 +2119,389 @@ class GC9A01_Display(object):
     def fill(self,color,groupname='default'):
         return self.draw_rectangle(0,0,self.width,self.height,color,groupname)
 
-    # Show the display
+    # Fill the round panel's visible disc with a color, the corners
+    # the panel can't show are left alone
+    # color: a list of colors for the palette
+    # groupname: the name of the group to add the circle to
+    # returns: the vectorio.Circle object that was created
+    def fill_disc(self,color,groupname='default'):
+        # One pixel bigger so the edge pixels are fully covered
+        return self.draw_circle(self.width // 2,self.height // 2,self.width // 2 + 1,color,groupname)
+
+    # Get the visible part of a row of the round panel
+    # y: the row
+    # returns: (start, end) columns, end is exclusive
+    def visible_span(self, y):
+        return (self._span_start[y], self._span_end[y])
+
+    # Shrink a rectangle to the rows and columns of it the round panel
+    # shows.  The widest row is the one nearest the middle.
+    # x0, y0: the top left corner
+    # x1, y1: the bottom right corner, exclusive
+    # returns: the clipped (x0, y0, x1, y1), or None if none of it
+    #          is visible
+    def _clip_to_disc(self, x0, y0, x1, y1):
+        starts = self._span_start
+        ends = self._span_end
+        while y0 < y1 and (ends[y0] <= x0 or starts[y0] >= x1):
+            y0 += 1
+        while y1 > y0 and (ends[y1 - 1] <= x0 or starts[y1 - 1] >= x1):
+            y1 -= 1
+        if y1 <= y0:
+            return None
+        middle = min(max(self.height // 2, y0), y1 - 1)
+        return (max(x0, starts[middle]), y0, min(x1, ends[middle]), y1)
+
+    # Count the pixels of a rectangle the round panel shows
+    # x0, y0: the top left corner
+    # x1, y1: the bottom right corner, exclusive
+    # returns: the number of visible pixels
+    def _visible_area(self, x0, y0, x1, y1):
+        starts = self._span_start
+        ends = self._span_end
+        area = 0
+        for y in range(y0, y1):
+            width = min(x1, ends[y]) - max(x0, starts[y])
+            if width > 0:
+                area += width
+        return area
+
+    # Start tracking a sprite's bounds for dirty rectangles
+    # sprite: the vectorio shape, label or TileGrid
+    # groupname: the layer it's in
+    # extent: (dx, dy, w, h) from the sprite's x, y if it's already
+    #         known, otherwise it's measured here
+    # returns: nothing
+    def _track(self, sprite, groupname, extent=None):
+        if not self.dirty_limit:
+            return
+        kind = self.SPRITE_FIXED
+        text = None
+        if extent is not None:
+            pass
+        elif isinstance(sprite, vectorio.Rectangle):
+            kind = self.SPRITE_RECTANGLE
+            extent = (0, 0, 0, 0)
+        elif isinstance(sprite, vectorio.Circle):
+            r = sprite.radius
+            extent = (-r, -r, r * 2 + 1, r * 2 + 1)
+        elif isinstance(sprite, vectorio.Polygon):
+            points = sprite.points
+            min_x = max_x = points[0][0]
+            min_y = max_y = points[0][1]
+            for point in points:
+                min_x = min(min_x, point[0])
+                max_x = max(max_x, point[0])
+                min_y = min(min_y, point[1])
+                max_y = max(max_y, point[1])
+            extent = (min_x, min_y, max_x - min_x + 1, max_y - min_y + 1)
+        elif isinstance(sprite, label.Label):
+            kind = self.SPRITE_LABEL
+            text = sprite.text
+            extent = sprite.bounding_box
+        else:
+            # Don't know how big it is, assume the whole screen
+            extent = (-sprite.x, -sprite.y, self.width, self.height)
+        self._sprites.append(sprite)
+        self._sprite_layers.append(groupname)
+        self._sprite_kinds.append(kind)
+        self._sprite_texts.append(text)
+        self._extents.extend(extent)
+        # Starts out empty so the first end_frame() marks it dirty
+        self._bounds.extend((0, 0, 0, 0))
+        self._layer_counts[groupname] += 1
+
+    # Stop tracking a sprite, the area it covered is marked dirty
+    # i: the sprite's index in the tracking lists
+    # returns: nothing
+    def _untrack(self, i):
+        j = i * 4
+        bounds = self._bounds
+        self._add_dirty(bounds[j], bounds[j + 1], bounds[j + 2], bounds[j + 3])
+        self._layer_counts[self._sprite_layers[i]] -= 1
+        del self._sprites[i]
+        del self._sprite_layers[i]
+        del self._sprite_kinds[i]
+        del self._sprite_texts[i]
+        del self._extents[j:j + 4]
+        del self._bounds[j:j + 4]
+
+    # Catch up with sprites removed from (or appended straight to) a
+    # layer's group since the last frame
+    # groupname: the layer
+    # returns: nothing
+    def _sync_layer(self, groupname):
+        group = self.groups[groupname]
+        for i in range(len(self._sprites) - 1, -1, -1):
+            if self._sprite_layers[i] == groupname and self._sprites[i] not in group:
+                self._untrack(i)
+        if len(group) != self._layer_counts[groupname]:
+            for sprite in group:
+                if sprite not in self._sprites:
+                    self._track(sprite, groupname)
+
+    # Mark part of the screen as changed, e.g. after changing a
+    # palette's colors, which isn't tracked
+    # x: the left edge
+    # y: the top edge
+    # w: the width
+    # h: the height
+    # returns: nothing
+    def mark_dirty(self, x, y, w, h):
+        self._add_dirty(x, y, x + w, y + h)
+
+    # Add a rectangle to this frame's dirty rectangles.  Rectangles
+    # that overlap or touch are merged, and when every slot is used
+    # the one that grows least takes it.
+    # x0, y0: the top left corner
+    # x1, y1: the bottom right corner, exclusive
+    # returns: nothing
+    def _add_dirty(self, x0, y0, x1, y1):
+        if x0 < 0:
+            x0 = 0
+        if y0 < 0:
+            y0 = 0
+        if x1 > self.width:
+            x1 = self.width
+        if y1 > self.height:
+            y1 = self.height
+        if x1 <= x0 or y1 <= y0:
+            return
+        if self.circular:
+            clipped = self._clip_to_disc(x0, y0, x1, y1)
+            if clipped is None:
+                return
+            x0, y0, x1, y1 = clipped
+        rects = self._dirty
+        merged = False
+        i = 0
+        while i < self._dirty_count:
+            j = i * 4
+            if x0 <= rects[j + 2] and rects[j] <= x1 and y0 <= rects[j + 3] and rects[j + 1] <= y1:
+                # Take the merged rectangle out, the union may touch
+                # others too
+                x0 = min(x0, rects[j])
+                y0 = min(y0, rects[j + 1])
+                x1 = max(x1, rects[j + 2])
+                y1 = max(y1, rects[j + 3])
+                self._drop_dirty(i)
+                merged = True
+                i = 0
+            else:
+                i += 1
+        if merged and self.circular:
+            # The union can reach into the corners again
+            x0, y0, x1, y1 = self._clip_to_disc(x0, y0, x1, y1)
+        if self._dirty_count == self.dirty_limit:
+            best = 0
+            best_growth = -1
+            for i in range(self._dirty_count):
+                j = i * 4
+                area = (rects[j + 2] - rects[j]) * (rects[j + 3] - rects[j + 1])
+                growth = (max(x1, rects[j + 2]) - min(x0, rects[j])) * (max(y1, rects[j + 3]) - min(y0, rects[j + 1])) - area
+                if best_growth < 0 or growth < best_growth:
+                    best = i
+                    best_growth = growth
+            j = best * 4
+            x0 = min(x0, rects[j])
+            y0 = min(y0, rects[j + 1])
+            x1 = max(x1, rects[j + 2])
+            y1 = max(y1, rects[j + 3])
+            self._drop_dirty(best)
+            self._add_dirty(x0, y0, x1, y1)
+            return
+        j = self._dirty_count * 4
+        rects[j] = x0
+        rects[j + 1] = y0
+        rects[j + 2] = x1
+        rects[j + 3] = y1
+        self._dirty_count += 1
+
+    # Remove a dirty rectangle, the last one takes its slot
+    # i: the rectangle's index
+    # returns: nothing
+    def _drop_dirty(self, i):
+        rects = self._dirty
+        self._dirty_count -= 1
+        j = i * 4
+        k = self._dirty_count * 4
+        rects[j] = rects[k]
+        rects[j + 1] = rects[k + 1]
+        rects[j + 2] = rects[k + 2]
+        rects[j + 3] = rects[k + 3]
+
+    # Finish a frame's dirty rectangles.  Every tracked sprite that
+    # moved, resized, changed its text, appeared or went away since
+    # the last frame adds the union of its old and new bounds, and
+    # the coalesced result becomes this frame's pushed area.  Call
+    # it once per frame, wsRP2040128 does from its display task.
+    # Layers are assumed to sit at 0, 0 unscaled.
+    # returns: the number of pixels that changed this frame
+    def end_frame(self):
+        if not self.dirty_limit:
+            return 0
+        groups = self.groups
+        counts = self._layer_counts
+        for name in self.layers:
+            if len(groups[name]) != counts[name]:
+                self._sync_layer(name)
+        sprites = self._sprites
+        layers = self._sprite_layers
+        kinds = self._sprite_kinds
+        texts = self._sprite_texts
+        extents = self._extents
+        bounds = self._bounds
+        for i in range(len(sprites)):
+            sprite = sprites[i]
+            j = i * 4
+            changed = False
+            if sprite.hidden or groups[layers[i]].hidden:
+                x0 = y0 = x1 = y1 = 0
+            elif kinds[i] == self.SPRITE_RECTANGLE:
+                x0 = sprite.x
+                y0 = sprite.y
+                x1 = x0 + sprite.width
+                y1 = y0 + sprite.height
+            else:
+                if kinds[i] == self.SPRITE_LABEL and sprite.text != texts[i]:
+                    # Redrawn even if it's still the same size
+                    texts[i] = sprite.text
+                    box = sprite.bounding_box
+                    extents[j] = box[0]
+                    extents[j + 1] = box[1]
+                    extents[j + 2] = box[2]
+                    extents[j + 3] = box[3]
+                    changed = True
+                x0 = sprite.x + extents[j]
+                y0 = sprite.y + extents[j + 1]
+                x1 = x0 + extents[j + 2]
+                y1 = y0 + extents[j + 3]
+            old_x0 = bounds[j]
+            old_y0 = bounds[j + 1]
+            old_x1 = bounds[j + 2]
+            old_y1 = bounds[j + 3]
+            if changed or x0 != old_x0 or y0 != old_y0 or x1 != old_x1 or y1 != old_y1:
+                if old_x1 <= old_x0:
+                    self._add_dirty(x0, y0, x1, y1)
+                elif x1 <= x0:
+                    self._add_dirty(old_x0, old_y0, old_x1, old_y1)
+                else:
+                    self._add_dirty(min(x0, old_x0), min(y0, old_y0), max(x1, old_x1), max(y1, old_y1))
+                bounds[j] = x0
+                bounds[j + 1] = y0
+                bounds[j + 2] = x1
+                bounds[j + 3] = y1
+        # This frame's rectangles become the pushed ones
+        area = 0
+        rects = self._dirty
+        pushed = self._pushed
+        for k in range(self._dirty_count * 4):
+            pushed[k] = rects[k]
+        for i in range(self._dirty_count):
+            j = i * 4
+            if self.circular:
+                area += self._visible_area(rects[j], rects[j + 1], rects[j + 2], rects[j + 3])
+            else:
+                area += (rects[j + 2] - rects[j]) * (rects[j + 3] - rects[j + 1])
+        self.pushed_rects = self._dirty_count
+        self._dirty_count = 0
+        self.dirty_serial += 1
+        self.dirty_area = area
+        self.dirty_frames += 1
+        self.dirty_pixels += area
+        if area > self.dirty_max_area:
+            self.dirty_max_area = area
+        return area
+
+    # Get the rectangles pushed in the last frame
+    # returns: a list of (x, y, w, h) tuples
+    def dirty_rects(self):
+        pushed = self._pushed
+        result = []
+        for i in range(self.pushed_rects):
+            j = i * 4
+            result.append((pushed[j], pushed[j + 1], pushed[j + 2] - pushed[j], pushed[j + 3] - pushed[j + 1]))
+        return result
+
+    # Get the windows to push for the last frame: its dirty
+    # rectangles, or the whole panel with tracking off.  On the round
+    # panel each one is clipped to the visible disc, split into runs
+    # of rows that show the same columns.  Only the host stand-in
+    # pushes these, displayio doesn't take windows from us.
+    # rects: (x, y, w, h) areas to clip instead
+    # returns: a list of (x, y, w, h) tuples
+    def pushed_windows(self, rects=None):
+        if rects is not None:
+            pass
+        elif self.dirty_limit:
+            rects = self.dirty_rects()
+        else:
+            rects = [(0, 0, self.width, self.height)]
+        if not self.circular:
+            return rects
+        starts = self._span_start
+        ends = self._span_end
+        windows = []
+        for x, y, w, h in rects:
+            x1 = x + w
+            y1 = y + h
+            row = y
+            while row < y1:
+                start = max(x, starts[row])
+                end = min(x1, ends[row])
+                last = row + 1
+                while last < y1 and max(x, starts[last]) == start and min(x1, ends[last]) == end:
+                    last += 1
+                if end > start:
+                    windows.append((start, row, end - start, last - row))
+                row = last
+        return windows
+
+    # Get the dirty rectangle counters.  With circular on only the
+    # visible pixels count.
+    # returns: a dict with the last frame's rectangles, area and share
+    #          of the screen, and the average and largest area per frame
+    def dirty_stats(self):
+        screen = self.visible_pixels if self.circular else self.width * self.height
+        return {
+            'rects': self.pushed_rects,
+            'area': self.dirty_area,
+            'percent': self.dirty_area * 100 // screen,
+            'frames': self.dirty_frames,
+            'average_area': self.dirty_pixels // self.dirty_frames if self.dirty_frames else 0,
+            'max_area': self.dirty_max_area
+        }
+
+    # Reset the dirty rectangle counters
+    # returns: nothing
+    def reset_dirty_stats(self):
+        self.dirty_frames = 0
+        self.dirty_pixels = 0
+        self.dirty_max_area = 0
+
+    # Show the display.  The root group only has to be handed to
+    # displayio once, after that hidden layers and moved sprites are
+    # picked up by the next refresh.
     # returns: nothing
     def show(self):
-        for group in self.groups:
-            if not self.groups[group].hidden:
-                self.display.show(self.groups[group])
-            self.display.show(self.groups[group])
-            break
+        if not self._shown:
+            self.display.show(self.root)
+            self._shown = True
     
+# Context manager for GC9A01_Display.batch(), the scene is committed
+# even if building it raises
+class DisplayBatch(object):
+    def __init__(self, display):
+        self._display = display
+
+    def __enter__(self):
+        self._display.begin_scene()
+        return self._display
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._display.commit()
+        return False
+
 # CircuitPython class representing the Waveshare RP2040 1.28" 
 # development board.  This class is used to initialize the
 # display and the pins used to communicate with the display as 
@@ -407,9 +2509,60 @@ class GC9A01_Display(object):
 # It also has helper functions to make it easier to draw to the
 # display.
 class wsRP2040128(object):
+    # Tilt states, tilt_history stores their index
+    TILT_STATES = ('resting', 'tilt left', 'tilt right', 'tilt up', 'tilt down', 'twist left', 'twist right')
+    # Tilt commands, in the same order so a command and the tilt
+    # state it starts with share an index
+    TILT_COMMANDS = ('none', 'tilt left', 'tilt right', 'tilt up', 'tilt down', 'twist left', 'twist right')
+    # A tilt followed by the opposite tilt is a command, as
+    # (older state, newer state, command)
+    COMMAND_RULES = ((1, 2, 1), (2, 1, 2), (3, 4, 3), (4, 3, 4), (5, 6, 5), (6, 5, 6))
+    # The combos every screen understands
+    DEFAULT_COMBOS = (
+        ('LRL', ('twist left', 'twist right', 'twist left')),
+        ('RLR', ('twist right', 'twist left', 'twist right')),
+        ('UDU', ('tilt up', 'tilt down', 'tilt up')),
+        ('DUD', ('tilt down', 'tilt up', 'tilt down'))
+    )
+    # Scheduler tasks and their periods in seconds.  Gestures are
+    # recognized per sample inside the IMU task, so they run at the
+    # IMU rate.
+    TASK_PERIODS = (
+        ('imu', 1.0 / 200),
+        ('battery', 5.0),
+        ('display', 1.0 / 30)
+    )
+    # The stages timed when profiling is on, as (stage name, method)
+    PROFILED_STAGES = (
+        ('update', 'update'),
+        ('tick', 'tick'),
+        ('accelerometer', '_update_accelerometer'),
+        ('battery', '_update_battery'),
+        ('show', '_show')
+    )
+
     # Initialize the board
+    # initAccel: initialize the accelerometer
+    # initBattery: initialize the battery monitor
+    # initDisplay: initialize the display
+    # accelFifo: stream IMU samples through the hardware FIFO so
+    #            gestures see every sample, not just one per update
+    # accelInterrupt: only read the IMU when its data-ready (or FIFO
+    #                 watermark) interrupt has fired
+    # accelProfile: the QMI8658_Accelerometer.PROFILES entry to use,
+    #               'low-power', 'ui' or 'motion'
+    # historyDepth: how many tilt states and commands to remember (3+)
+    # sampleDepth: how many accelerometer/gyroscope samples to remember
+    # profiling: time each stage of update(), see enable_profiling()
+    # eventDepth: how many tilt, command and gesture events to queue
+    # frameRate: refresh the display at this rate instead of leaving
+    #            it to auto_refresh, see frame_pacing()
+    # dirtyRects: track what changes each frame in up to this many
+    #             rectangles, see GC9A01_Display.end_frame()
+    # roundDisplay: clip dirty rectangles and pushed windows to the
+    #               round panel, see GC9A01_Display.visible_span()
     # returns: nothing
-    def __init__(self,initAccel=True, initBattery=True, initDisplay=True):
+    def __init__(self,initAccel=True, initBattery=True, initDisplay=True, accelFifo=False, accelInterrupt=False, accelProfile='motion', historyDepth=16, sampleDepth=64, profiling=False, eventDepth=16, frameRate=None, roundDisplay=False, dirtyRects=0):
         # What we're actually gonna use
         self._use_display = initDisplay
         self._use_accel = initAccel
@@ -421,14 +2574,27 @@ class wsRP2040128(object):
         
         # Initialize hardware
         if(self._use_display):
-            self._display = GC9A01_Display(True)
+            self._display = GC9A01_Display(True, dirty=dirtyRects, circular=roundDisplay)
             # This is where we'll track our sprites
             self.sprites = {}
+
+        # Tilt, command and gesture events, see poll().  Tilt changes
+        # can come at the sample rate and would push gestures out of
+        # the queue, so they only go to subscribers unless
+        # self.events.kinds is changed.
+        self.events = EventQueue(eventDepth, EventQueue.COMMAND | EventQueue.GESTURE)
         
         if(self._use_accel):
-            self._qmi8658 =QMI8658_Accelerometer()
+            self._qmi8658 =QMI8658_Accelerometer(profile=accelProfile)
+            if(accelFifo):
+                self._qmi8658.fifo_enable()
+            if(accelInterrupt):
+                self._qmi8658.interrupt_enable()
             # The accelerometer revision
             self.qmi8658rev = self._qmi8658.rev
+            # Accelerometer (tenths of a g) and gyroscope (dps)
+            # readings, reused every pass so sampling doesn't allocate
+            self._ixyz = array('i', (0, 0, 0, 0, 0, 0))
             # Accelerometer data
             self.accel = {
                 'x': 0,
@@ -461,26 +2627,36 @@ class wsRP2040128(object):
                 'twist': 'none'
             }  
             
-            # Value of the current active tilt state
-            # as well as when it was recorded. Possible values are
-            # 'tilt up', 'tilt down', 'twist left', 'twist right'
-            # and 'resting' for the state.  The time is the time
-            # in seconds since the device was powered on.
-            self.tilt_state = {'state': 'resting', 'time': time.monotonic()}
-            # This is a list of the previous three tilt states
-            # and when they occurred.  This is used to determine
-            # if the user is shaking the device.
-            self.tilt_history = [
-                {'state': 'resting', 'time': time.monotonic()},
-                {'state': 'resting', 'time': time.monotonic()},
-                {'state': 'resting', 'time': time.monotonic()}
-            ]
+            # Value of the current active tilt state. Possible values
+            # are the entries of TILT_STATES.
+            self.tilt_state = 'resting'
+            self._tilt_code = -1
+            # The previous tilt states (as TILT_STATES indexes) and
+            # when they occurred.  This is used to determine if the
+            # user is shaking the device.
+            if historyDepth < 3:
+                raise Exception("historyDepth must be at least 3")
+            self.tilt_history = RingBuffer(historyDepth, 'b', timed=True)
+            self.tilt_history.fill(-1, ticks_ms())
+            # The current command and the previous commands (as
+            # TILT_COMMANDS indexes) and when they occurred
             self.cur_tilt_command = {'command': 'none', 'time': time.monotonic()}
-            self.tilt_command_history = [
-                {'command': 'none', 'time': time.monotonic()},
-                {'command': 'none', 'time': time.monotonic()},
-                {'command': 'none', 'time': time.monotonic()}
-            ]
+            self._command_code = 0
+            self.tilt_command_history = RingBuffer(historyDepth, 'b', timed=True)
+            self.tilt_command_history.fill(0, ticks_ms())
+            # Lookup table for COMMAND_RULES indexed by
+            # older state * len(TILT_STATES) + newer state
+            states = len(self.TILT_STATES)
+            self._command_table = bytearray(states * states)
+            for older, newer, command in self.COMMAND_RULES:
+                self._command_table[older * states + newer] = command
+            # Combo recognizer, fed every new command
+            self.gestures = GestureRecognizer(self.TILT_COMMANDS)
+            for name, commands in self.DEFAULT_COMBOS:
+                self.register_combo(name, commands)
+            # The most recent samples in integer units, accelerometer
+            # x, y, z then gyroscope x, y, z (see _process_sample)
+            self.sample_history = RingBuffer(sampleDepth, 'h', 6, timed=True)
             # And this is the flag for activating a "combination" aka LRL
             self.combination = ''
 
@@ -488,13 +2664,52 @@ class wsRP2040128(object):
             self._battery = Battery()
             # Battery data
             self.battery_voltage = 0.0
-            self.battery_percent = 0.0
+            self.battery_percent = 0
             self.battery_charging = False
+            # mV per minute, and minutes left (None while charging or
+            # until there are enough readings)
+            self.battery_trend = 0.0
+            self.battery_minutes_remaining = None
             self.battery_status = 'init'
 
         # Time tracker
         self.time = time.monotonic()
 
+        # Screens wait with this between steps unless they're running
+        # under asyncio, where combos also set _combo_event
+        self._pause_request = _Pause()
+        self._async = False
+        self._combo_event = None
+
+        # Frame pacing state, see frame_pacing().  _frame_due is only
+        # set while the display task is showing a frame.
+        self._next_frame = 0.0
+        self._frame_due = None
+
+        # Each subsystem runs at its own rate, see tick()
+        self.scheduler = Scheduler()
+        tasks = {
+            'imu': (self._use_accel, self._imu_task),
+            'battery': (self._use_battery, self._battery_task),
+            'display': (self._use_display, self._display_task)
+        }
+        for name, period in self.TASK_PERIODS:
+            used, callback = tasks[name]
+            if used:
+                self.scheduler.add(name, period, callback)
+        if(self._use_display and frameRate is not None):
+            self.frame_pacing(frameRate)
+
+        # Stage timers (None while profiling is off) and the stats
+        # overlay
+        self._profile = None
+        self._stats_overlay = None
+        self._stats_label = None
+        self._stats_interval = 1.0
+        self._stats_next = 0.0
+        if(profiling):
+            self.enable_profiling()
+
     # Passthrough method to draw a polygon on the display
     # sprite_id: text identifier for the sprite
     # points: a list of points that make up the polygon
@@ -578,6 +2793,44 @@ class wsRP2040128(object):
     def fill(self,color,group='default'):
         self.sprites['background'] = self._display.fill(color,group)
 
+    # Passthrough method to fill the round panel's visible disc
+    # color: the color to fill it with
+    # returns: nothing
+    def fill_disc(self,color,group='default'):
+        self.sprites['background'] = self._display.fill_disc(color,group)
+
+    # Passthrough method to add a layer on top of the others
+    # group: the name of the layer
+    # hidden: start with the layer hidden
+    # returns: nothing
+    def add_group(self,group,hidden=False):
+        self._display.add_group(group,hidden)
+
+    # Passthrough method to show a layer
+    # group: the name of the layer
+    # returns: nothing
+    def show_layer(self,group):
+        self._display.show_layer(group)
+
+    # Passthrough method to hide a layer
+    # group: the name of the layer
+    # returns: nothing
+    def hide_layer(self,group):
+        self._display.hide_layer(group)
+
+    # Passthrough method to move a layer above the others
+    # group: the name of the layer
+    # returns: nothing
+    def raise_layer(self,group):
+        self._display.raise_layer(group)
+
+    # Passthrough method to build a scene so it appears as one frame
+    #   with hardware.batch():
+    #       hardware.fill(...)
+    # returns: a context manager, see GC9A01_Display.batch()
+    def batch(self):
+        return self._display.batch()
+
     # Helper method to convert a color string to a color value
     # colstr: the color string
     # returns: the color value
@@ -660,46 +2913,51 @@ class wsRP2040128(object):
         b_steps = self._steps(start_rgb[2],end_rgb[2],steps)
         return [self._rgb_to_color([r_steps[i],g_steps[i],b_steps[i]]) for i in range(steps)]
     
+    # Passthrough method to calibrate the IMU.  Keep the board still
+    # while this runs, the offsets are stored in NVM and loaded the
+    # next time the board starts.
+    # samples: the number of samples to average
+    # returns: nothing
+    def calibrate(self, samples=64):
+        self._qmi8658.calibrate(samples)
+
     # Show the display
     # returns: nothing
     def _show(self):
         self._display.show()  
+        self._display.end_frame()
+        if self._display.target_fps is not None:
+            self._display.frame(self._frame_due)
     
-    # Update the accelerometer data
+    # Update the accelerometer data.  In FIFO mode every sample
+    # collected since the last pass is fed through the gesture logic,
+    # otherwise only the latest sample is read.
     # returns: nothing
     def _update_accelerometer(self):
-        xyz = self._qmi8658.read_xyz()
-        accel = {}
-        gyro = {}
+        if self._qmi8658.fifo_enabled:
+            batch = self._qmi8658.read_fifo()
+            for i in range(batch.count):
+                self._process_sample(self._qmi8658.batch_fixed(batch, i, self._ixyz))
+        else:
+            self._process_sample(self._qmi8658.read_fixed(self._ixyz))
+
+    # Run one accelerometer/gyroscope sample through the momentum,
+    # tilt and gesture logic.  Everything here is integer math, the
+    # IMU hands us tenths of a g and whole degrees per second.
+    # ixyz: the sample, accelerometer x, y, z then gyroscope x, y, z
+    # returns: nothing
+    def _process_sample(self, ixyz):
+        now = ticks_ms()
+        self.sample_history.append_from(ixyz, now)
+        accel = self.accel
+        gyro = self.gyro
         
-        accel['x'] = xyz[1]
-        accel['y'] = xyz[0]
-        accel['z'] = xyz[2]
-        gyro['x'] = xyz[3]
-        gyro['y'] = xyz[4]
-        gyro['z'] = xyz[5]       
-
-        # Note: my device seems to have some calibration
-        #       issues.  The values are not zeroed out
-        #       when the board is not moving.  I'm going
-        #       to try to compensate for this by subtracting
-        #       a calibration value.  Manual for now but 
-        #       I'll try to make this automatic in the future.
-        accel['x'] += 0.01
-        accel['y'] += 0.04
-        accel['z'] += 1.11
-        gyro['x'] -= 5.58
-        gyro['y'] += 45.55
-        gyro['z'] -= 0.20
-
-        # And now we'll convert everything to integers to make math 
-        # easier.  
-        accel['x'] = int(accel['x'] * 10)
-        accel['y'] = int(accel['y'] * -10)
-        accel['z'] = int(accel['z'] * 10)
-        gyro['x'] = int(gyro['x'])
-        gyro['y'] = int(gyro['y'])
-        gyro['z'] = int(gyro['z'])
+        accel['x'] = ixyz[1]
+        accel['y'] = -ixyz[0]
+        accel['z'] = ixyz[2]
+        gyro['x'] = ixyz[3]
+        gyro['y'] = ixyz[4]
+        gyro['z'] = ixyz[5]       
 
         # And now we'll update the momentum values
         self.momentum['x'] += accel['x']
@@ -741,90 +2999,62 @@ class wsRP2040128(object):
         # Now we need to update the tilt_state and
         # tilt_history values based on which axis is 
         # currently being tilted the strongest.
-        new_tilt_state = ''
-        if(abs(gyro['x']) > abs(gyro['y']) and abs(gyro['x']) > abs(gyro['z'])):
-            tilt_state = 'tilt ' + self.tilt['x']
-        elif(abs(gyro['y']) > abs(gyro['x']) and abs(gyro['y']) > abs(gyro['z'])):
-            tilt_state = 'tilt ' + self.tilt['y']
-        elif(abs(gyro['z']) > abs(gyro['x']) and abs(gyro['z']) > abs(gyro['y'])):
-            tilt_state = 'twist ' + self.tilt['twist']
+        abs_x = abs(gyro['x'])
+        abs_y = abs(gyro['y'])
+        abs_z = abs(gyro['z'])
+        if(abs_x > abs_y and abs_x > abs_z):
+            tilt_code = 2 if gyro['x'] > 0 else 1
+        elif(abs_y > abs_x and abs_y > abs_z):
+            tilt_code = 3 if gyro['y'] > 0 else 4
+        elif(abs_z > abs_x and abs_z > abs_y):
+            tilt_code = 5 if gyro['z'] > 0 else 6
         else:
-            tilt_state = 'resting'
-        if(tilt_state != self.tilt_state):
-            self.tilt_state = tilt_state
-            self.tilt_history.append(tilt_state)
-            if(len(self.tilt_history) > 3):
-                self.tilt_history.pop(0)    
+            tilt_code = 0
+        if(tilt_code != self._tilt_code):
+            self._tilt_code = tilt_code
+            self.tilt_state = self.TILT_STATES[tilt_code]
+            self.tilt_history.append(tilt_code, now)
+            self.events.push(EventQueue.TILT, tilt_code, self.tilt_state, now)
         
-        # And finally we'll check for command status
-        cur_tilt_command = {'command':'none'}
-        # if the last 3 readings are the same, we'll assume
-        # that the user is holding the board in that position
-        if self.tilt_history[0] == 'tilt left' and self.tilt_history[1] == 'tilt right':
-            cur_tilt_command = {'command':'tilt left', 'time':time.monotonic()}
-        elif self.tilt_history[0] == 'tilt right' and self.tilt_history[1] == 'tilt left':
-            cur_tilt_command = {'command':'tilt right', 'time':time.monotonic()}
-        elif self.tilt_history[0] == 'tilt up' and self.tilt_history[1] == 'tilt down':
-            cur_tilt_command = {'command':'tilt up', 'time':time.monotonic()}
-        elif self.tilt_history[0] == 'tilt down' and self.tilt_history[1] == 'tilt up':
-            cur_tilt_command = {'command':'tilt down', 'time':time.monotonic()}
-        elif self.tilt_history[0] == 'twist left' and self.tilt_history[1] == 'twist right':
-            cur_tilt_command = {'command':'twist left', 'time':time.monotonic()}
-        elif self.tilt_history[0] == 'twist right' and self.tilt_history[1] == 'twist left':
-            cur_tilt_command = {'command':'twist right', 'time':time.monotonic()}
-        else:
-            # self.cur_tilt_command = 'resting'
-            pass
-        
-        if cur_tilt_command['command'] != 'none':
-            if cur_tilt_command['command'] != self.cur_tilt_command['command']:
-                self.cur_tilt_command = cur_tilt_command
-                self.tilt_command_history.append(cur_tilt_command)
-                if(len(self.tilt_command_history) > 3):
-                    self.tilt_command_history.pop(0)    
-
-        # Look for combinations that have occurred in the last 2 seconds
-        if (
-            self.tilt_command_history[0]['command'] == 'twist left' and
-            self.tilt_command_history[1]['command'] == 'twist right' and
-            self.tilt_command_history[2]['command'] == 'twist left' and
-            time.monotonic() - self.tilt_command_history[0]['time'] < 2
-        ):
-            self.combination = 'LRL'
-
-        if (
-            self.tilt_command_history[0]['command'] == 'twist right' and
-            self.tilt_command_history[1]['command'] == 'twist left' and
-            self.tilt_command_history[2]['command'] == 'twist right' and
-            time.monotonic() - self.tilt_command_history[0]['time'] < 2
-        ):
-            self.combination = 'RLR'
-
-        if (
-            self.tilt_command_history[0]['command'] == 'tilt up' and
-            self.tilt_command_history[1]['command'] == 'tilt down' and
-            self.tilt_command_history[2]['command'] == 'tilt up' and
-            time.monotonic() - self.tilt_command_history[0]['time'] < 2
-        ):
-            self.combination = 'UDU'
-        if (
-            self.tilt_command_history[0]['command'] == 'tilt up' and
-            self.tilt_command_history[1]['command'] == 'tilt down' and
-            self.tilt_command_history[2]['command'] == 'tilt up' and
-            time.monotonic() - self.tilt_command_history[0]['time'] < 2
-        ):
-            self.combination = 'DUD'
-
-        if self.combination != '':
-            print('combination: {}'.format(self.combination))
-            self.tilt_command_history = [
-                {'command':'none', 'time':time.monotonic()},
-                {'command':'none', 'time':time.monotonic()},
-                {'command':'none', 'time':time.monotonic()}
-            ]
+        # And finally we'll check for command status.  We look at
+        # the two states before the newest one
+        older = self.tilt_history.get(2)
+        newer = self.tilt_history.get(1)
+        command_code = 0
+        if older >= 0 and newer >= 0:
+            command_code = self._command_table[older * len(self.TILT_STATES) + newer]
         
-        self.accel = accel
-        self.gyro = gyro
+        # New commands go to the history and the combo recognizer
+        if command_code != 0 and command_code != self._command_code:
+            self._command_code = command_code
+            self.cur_tilt_command['command'] = self.TILT_COMMANDS[command_code]
+            self.cur_tilt_command['time'] = time.monotonic()
+            self.tilt_command_history.append(command_code, now)
+            self.events.push(EventQueue.COMMAND, command_code, self.TILT_COMMANDS[command_code], now)
+            combo = self.gestures.advance(command_code, now)
+        else:
+            combo = self.gestures.expire(now)
+        if combo is not None:
+            self.events.push(EventQueue.GESTURE, self._command_code, combo, now)
+
+    # Register a combo of tilt commands
+    # name: the name reported when the combo fires
+    # commands: the sequence of TILT_COMMANDS names
+    # window: the whole sequence must happen within this many seconds
+    # callback: called with the name when the combo fires, by default
+    #           the name is stored in self.combination
+    # returns: nothing
+    def register_combo(self, name, commands, window=2.0, callback=None):
+        if callback is None:
+            callback = self._set_combination
+        self.gestures.register_combo(name, commands, window, callback)
+
+    # Default combo callback, flags the combo for the screens
+    # name: the combo that fired
+    # returns: nothing
+    def _set_combination(self, name):
+        print('combination: {}'.format(name))
+        self.combination = name
 
     # Update the battery data 
     # returns: nothing
@@ -832,6 +3062,8 @@ class wsRP2040128(object):
         self.battery_voltage = self._battery.voltage
         self.battery_percent = self._battery.percent
         self.battery_charging = self._battery.charging
+        self.battery_trend = self._battery.trend
+        self.battery_minutes_remaining = self._battery.minutes_remaining
         if self.battery_charging:
             self.battery_status = 'chg'
         else:
@@ -840,72 +3072,423 @@ class wsRP2040128(object):
     # Update the hardware on the board for this pass
     # returns: nothing
     def update(self):
-        if(self._use_accel):
+        if(self._use_accel and self._qmi8658.data_ready()):
             self._update_accelerometer()
         if(self._use_battery):
             self._update_battery()
         if(self._use_display):
             self._show()
 
+    # Scheduler task: read the IMU when it has new data.  Looks the
+    # stage up on every run so profiling wrappers are picked up.
+    # returns: nothing
+    def _imu_task(self):
+        # In wake-on-motion mode (off() under asyncio) the IMU is left
+        # alone, reading it would keep the bus busy and the FIFO only
+        # holds accelerometer frames then
+        if self._qmi8658.low_power:
+            return
+        if self._qmi8658.data_ready():
+            self._update_accelerometer()
+
+    # Scheduler task: read the battery
+    # returns: nothing
+    def _battery_task(self):
+        self._update_battery()
+
+    # Scheduler task: show the display.  Paced frames are kept on a
+    # fixed grid so a late frame doesn't push the later ones back.
+    # returns: when the next paced frame is due, None without pacing
+    def _display_task(self):
+        if self._display.target_fps is None:
+            self._show()
+            return None
+        period = 1.0 / self._display.target_fps
+        due = self._next_frame
+        self._frame_due = due
+        self._show()
+        self._frame_due = None
+        now = time.monotonic()
+        self._next_frame = due + period
+        if self._next_frame <= now:
+            self._next_frame += period * (int((now - self._next_frame) / period) + 1)
+        return self._next_frame
+
+    # Refresh the display at a fixed frame rate from the display task
+    # instead of leaving it to auto_refresh, see
+    # GC9A01_Display.pace_frames()
+    # fps: the frame rate, None goes back to auto_refresh
+    # minimum_fps: frames slower than this are counted as late
+    # returns: nothing
+    def frame_pacing(self, fps=30, minimum_fps=0):
+        self._display.pace_frames(fps, minimum_fps)
+        self._next_frame = time.monotonic()
+        if fps is None:
+            for name, period in self.TASK_PERIODS:
+                if name == 'display':
+                    fps = 1.0 / period
+        self.scheduler.set_period('display', 1.0 / fps)
+
+    # Run the subsystems that are due, unlike update() which runs
+    # all of them every pass
+    # returns: when the next task is due (time.monotonic() time),
+    #          None if there are no tasks
+    def tick(self):
+        return self.scheduler.run_due()
+
+    # Run the scheduler for a while, sleeping until the next task is
+    # due in between.  Screens call this once per animation step.
+    # duration: the time to run for in seconds, at least one tick()
+    #           runs even when this is 0
+    # returns: nothing
+    def run_for(self, duration):
+        end = time.monotonic() + duration
+        while True:
+            next_due = self.tick()
+            now = time.monotonic()
+            if now >= end:
+                return
+            if next_due is None or next_due > end:
+                next_due = end
+            if next_due > now:
+                time.sleep(next_due - now)
+
+    # What a screen awaits between steps: asyncio.sleep() under
+    # asyncio, otherwise a request for _run_screen to run the
+    # scheduler
+    # duration: the time to wait in seconds
+    # returns: an awaitable
+    def _pause(self, duration):
+        if self._async:
+            return asyncio.sleep(duration)
+        self._pause_request.duration = duration
+        return self._pause_request
+
+    # Wait for the next combo
+    # sleep_time: how long to wait between checks without asyncio
+    # returns: the name of the combo
+    async def _next_combo(self, sleep_time=0.05):
+        while True:
+            event = self.events.poll(EventQueue.GESTURE)
+            if event is not None:
+                return event.name
+            if self._combo_event is not None:
+                await self._combo_event.wait()
+                self._combo_event.clear()
+            else:
+                await self._pause(sleep_time)
+
+    # Check whether a combo was entered since the last check, other
+    # queued combos are discarded
+    # name: the combo to look for
+    # returns: True if it was entered
+    def _combo_entered(self, name):
+        event = self.events.poll(EventQueue.GESTURE)
+        while event is not None:
+            if event.name == name:
+                return True
+            event = self.events.poll(EventQueue.GESTURE)
+        return False
+
+    # Wake screens waiting in _next_combo under asyncio
+    # event: the gesture event
+    # returns: nothing
+    def _wake_screens(self, event):
+        self._combo_event.set()
+
+    # Take the oldest queued input event
+    # kinds: a mask of EventQueue.TILT, COMMAND and GESTURE, events
+    #        of other kinds ahead of the one returned are discarded
+    # returns: an InputEvent (reused by the next poll), or None
+    def poll(self, kinds=EventQueue.ALL):
+        return self.events.poll(kinds)
+
+    # Wait for an input event, running the scheduler meanwhile
+    # timeout: seconds to wait, None waits forever
+    # kinds: a mask of the kinds to wait for
+    # returns: an InputEvent (reused by the next poll), or None if
+    #          the timeout passed first
+    def wait(self, timeout=None, kinds=EventQueue.ALL):
+        end = None
+        if timeout is not None:
+            end = time.monotonic() + timeout
+        while True:
+            event = self.events.poll(kinds)
+            if event is not None:
+                return event
+            next_due = self.tick()
+            event = self.events.poll(kinds)
+            if event is not None:
+                return event
+            now = time.monotonic()
+            if end is not None:
+                if now >= end:
+                    return None
+                if next_due is None or next_due > end:
+                    next_due = end
+            if next_due is not None and next_due > now:
+                time.sleep(next_due - now)
+
+    # Call a function for every new input event as it happens
+    # callback: called with an InputEvent, which is reused
+    # kinds: a mask of the kinds to be called for
+    # returns: nothing
+    def subscribe(self, callback, kinds=EventQueue.ALL):
+        self.events.subscribe(callback, kinds)
+
+    # Stop calling a subscriber
+    # callback: the function passed to subscribe()
+    # returns: nothing
+    def unsubscribe(self, callback):
+        self.events.unsubscribe(callback)
+
+    # Run a screen coroutine without asyncio, running the scheduler
+    # whenever it pauses
+    # screen: the coroutine
+    # returns: nothing
+    def _run_screen(self, screen):
+        try:
+            while True:
+                pause = screen.send(None)
+                self.run_for(pause.duration)
+        except StopIteration:
+            pass
+
+    # Run a scheduler task as an asyncio task
+    # period: seconds between runs
+    # callback: the task, it can return when it next wants to run
+    # returns: nothing, runs until cancelled
+    async def _every(self, period, callback):
+        next_due = time.monotonic()
+        while True:
+            due = callback()
+            if due is None:
+                next_due += period
+            else:
+                next_due = due
+            now = time.monotonic()
+            if next_due <= now:
+                next_due = now
+            await asyncio.sleep(next_due - now)
+
+    # Run a screen under asyncio.  The scheduler tasks (IMU sampling
+    # and gestures, battery, display) become asyncio tasks of their
+    # own, and the screen runs as another task that awaits combos.
+    # Other coroutines can be passed in to run alongside them.
+    # screen: the screen method to run, e.g. 'main_menu'
+    # args: arguments for the screen
+    # tasks: extra coroutines to run until the screen returns
+    # returns: nothing
+    def run_async(self, screen='main_menu', args=(), tasks=()):
+        if asyncio is None:
+            raise Exception("asyncio is not available")
+        asyncio.run(self._async_main(screen, args, tasks))
+
+    async def _async_main(self, screen, args, tasks):
+        screens = {
+            'demo': self._demo_screen,
+            'ball_demo': self._ball_screen,
+            'banner_demo': self._banner_screen,
+            'old_menu': self._old_menu_screen,
+            'off': self._off_screen,
+            'main_menu': self._main_menu_screen
+        }
+        self._async = True
+        self._combo_event = asyncio.Event()
+        # Bound methods aren't always equal to each other, keep the one
+        # subscribed so it can be unsubscribed
+        wake = self._wake_screens
+        self.events.subscribe(wake, EventQueue.GESTURE)
+        running = []
+        try:
+            for name, period, callback in self.scheduler.tasks():
+                running.append(asyncio.create_task(self._every(period, callback)))
+            for task in tasks:
+                running.append(asyncio.create_task(task))
+            await screens[screen](*args)
+        finally:
+            for task in running:
+                task.cancel()
+            self.events.unsubscribe(wake)
+            self._async = False
+            self._combo_event = None
+
+    # Start timing each stage of update().  The stage methods are
+    # swapped for timed wrappers on this instance, so nothing is
+    # measured (or costs anything) while profiling is off.
+    # returns: nothing
+    def enable_profiling(self):
+        if self._profile is not None:
+            return
+        self._profile = {}
+        for stage, name in self.PROFILED_STAGES:
+            timer = StageTimer()
+            self._profile[stage] = timer
+            after = self._update_stats_overlay if stage == 'show' else None
+            setattr(self, name, self._timed(getattr(self, name), timer, after))
+
+    # Stop timing and put the plain stage methods back
+    # returns: nothing
+    def disable_profiling(self):
+        if self._profile is None:
+            return
+        self.stats_overlay(False)
+        for stage, name in self.PROFILED_STAGES:
+            delattr(self, name)
+        self._profile = None
+
+    # Wrap a method so each call is timed
+    # method: the bound method to time
+    # timer: the StageTimer to record into
+    # after: called after each timed call, None for nothing
+    # returns: the wrapper
+    def _timed(self, method, timer, after=None):
+        def timed():
+            start = time.monotonic_ns()
+            result = method()
+            timer.add(time.monotonic_ns() - start)
+            if after is not None:
+                after()
+            return result
+        return timed
+
+    # Get the profiling counters
+    # returns: a dict with a StageTimer report for each stage (when
+    #          profiling is on) and the IMU bus lock spin count
+    def stats(self):
+        result = {}
+        if self._profile is not None:
+            for stage in self._profile:
+                result[stage] = self._profile[stage].report()
+        if(self._use_accel):
+            result['lock_spins'] = self._qmi8658.lock_spins
+        if(self._use_display and self._display.target_fps is not None):
+            result['display'] = self._display.frame_stats()
+        if(self._use_display and self._display.dirty_limit):
+            result['dirty'] = self._display.dirty_stats()
+        return result
+
+    # Reset the profiling counters
+    # returns: nothing
+    def reset_stats(self):
+        if self._profile is not None:
+            for stage in self._profile:
+                self._profile[stage].reset()
+        if(self._use_accel):
+            self._qmi8658.lock_spins = 0
+        if(self._use_display):
+            self._display.reset_frame_stats()
+            self._display.reset_dirty_stats()
+
+    # Show or hide the profiling stats on screen.  The overlay is a
+    # 'stats' layer kept on top of the others and refreshed after
+    # _show() at most once per interval.  Turns profiling on.
+    # show: True to show the overlay, False to remove it
+    # interval: seconds between overlay refreshes
+    # returns: nothing
+    def stats_overlay(self, show=True, interval=1.0):
+        if not self._use_display:
+            return
+        if show:
+            self.enable_profiling()
+            self._stats_interval = interval
+            if self._stats_overlay is None:
+                self._stats_label = label.Label(terminalio.FONT, text='', color=0x00FF00)
+                self._stats_label.x = 70
+                self._stats_label.y = 150
+                self._stats_overlay = self._display.add_group('stats')
+                self._stats_overlay.append(self._stats_label)
+                self._stats_next = 0.0
+            self._display.show_layer('stats')
+        elif self._stats_overlay is not None:
+            self._display.hide_layer('stats')
+            self._stats_overlay.remove(self._stats_label)
+            self._stats_overlay = None
+            self._stats_label = None
+
+    # Refresh the stats overlay if it's due
+    # returns: nothing
+    def _update_stats_overlay(self):
+        if self._stats_overlay is None:
+            return
+        now = time.monotonic()
+        if now < self._stats_next:
+            return
+        self._stats_next = now + self._stats_interval
+        profile = self._profile
+        spins = self._qmi8658.lock_spins if self._use_accel else 0
+        self._stats_label.text = "upd {}/{}us\nimu {}/{}us\nbat {}/{}us\nshw {}/{}us\nspin {}".format(
+            profile['update'].average // 1000, profile['update'].max // 1000,
+            profile['accelerometer'].average // 1000, profile['accelerometer'].max // 1000,
+            profile['battery'].average // 1000, profile['battery'].max // 1000,
+            profile['show'].average // 1000, profile['show'].max // 1000,
+            spins)
+        # Stay above any layers added since
+        self._display.raise_layer('stats')
+
     # Demo code - run in the main loop, works if
     # you turn off hardware still.
     # sleep_time: the time to sleep between updates
     # returns: nothing
     def demo(self, sleep_time=0.05):
+        self._run_screen(self._demo_screen(sleep_time))
+
+    async def _demo_screen(self, sleep_time=0.05):
         if(self._use_display):
-            # Fill the background with black
-            self.draw_rectangle("demobg",0,0,240,240,self.color('black'))
-            # Draw the title bar
-            self.draw_rectangle("title",0,0,240,40,self.color('red'))
-            self.draw_text("title_text", 60, 25, "WS RP2040 1.28 Demo", self.color('white'), terminalio.FONT)
-            # Draw the status bar
-            if(self._use_battery):
-                self.draw_rectangle("battery",0,40,240,30,self.color('blue'))
-                self.draw_text("charge_text", 20, 55, "Chg: {}".format(self.battery_status), self.color('white'), terminalio.FONT)
-                self.draw_text("volt_text", 90, 55, "Vol: {:.2f}v".format(self.battery_voltage), self.color('white'), terminalio.FONT)
-            if(self._use_accel):
-                self.draw_text("rev_text", 160, 55, "ARev: {}".format(self.qmi8658rev), self.color('white'), terminalio.FONT)
-            # Draw all accel data
-            if(self._use_accel):
-                # Draw the accelerometer data
-                self.draw_rectangle("accelerometer",0,70,60,60,self.color('green'))
-                self.draw_text("accelerometer_text", 20, 85, "Accel", self.color('black'), terminalio.FONT)
-                self.draw_text("accel_x", 20, 95, "X: 0", self.color('black'), terminalio.FONT)
-                self.draw_text("accel_y", 20, 105, "Y: 0", self.color('black'), terminalio.FONT)
-                self.draw_text("accel_z", 20, 115, "Z: 0", self.color('black'), terminalio.FONT)
-                # Draw the gyroscope data
-                self.draw_rectangle("gyroscope",60,70,60,60,self.color('orange'))
-                self.draw_text("gyroscope_text", 80, 85, "Gyro", self.color('black'), terminalio.FONT)
-                self.draw_text("gyro_x", 80, 95, "X: 0", self.color('black'), terminalio.FONT)
-                self.draw_text("gyro_y", 80, 105, "Y: 0", self.color('black'), terminalio.FONT)
-                self.draw_text("gyro_z", 80, 115, "Z: 0", self.color('black'), terminalio.FONT)
-                # Draw the Tilt data
-                self.draw_rectangle("momentum",120,70,60,60,self.color('magenta'))
-                self.draw_text("momentum_text", 140, 85, "Tilt", self.color('black'), terminalio.FONT)
-                self.draw_text("mom_x", 140, 95, "X: 0", self.color('black'), terminalio.FONT)
-                self.draw_text("mom_y", 140, 105, "Y: 0", self.color('black'), terminalio.FONT)
-                self.draw_text("mom_z", 140, 115, "Z: 0", self.color('black'), terminalio.FONT)
-                # Draw current tilt status and command
-                self.draw_rectangle("tilt_status",180,70,60,60,self.color('cyan'))
-                self.draw_text("tilt_status_text", 200, 85, "Stat", self.color('black'), terminalio.FONT)
-                self.draw_text("tilt_status", 200, 95, "resting", self.color('black'), terminalio.FONT)
-                self.draw_text("tilt_command", 200, 105, "resting", self.color('black'), terminalio.FONT)
-            # Draw a cicle
-            self.draw_circle("circle", 40, 170, 20, self.color('yellow'))
-            # Draw a polygon
-            points = [
-                (15,0),
-                (11,10),
-                (0,10),
-                (8,20),
-                (5,29),
-                (15,21),
-                (25,29),
-                (22,20),
-                (29,10),
-                (19,10)
-            ]
-            self.draw_polygon("polygon", points, 160, 160, self.color('brown'))
+            with self.batch():
+                # Fill the background with black
+                self.draw_rectangle("demobg",0,0,240,240,self.color('black'))
+                # Draw the title bar
+                self.draw_rectangle("title",0,0,240,40,self.color('red'))
+                self.draw_text("title_text", 60, 25, "WS RP2040 1.28 Demo", self.color('white'), terminalio.FONT)
+                # Draw the status bar
+                if(self._use_battery):
+                    self.draw_rectangle("battery",0,40,240,30,self.color('blue'))
+                    self.draw_text("charge_text", 20, 55, "Chg: {}".format(self.battery_status), self.color('white'), terminalio.FONT)
+                    self.draw_text("volt_text", 90, 55, "Vol: {:.2f}v".format(self.battery_voltage), self.color('white'), terminalio.FONT)
+                if(self._use_accel):
+                    self.draw_text("rev_text", 160, 55, "ARev: {}".format(self.qmi8658rev), self.color('white'), terminalio.FONT)
+                # Draw all accel data
+                if(self._use_accel):
+                    # Draw the accelerometer data
+                    self.draw_rectangle("accelerometer",0,70,60,60,self.color('green'))
+                    self.draw_text("accelerometer_text", 20, 85, "Accel", self.color('black'), terminalio.FONT)
+                    self.draw_text("accel_x", 20, 95, "X: 0", self.color('black'), terminalio.FONT)
+                    self.draw_text("accel_y", 20, 105, "Y: 0", self.color('black'), terminalio.FONT)
+                    self.draw_text("accel_z", 20, 115, "Z: 0", self.color('black'), terminalio.FONT)
+                    # Draw the gyroscope data
+                    self.draw_rectangle("gyroscope",60,70,60,60,self.color('orange'))
+                    self.draw_text("gyroscope_text", 80, 85, "Gyro", self.color('black'), terminalio.FONT)
+                    self.draw_text("gyro_x", 80, 95, "X: 0", self.color('black'), terminalio.FONT)
+                    self.draw_text("gyro_y", 80, 105, "Y: 0", self.color('black'), terminalio.FONT)
+                    self.draw_text("gyro_z", 80, 115, "Z: 0", self.color('black'), terminalio.FONT)
+                    # Draw the Tilt data
+                    self.draw_rectangle("momentum",120,70,60,60,self.color('magenta'))
+                    self.draw_text("momentum_text", 140, 85, "Tilt", self.color('black'), terminalio.FONT)
+                    self.draw_text("mom_x", 140, 95, "X: 0", self.color('black'), terminalio.FONT)
+                    self.draw_text("mom_y", 140, 105, "Y: 0", self.color('black'), terminalio.FONT)
+                    self.draw_text("mom_z", 140, 115, "Z: 0", self.color('black'), terminalio.FONT)
+                    # Draw current tilt status and command
+                    self.draw_rectangle("tilt_status",180,70,60,60,self.color('cyan'))
+                    self.draw_text("tilt_status_text", 200, 85, "Stat", self.color('black'), terminalio.FONT)
+                    self.draw_text("tilt_status", 200, 95, "resting", self.color('black'), terminalio.FONT)
+                    self.draw_text("tilt_command", 200, 105, "resting", self.color('black'), terminalio.FONT)
+                # Draw a cicle
+                self.draw_circle("circle", 40, 170, 20, self.color('yellow'))
+                # Draw a polygon
+                points = [
+                    (15,0),
+                    (11,10),
+                    (0,10),
+                    (8,20),
+                    (5,29),
+                    (15,21),
+                    (25,29),
+                    (22,20),
+                    (29,10),
+                    (19,10)
+                ]
+                self.draw_polygon("polygon", points, 160, 160, self.color('brown'))
         else:
             print("Display not intialized")
 
@@ -934,14 +3517,11 @@ class wsRP2040128(object):
                 else:
                     self.sprites['title_text'].x -= 1
 
-                # Update sprite, spritecounter and display    
-                if(self.time + sleep_time) < time.monotonic():
-                    self.update()
-                    self.time = time.monotonic()
+            # Let the sensors and display run until the next step
+            await self._pause(sleep_time)
 
             # Break    
-            if(self.combination == 'LRL'):
-                self.combination = ''
+            if(self._combo_entered('LRL')):
                 sprites = [
                     'demobg',
                     'title',
@@ -986,11 +3566,15 @@ class wsRP2040128(object):
     # sleep_time: the time to sleep between updates
     # returns: nothing
     def ball_demo(self, sleep_time=0.05):
+        self._run_screen(self._ball_screen(sleep_time))
+
+    async def _ball_screen(self, sleep_time=0.05):
         # Initializations
-        self.combination = ''
-        self.draw_rectangle("ballbg", 0,0,240,240,self.color('blue'))
-        self.draw_rectangle("table", 35,35,170,170,self.color('orange'))
-        self.draw_circle("ball", 120, 120, 10, self.color('purple'))
+        self.events.clear()
+        with self.batch():
+            self.draw_rectangle("ballbg", 0,0,240,240,self.color('blue'))
+            self.draw_rectangle("table", 35,35,170,170,self.color('orange'))
+            self.draw_circle("ball", 120, 120, 10, self.color('purple'))
         
         while True:
             # Main game loop
@@ -1014,16 +3598,13 @@ class wsRP2040128(object):
                 self.momentum['x'] = 0
                 self.momentum['y'] = 0
 
-            self.update() 
+            await self._pause(sleep_time)
 
-            if(self.combination == 'LRL'):
-                self.combination = ''
+            if(self._combo_entered('LRL')):
                 self._display.groups['default'].remove(self.sprites['ballbg'])
                 self._display.groups['default'].remove(self.sprites['table'])
                 self._display.groups['default'].remove(self.sprites['ball'])
                 break
-        
-            time.sleep(sleep_time)
 
      # Demo using drawing and accelerator.  We're creating
     
@@ -1033,18 +3614,22 @@ class wsRP2040128(object):
     # sleep_time: the time to sleep between updates
     # returns: nothing
     def banner_demo(self, banner_text, sleep_time=0.05):
-        self.combination = ''
-        self.draw_rectangle("bannerbg", 0,0,240,240,self.color('black'))
+        self._run_screen(self._banner_screen(banner_text, sleep_time))
+
+    async def _banner_screen(self, banner_text, sleep_time=0.05):
+        self.events.clear()
+        with self.batch():
+            self.draw_rectangle("bannerbg", 0,0,240,240,self.color('black'))
         
-        # We are going to draw the badge rim by making a series of concentric circles
-        # starting with the outermost circle and working our way in.  We'll use the 
-        # fade method to give the circles a 3d effect.
-        cfarr = self.fade(self.color('orange'), self.color('white'), 9)
-        colorfade = cfarr + cfarr[::-1] + [self.color('black')]
-        for i in range(0, len(colorfade)):
-            self.draw_circle("rim_{}".format(i), 120, 120, 120-i, colorfade[i])
-
-        self.draw_text("banner_text", 0, 100, banner_text, self.color('magenta'), bitmap_font.load_font("font/mfbold.bdf"))
+            # We are going to draw the badge rim by making a series of concentric circles
+            # starting with the outermost circle and working our way in.  We'll use the 
+            # fade method to give the circles a 3d effect.
+            cfarr = self.fade(self.color('orange'), self.color('white'), 9)
+            colorfade = cfarr + cfarr[::-1] + [self.color('black')]
+            for i in range(0, len(colorfade)):
+                self.draw_circle("rim_{}".format(i), 120, 120, 120-i, colorfade[i])
+
+            self.draw_text("banner_text", 0, 100, banner_text, self.color('magenta'), bitmap_font.load_font("font/mfbold.bdf"))
         
         while True:
             # Main game loop
@@ -1056,17 +3641,14 @@ class wsRP2040128(object):
             if (self.sprites['banner_text'].x < (0 - self.sprites['banner_text'].width)):
                 self.sprites['banner_text'].x = 240
             
-            self.update() 
+            await self._pause(sleep_time)
 
-            if(self.combination == 'LRL'):
-                self.combination = ''
+            if(self._combo_entered('LRL')):
                 self._display.groups['default'].remove(self.sprites['bannerbg'])
                 self._display.groups['default'].remove(self.sprites['banner_text'])
                 for i in range(0, len(colorfade)):
                     self._display.groups['default'].remove(self.sprites['rim_{}'.format(i)])
                 break
-        
-            time.sleep(sleep_time)
 
     # a ball that reads the accelerometer and moves around
     # the screen.  When it falls off the table,
@@ -1074,14 +3656,20 @@ class wsRP2040128(object):
     # sleep_time: the time to sleep between updates
     # returns: nothing
     def old_menu(self, sleep_time=0.05):
-        # Initializations
-        self.fill(self.color('black'))
-        self.draw_text("prompt_text", 70, 100, "Tilt to choose:", self.color('white'), terminalio.FONT)
-        self.draw_text("bottom_choice_text", 100, 220, "Banner", self.color('white'), terminalio.FONT)
-        self.draw_text("top_choice_text", 90, 10, "Settings", self.color('white'), terminalio.FONT)
-        self.draw_text("left_choice_text", 10, 100, "Games", self.color('white'), terminalio.FONT)
-        self.draw_text("right_choice_text", 220, 100, "Off", self.color('white'), terminalio.FONT)
-        self.draw_circle("cursor", 120, 120, 5, self.color('white'))
+        self._run_screen(self._old_menu_screen(sleep_time))
+
+    async def _old_menu_screen(self, sleep_time=0.05):
+        # Initializations.  The menu is its own layer, hidden while
+        # one of its screens runs underneath.
+        with self.batch():
+            self.add_group('old_menu')
+            self.fill(self.color('black'), 'old_menu')
+            self.draw_text("prompt_text", 70, 100, "Tilt to choose:", self.color('white'), terminalio.FONT, 'old_menu')
+            self.draw_text("bottom_choice_text", 100, 220, "Banner", self.color('white'), terminalio.FONT, 'old_menu')
+            self.draw_text("top_choice_text", 90, 10, "Settings", self.color('white'), terminalio.FONT, 'old_menu')
+            self.draw_text("left_choice_text", 10, 100, "Games", self.color('white'), terminalio.FONT, 'old_menu')
+            self.draw_text("right_choice_text", 220, 100, "Off", self.color('white'), terminalio.FONT, 'old_menu')
+            self.draw_circle("cursor", 120, 120, 5, self.color('white'), 'old_menu')
         
         while True:
             # Main game loop
@@ -1101,56 +3689,62 @@ class wsRP2040128(object):
                 self.momentum['y'] = 0
             
             def remove_sprites():
-                self._display.groups['default'].remove(self.sprites['prompt_text'])
-                self._display.groups['default'].remove(self.sprites['bottom_choice_text'])
-                self._display.groups['default'].remove(self.sprites['top_choice_text'])
-                self._display.groups['default'].remove(self.sprites['left_choice_text'])
-                self._display.groups['default'].remove(self.sprites['right_choice_text'])
-                self._display.groups['default'].remove(self.sprites['cursor'])
+                self.hide_layer('old_menu')
                 
             def add_sprites():
                 reset_cursor()
-                self._display.groups['default'].append(self.sprites['prompt_text'])
-                self._display.groups['default'].append(self.sprites['bottom_choice_text'])
-                self._display.groups['default'].append(self.sprites['top_choice_text'])
-                self._display.groups['default'].append(self.sprites['left_choice_text'])
-                self._display.groups['default'].append(self.sprites['right_choice_text'])
-                self._display.groups['default'].append(self.sprites['cursor'])
+                self.show_layer('old_menu')
 
             # Check for collision with the walls
             if (self.sprites['cursor'].x < 22):
                 # left option
                 remove_sprites()
-                self.ball_demo()
+                await self._ball_screen()
                 add_sprites()
             elif (self.sprites['cursor'].x > 215):
                 # right option
                 remove_sprites()
-                self.ball_demo()
+                await self._ball_screen()
                 add_sprites()
             elif(self.sprites['cursor'].y < 22):
                 remove_sprites()
-                self.demo()
+                await self._demo_screen()
                 add_sprites()  
             elif(self.sprites['cursor'].y > 215):
                 remove_sprites()
-                self.banner_demo('Easily Amused')
+                await self._banner_screen('Easily Amused')
                 add_sprites()
-            self.update()        
-            time.sleep(sleep_time)
+            await self._pause(sleep_time)
+
+    # Turn off the backlight to save power.  The IMU drops into its
+    # low-power wake-on-motion mode and we sleep until the board is
+    # moved, then give the user a moment to enter LRL to wake up.
+    # sleep_time: the time to sleep between updates while awake
+    # wake_time: how long to listen for LRL after motion
+    # returns: nothing
+    def off(self, sleep_time=0.05, wake_time=2.0):
+        self._run_screen(self._off_screen(sleep_time, wake_time))
 
-    # Turn off the backlight to save power
-    def off(self, sleep_time=0.05):
+    async def _off_screen(self, sleep_time=0.05, wake_time=2.0):
         # Initializations
-        self.combination = ''
+        self.events.clear()
         self._display.off()
         while True:
-            if(self.combination == 'LRL'):
-                self._display.on()
-                self.combination = ''
-                break
-        
-            time.sleep(sleep_time)
+            if(self._use_accel):
+                self._qmi8658.low_power_enable()
+                if self._async:
+                    # Light sleep would stall every other task
+                    while not self._qmi8658.motion_detected():
+                        await self._pause(0.1)
+                else:
+                    self._qmi8658.wait_for_motion()
+                self._qmi8658.low_power_disable()
+            listen_until = time.monotonic() + wake_time
+            while time.monotonic() < listen_until:
+                await self._pause(sleep_time)
+                if(self._combo_entered('LRL')):
+                    self._display.on()
+                    return
     # New menu.  User is presented with options to choose from.  
     # User can select which option to choose by tilting the board
     # backwards and forwards.  If the user does not make a selection
@@ -1159,15 +3753,22 @@ class wsRP2040128(object):
     # sleep_time: the time to sleep between updates
     # returns: nothing
     def main_menu(self, sleep_time=0.05):
-        self.combination = ''
-        self.fill(self.color('black'))
-        self.draw_text("prompt_text", 40, 80, "Please choose an option:", self.color('white'), terminalio.FONT)
-        choices = ['Banner', 'Settings', 'Games', 'Off']
-        selection = 0
-        for i in range(0, len(choices)):
-            self.draw_text("choice_{}".format(i), 100, 100 + (i * 20), choices[i], self.color('white'), terminalio.FONT)
-
-        self.draw_text("selector", 90, 100, "*", self.color('white'), terminalio.FONT)
+        self._run_screen(self._main_menu_screen(sleep_time))
+
+    async def _main_menu_screen(self, sleep_time=0.05):
+        self.events.clear()
+        # The menu is its own layer, hidden while a choice runs
+        # underneath
+        with self.batch():
+            self.add_group('main_menu')
+            self.fill(self.color('black'), 'main_menu')
+            self.draw_text("prompt_text", 40, 80, "Please choose an option:", self.color('white'), terminalio.FONT, 'main_menu')
+            choices = ['Banner', 'Settings', 'Games', 'Off']
+            selection = 0
+            for i in range(0, len(choices)):
+                self.draw_text("choice_{}".format(i), 100, 100 + (i * 20), choices[i], self.color('white'), terminalio.FONT, 'main_menu')
+
+            self.draw_text("selector", 90, 100, "*", self.color('white'), terminalio.FONT, 'main_menu')
 
         def select(selection, choices):
             if selection >= len(choices):
@@ -1179,9 +3780,7 @@ class wsRP2040128(object):
             return selection
 
         while True:
-            com = self.combination
-            if(com != ''):
-                self.combination = ''
+            com = await self._next_combo(sleep_time)
             if(com == 'UDU'):
                selection -= 1
                selection = select(selection, choices)     
@@ -1189,19 +3788,22 @@ class wsRP2040128(object):
                selection += 1
                selection = select(selection, choices)
             elif(com == 'RLR'):
+                self.hide_layer('main_menu')
                 if selection == 0:
-                    self.banner_demo('Easily Amused')
+                    await self._banner_screen('Easily Amused')
                 elif selection == 1:
-                    self.demo()
+                    await self._demo_screen()
                 elif selection == 2:
-                    self.ball_demo()
+                    await self._ball_screen()
                 elif selection == 3:
-                    self.demo()
-            self.update()                    
-            pass
+                    await self._off_screen()
+                self.show_layer('main_menu')
         
 
 
 
-hardware = wsRP2040128()
-hardware.main_menu()
\ No newline at end of file
+# Only start the watch when run as code.py so the classes can be
+# imported elsewhere (e.g. against the host stand-ins in host/)
+if __name__ == '__main__':
+    hardware = wsRP2040128()
+    hardware.main_menu()
@@ -0,0 +1,34 @@
+# Host-side stand-ins for the CircuitPython hardware modules used by
+# circuit.py, so the board classes can run under CPython on a PC.
+#
+#   import host
+#   board_state = host.install()
+#   import circuit
+#   hardware = circuit.wsRP2040128()
+#
+# install() puts host/modules (board, busio, displayio, gc9a01, ...)
+# on sys.path ahead of anything else.  The returned state object
+# holds the register-level models behind them: state.imu (QMI8658),
+# state.battery (BAT_ADC), state.nvm and state.displays.
+
+import os
+import sys
+
+MODULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'modules')
+
+
+# Make the stand-in modules importable
+# returns: the shared host.models.Board state
+def install():
+    if MODULES not in sys.path:
+        sys.path.insert(0, MODULES)
+    from host.models import state
+    return state
+
+
+# Put every simulated peripheral back to its power-on state
+# returns: the shared host.models.Board state
+def reset():
+    from host.models import state
+    state.reset()
+    return state
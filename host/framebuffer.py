@@ -0,0 +1,124 @@
+# Rasterizes a stand-in displayio group tree into a 24-bit
+# framebuffer.  Only used on the host, rendering is done on demand so
+# simulated refreshes stay cheap.
+
+from array import array
+
+
+# A width x height framebuffer of 0xRRGGBB pixels
+class Framebuffer(object):
+    def __init__(self, width, height, color=0x000000):
+        self.width = width
+        self.height = height
+        self.pixels = array('L', [color]) * (width * height)
+
+    # Get a pixel
+    # returns: the 0xRRGGBB color at x, y
+    def pixel(self, x, y):
+        return self.pixels[y * self.width + x]
+
+    # Fill part of a row, clipped to the framebuffer
+    # returns: nothing
+    def span(self, y, x0, x1, color):
+        if y < 0 or y >= self.height:
+            return
+        x0 = max(x0, 0)
+        x1 = min(x1, self.width)
+        if x1 <= x0:
+            return
+        base = y * self.width
+        self.pixels[base + x0:base + x1] = array('L', [color]) * (x1 - x0)
+
+    # Fill a rectangle, clipped to the framebuffer
+    # returns: nothing
+    def rect(self, x, y, w, h, color):
+        for row in range(max(y, 0), min(y + h, self.height)):
+            self.span(row, x, x + w, color)
+
+    # Count the pixels of a color
+    # returns: the number of matching pixels
+    def count(self, color):
+        return self.pixels.count(color)
+
+
+# Resolve the color a shape draws with, None if it's transparent
+def _color(shader, index=0):
+    if shader is None:
+        return None
+    if hasattr(shader, 'is_transparent') and shader.is_transparent(index):
+        return None
+    try:
+        return shader[index]
+    except (IndexError, TypeError):
+        return None
+
+
+def _draw_circle(fb, cx, cy, r, color):
+    for dy in range(-r, r + 1):
+        dx = int((r * r - dy * dy) ** 0.5)
+        fb.span(cy + dy, cx - dx, cx + dx + 1, color)
+
+
+def _draw_polygon(fb, points, ox, oy, color):
+    ys = [p[1] for p in points]
+    n = len(points)
+    for y in range(min(ys), max(ys) + 1):
+        # Sample at the row's centre and fill between crossing pairs
+        sy = y + 0.5
+        xs = []
+        for i in range(n):
+            x0, y0 = points[i]
+            x1, y1 = points[(i + 1) % n]
+            if (y0 <= sy < y1) or (y1 <= sy < y0):
+                xs.append(x0 + (sy - y0) * (x1 - x0) / (y1 - y0))
+        xs.sort()
+        for i in range(0, len(xs) - 1, 2):
+            fb.span(oy + y, ox + int(round(xs[i])), ox + int(round(xs[i + 1])) + 1, color)
+
+
+def _draw(fb, layer, ox, oy):
+    if getattr(layer, 'hidden', False):
+        return
+    kind = type(layer).__name__
+    if kind == 'Group':
+        for child in layer:
+            _draw(fb, child, ox + layer.x, oy + layer.y)
+        return
+    x = ox + layer.x
+    y = oy + layer.y
+    if kind == 'Rectangle':
+        color = _color(layer.pixel_shader, layer.color_index)
+        if color is not None:
+            fb.rect(x, y, layer.width, layer.height, color)
+    elif kind == 'Circle':
+        color = _color(layer.pixel_shader, layer.color_index)
+        if color is not None:
+            _draw_circle(fb, x, y, layer.radius, color)
+    elif kind == 'Polygon':
+        color = _color(layer.pixel_shader, layer.color_index)
+        if color is not None:
+            _draw_polygon(fb, layer.points, x, y, color)
+    elif kind == 'Label':
+        # Glyphs aren't rasterized, each character is drawn as a block
+        # inside its cell so layout and coverage can still be checked
+        font = layer.font
+        top = y - layer.height // 2
+        for i in range(len(layer.text)):
+            if layer.text[i] != ' ':
+                fb.rect(x + i * font.glyph_width + 1, top + 2,
+                        font.glyph_width - 2, layer.height - 4, layer.color)
+    elif kind == 'TileGrid':
+        color = _color(layer.pixel_shader, 0)
+        if color is not None:
+            fb.rect(x, y, layer.width * layer.tile_width,
+                    layer.height * layer.tile_height, color)
+
+
+# Render a group tree
+# group: the root group, None renders an empty screen
+# returns: a Framebuffer
+def render(group, width=240, height=240):
+    fb = Framebuffer(width, height)
+    if group is not None:
+        _draw(fb, group, 0, 0)
+    return fb
@@ -0,0 +1,309 @@
+# Register-level models of the peripherals on the Waveshare RP2040
+# 1.28" board.  The stand-in CircuitPython modules in host/modules
+# talk to these instead of real hardware.
+
+import random
+import struct
+import time
+
+
+# A simulated GPIO line.  Devices raise edges on it and the stand-in
+# digitalio/countio/alarm modules read them back.
+class Line(object):
+    def __init__(self, name):
+        self.name = name
+        self.value = False
+        self.edges = 0
+
+    # Pulse the line once (rising edge followed by a falling edge)
+    # returns: nothing
+    def pulse(self, count=1):
+        self.edges += count
+
+
+# Register model of the QMI8658 6-axis IMU.  Samples are produced
+# at the configured ODR against wall-clock time, so a slow host loop
+# sees the same backlog a slow device loop would.
+class QMI8658Model(object):
+    # Accelerometer full scale (g) and gyroscope full scale (dps)
+    # indexed by the range field of CTRL2/CTRL3
+    ACC_RANGES = (2, 4, 8, 16)
+    GYRO_RANGES = (16, 32, 64, 128, 256, 512, 1024, 2048)
+    # Output data rates (Hz) indexed by the ODR field of CTRL2/CTRL3
+    ODRS = {
+        0: 8000.0, 1: 4000.0, 2: 2000.0, 3: 1000.0, 4: 500.0,
+        5: 250.0, 6: 125.0, 7: 62.5, 8: 31.25,
+        12: 128.0, 13: 21.0, 14: 11.0, 15: 3.0
+    }
+    FIFO_SIZES = (16, 32, 64, 128)
+
+    def __init__(self, int1=None, int2=None):
+        self.int1 = int1 if int1 is not None else Line('INT1')
+        self.int2 = int2 if int2 is not None else Line('INT2')
+        self.noise = 0.0
+        self.temperature = 25.0
+        # Physical state: accel in g, gyro in dps
+        self.accel = [0.0, 0.0, -1.0]
+        self.gyro = [0.0, 0.0, 0.0]
+        # Optional callable(t) -> (ax, ay, az, gx, gy, gz)
+        self.motion = None
+        self.reset()
+
+    # Power-on reset
+    # returns: nothing
+    def reset(self):
+        self.regs = bytearray(0x80)
+        self.regs[0x00] = 0x05
+        self.regs[0x01] = 0x7C
+        self.fifo = bytearray()
+        self.fifo_read = False
+        self.wom_threshold = 0
+        self.wom_baseline = None
+        self.counter = 0
+        self.reads = 0
+        self.writes = 0
+        self._last = time.monotonic()
+        self._pending = 0.0
+
+    # Number of ODR ticks per second for the enabled sensors
+    # returns: the rate in Hz, 0 when everything is off
+    def odr(self):
+        ctrl7 = self.regs[0x08]
+        if ctrl7 & 0x02:
+            return self.ODRS.get(self.regs[0x04] & 0x0F, 0.0)
+        if ctrl7 & 0x01:
+            return self.ODRS.get(self.regs[0x03] & 0x0F, 0.0)
+        return 0.0
+
+    # Current physical reading in g and dps
+    # returns: a tuple of 6 floats
+    def physical(self):
+        if self.motion is not None:
+            values = self.motion(time.monotonic())
+        else:
+            values = tuple(self.accel) + tuple(self.gyro)
+        if self.noise:
+            values = tuple(v + random.uniform(-self.noise, self.noise) for v in values)
+        return values
+
+    # Convert a physical reading to raw counts for the current ranges
+    # returns: a list of 6 clamped int16 values
+    def counts(self, values):
+        acc_lsb = 32768 // self.ACC_RANGES[(self.regs[0x03] >> 4) & 0x03]
+        gyro_lsb = 32768 // self.GYRO_RANGES[(self.regs[0x04] >> 4) & 0x07]
+        out = []
+        for i in range(6):
+            v = int(round(values[i] * (acc_lsb if i < 3 else gyro_lsb)))
+            out.append(max(-32768, min(32767, v)))
+        return out
+
+    # Produce the samples owed since the last bus access
+    # returns: nothing
+    def _advance(self):
+        now = time.monotonic()
+        rate = self.odr()
+        elapsed = now - self._last
+        self._last = now
+        if rate <= 0:
+            return
+        self._pending += elapsed * rate
+        ticks = int(self._pending)
+        if ticks <= 0:
+            return
+        self._pending -= ticks
+        # Cap the backlog so a long host pause doesn't spin forever
+        ticks = min(ticks, 256)
+        values = self.physical()
+        raw = self.counts(values)
+        self.counter = (self.counter + ticks) & 0xFFFFFF
+        regs = self.regs
+        regs[0x30] = self.counter & 0xFF
+        regs[0x31] = (self.counter >> 8) & 0xFF
+        regs[0x32] = (self.counter >> 16) & 0xFF
+        temp = int(self.temperature * 256)
+        regs[0x33] = temp & 0xFF
+        regs[0x34] = (temp >> 8) & 0xFF
+        struct.pack_into('<6h', regs, 0x35, *raw)
+        # STATUS0: accel and gyro data available
+        regs[0x2E] |= 0x03
+        ctrl1 = regs[0x02]
+        ctrl7 = regs[0x08]
+        if ctrl1 & 0x10 and not ctrl7 & 0x20:
+            # Data-ready stays high until the sample is read
+            self.int2.value = True
+            self.int2.pulse(ticks)
+        self._fill_fifo(ticks, raw)
+        self._check_wom(values)
+
+    # Push samples into the FIFO according to FIFO_CTRL
+    # returns: nothing
+    def _fill_fifo(self, ticks, raw):
+        ctrl = self.regs[0x14]
+        mode = ctrl & 0x03
+        if mode == 0 or self.fifo_read:
+            return
+        size = self.FIFO_SIZES[(ctrl >> 2) & 0x03]
+        frame = struct.pack('<6h', *raw)
+        if self.regs[0x08] & 0x03 != 0x03:
+            frame = frame[:6] if self.regs[0x08] & 0x01 else frame[6:]
+        limit = size * len(frame)
+        wtm = self.regs[0x13] * len(frame)
+        before = len(self.fifo)
+        for _ in range(ticks):
+            if len(self.fifo) >= limit:
+                if mode == 1:
+                    break
+                # Stream mode drops the oldest frame
+                del self.fifo[:len(frame)]
+                self.regs[0x16] |= 0x20
+            self.fifo.extend(frame)
+        if wtm and before < wtm <= len(self.fifo) and self.regs[0x02] & 0x08:
+            self.int1.pulse()
+
+    # Wake on motion engine
+    # returns: nothing
+    def _check_wom(self, values):
+        if not self.wom_threshold:
+            return
+        if self.wom_baseline is None:
+            self.wom_baseline = values[:3]
+            return
+        for i in range(3):
+            if abs(values[i] - self.wom_baseline[i]) * 1000 > self.wom_threshold:
+                self.regs[0x2F] |= 0x04
+                self.wom_baseline = values[:3]
+                # The WoM output toggles its level on every event
+                line = self.int2 if self.regs[0x0C] & 0x80 else self.int1
+                line.value = not line.value
+                line.pulse()
+                return
+
+    # Execute a CTRL9 command
+    # returns: nothing
+    def _command(self, cmd):
+        if cmd == 0x00:
+            self.regs[0x2D] &= 0x7F
+            return
+        if cmd == 0x04:
+            self.fifo = bytearray()
+            self.regs[0x16] = 0
+        elif cmd == 0x05:
+            self.fifo_read = True
+            self.regs[0x14] |= 0x80
+        elif cmd == 0x08:
+            self.wom_threshold = self.regs[0x0B]
+            self.wom_baseline = None
+        self.regs[0x2D] |= 0x80
+
+    # Handle a register write from the bus
+    # data: register address followed by the values
+    # returns: nothing
+    def write(self, data):
+        self._advance()
+        self.writes += 1
+        if len(data) < 2:
+            self._pointer = data[0] if data else 0
+            return
+        reg = data[0]
+        for value in data[1:]:
+            if reg == 0x0A:
+                self.regs[reg] = value
+                self._command(value)
+            elif reg == 0x14:
+                if self.fifo_read and not value & 0x80:
+                    self.fifo_read = False
+                self.regs[reg] = value
+            elif reg == 0x60 and value == 0xB0:
+                self.reset()
+                return
+            else:
+                self.regs[reg] = value
+            if self.regs[0x02] & 0x40:
+                reg += 1
+
+    # Handle a register read from the bus
+    # reg: the register to start reading at
+    # buf: the buffer to fill
+    # returns: nothing
+    def read(self, reg, buf):
+        self._advance()
+        self.reads += 1
+        if reg == 0x17:
+            n = min(len(buf), len(self.fifo)) if self.fifo_read else 0
+            buf[:n] = self.fifo[:n]
+            del self.fifo[:n]
+            for i in range(n, len(buf)):
+                buf[i] = 0
+            return
+        if reg in (0x15, 0x16):
+            count = len(self.fifo) // 2
+            self.regs[0x15] = count & 0xFF
+            status = (self.regs[0x16] & 0x20) | ((count >> 8) & 0x03)
+            if self.fifo:
+                status |= 0x10
+            wtm = self.regs[0x13] * 12
+            if wtm and len(self.fifo) >= wtm:
+                status |= 0x40
+            self.regs[0x16] = status
+        for i in range(len(buf)):
+            r = reg + i if self.regs[0x02] & 0x40 else reg
+            buf[i] = self.regs[r & 0x7F]
+        if reg <= 0x40 and reg + len(buf) > 0x35 and self.regs[0x02] & 0x10:
+            self.int2.value = False
+        # STATUS1 (WoM) is clear on read
+        if reg <= 0x2F < reg + len(buf):
+            self.regs[0x2F] &= ~0x04 & 0xFF
+        if reg <= 0x2E < reg + len(buf):
+            self.regs[0x2E] = 0
+
+
+# Model of the battery divider on BAT_ADC.  The pin sees half of the
+# cell voltage through a 3.3V referenced 16-bit ADC.
+class BatteryModel(object):
+    def __init__(self, voltage=3.9):
+        self.voltage = voltage
+        self.noise = 0.0
+        self.conversions = 0
+
+    # Current ADC reading
+    # returns: a 16-bit ADC value
+    def value(self):
+        self.conversions += 1
+        v = self.voltage
+        if self.noise:
+            v += random.uniform(-self.noise, self.noise)
+        raw = int(v / 2 / 3.3 * 65535)
+        return max(0, min(65535, raw))
+
+
+# The shared board state.  reset() puts everything back to power-on.
+class Board(object):
+    def __init__(self):
+        self.reset()
+
+    # Reset every model
+    # returns: nothing
+    def reset(self):
+        self.lines = {}
+        self.imu = QMI8658Model(self.line('GP23'), self.line('GP24'))
+        self.battery = BatteryModel()
+        self.i2c_devices = {0x6B: self.imu}
+        self.adc = {'GP29': self.battery}
+        self.nvm = bytearray(4096)
+        self.displays = []
+
+    # Let every device catch up with the host clock so interrupt
+    # lines are current before they're read
+    # returns: nothing
+    def advance(self):
+        self.imu._advance()
+
+    # Get (or create) the simulated line for a pin name
+    # returns: the Line
+    def line(self, name):
+        if name not in self.lines:
+            self.lines[name] = Line(name)
+        return self.lines[name]
+
+
+state = Board()
@@ -0,0 +1,28 @@
+# Host stand-in for adafruit_display_text.label.  Text is measured
+# with fixed-size glyph cells; y is the vertical centre of the text
+# like the real Label.
+
+
+class Label(object):
+    def __init__(self, font, text='', color=0xFFFFFF, **kwargs):
+        self.font = font
+        self.text = text
+        self.color = color
+        self.x = kwargs.get('x', 0)
+        self.y = kwargs.get('y', 0)
+        self.hidden = False
+
+    @property
+    def width(self):
+        return len(self.text) * self.font.glyph_width
+
+    @property
+    def height(self):
+        return self.font.glyph_height
+
+    @property
+    def bounding_box(self):
+        return (0, -self.height // 2, self.width, self.height)
+
+    def _bounds(self):
+        return (self.x, self.y - self.height // 2, self.width, self.height)
@@ -0,0 +1,32 @@
+# Host stand-in for alarm.  light_sleep_until_alarms() sleeps on the
+# host clock until a pin alarm's line sees an edge or a time alarm
+# expires.
+
+import time as _time
+
+from alarm import pin
+from alarm import time
+
+from host.models import state
+
+
+def light_sleep_until_alarms(*alarms):
+    marks = []
+    deadline = None
+    for a in alarms:
+        if isinstance(a, pin.PinAlarm):
+            marks.append((a, a._line.edges))
+        elif isinstance(a, time.TimeAlarm):
+            if deadline is None or a.monotonic_time < deadline:
+                deadline = a.monotonic_time
+    while True:
+        for a, mark in marks:
+            # Let the IMU model catch up so it can raise its interrupt
+            state.advance()
+            if a._line.edges != mark:
+                return a
+        if deadline is not None and _time.monotonic() >= deadline:
+            for a in alarms:
+                if isinstance(a, time.TimeAlarm):
+                    return a
+        _time.sleep(0.001)
@@ -0,0 +1,10 @@
+# Host stand-in for alarm.pin
+
+
+class PinAlarm(object):
+    def __init__(self, pin, value, edge=False, pull=False):
+        self.pin = pin
+        self.value = value
+        self.edge = edge
+        self.pull = pull
+        self._line = pin.line
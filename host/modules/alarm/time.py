@@ -0,0 +1,6 @@
+# Host stand-in for alarm.time
+
+
+class TimeAlarm(object):
+    def __init__(self, monotonic_time=None, epoch_time=None):
+        self.monotonic_time = monotonic_time
@@ -0,0 +1,19 @@
+# Host stand-in for analogio backed by host.models.
+
+from host.models import state
+
+
+class AnalogIn(object):
+    def __init__(self, pin):
+        self._pin = pin
+        self._model = state.adc.get(pin.name)
+        self.reference_voltage = 3.3
+
+    @property
+    def value(self):
+        if self._model is None:
+            return 0
+        return self._model.value()
+
+    def deinit(self):
+        pass
@@ -0,0 +1,34 @@
+# Host stand-in for the CircuitPython board module of the Waveshare
+# RP2040 1.28" LCD board.
+
+from host.models import state
+
+
+class Pin(object):
+    def __init__(self, name):
+        self.name = name
+
+    # The simulated line behind this pin
+    @property
+    def line(self):
+        return state.line(self.name)
+
+    def __repr__(self):
+        return 'board.{}'.format(self.name)
+
+
+for _i in range(30):
+    globals()['GP{}'.format(_i)] = Pin('GP{}'.format(_i))
+del _i
+
+BAT_ADC = GP29
+IMU_SDA = GP6
+IMU_SCL = GP7
+IMU_INT1 = GP23
+IMU_INT2 = GP24
+LCD_DC = GP8
+LCD_CS = GP9
+LCD_CLK = GP10
+LCD_DIN = GP11
+LCD_RST = GP12
+LCD_BL = GP25
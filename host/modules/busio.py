@@ -0,0 +1,76 @@
+# Host stand-in for busio.  I2C transactions are routed to the
+# register models in host.models, SPI just counts bytes.
+
+from host.models import state
+
+
+class I2C(object):
+    def __init__(self, scl, sda, frequency=100000):
+        self._locked = False
+        self.transactions = 0
+        self.lock_attempts = 0
+
+    def try_lock(self):
+        self.lock_attempts += 1
+        if self._locked:
+            return False
+        self._locked = True
+        return True
+
+    def unlock(self):
+        self._locked = False
+
+    def deinit(self):
+        pass
+
+    def _device(self, address):
+        device = state.i2c_devices.get(address)
+        if device is None:
+            raise OSError(19, 'No such device')
+        return device
+
+    def scan(self):
+        return sorted(state.i2c_devices)
+
+    def writeto(self, address, buffer, start=0, end=None):
+        self.transactions += 1
+        data = bytes(buffer[start:end])
+        self._device(address).write(data)
+        if len(data) == 1:
+            self._pointer = data[0]
+
+    def readfrom_into(self, address, buffer, start=0, end=None):
+        self.transactions += 1
+        view = memoryview(buffer)[start:end]
+        tmp = bytearray(len(view))
+        self._device(address).read(getattr(self, '_pointer', 0), tmp)
+        view[:] = tmp
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in,
+                              out_start=0, out_end=None, in_start=0, in_end=None):
+        self.transactions += 1
+        reg = bytes(buffer_out[out_start:out_end])[0]
+        view = memoryview(buffer_in)[in_start:in_end]
+        tmp = bytearray(len(view))
+        self._device(address).read(reg, tmp)
+        view[:] = tmp
+
+
+class SPI(object):
+    def __init__(self, clock, MOSI=None, MISO=None):
+        self.bytes_written = 0
+
+    def try_lock(self):
+        return True
+
+    def unlock(self):
+        pass
+
+    def configure(self, **kwargs):
+        pass
+
+    def write(self, buffer, start=0, end=None):
+        self.bytes_written += len(buffer[start:end])
+
+    def deinit(self):
+        pass
@@ -0,0 +1,35 @@
+# Host stand-in for countio.  Counts the edges raised on a simulated
+# line since the counter was created or reset.
+
+from host.models import state
+
+
+class Edge(object):
+    RISE = 'rise'
+    FALL = 'fall'
+    RISE_AND_FALL = 'rise_and_fall'
+
+
+class Counter(object):
+    def __init__(self, pin, edge=Edge.FALL, pull=None):
+        # The RP2040 counts edges with a PWM slice's B input, which
+        # only the odd GPIOs are wired to
+        if int(pin.name[2:]) % 2 == 0:
+            raise ValueError('Pin must be on PWM Channel B')
+        self._line = pin.line
+        self._base = self._line.edges
+
+    @property
+    def count(self):
+        state.advance()
+        return self._line.edges - self._base
+
+    @count.setter
+    def count(self, value):
+        self._base = self._line.edges - value
+
+    def reset(self):
+        self.count = 0
+
+    def deinit(self):
+        pass
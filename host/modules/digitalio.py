@@ -0,0 +1,40 @@
+# Host stand-in for digitalio backed by host.models lines.
+
+from host.models import state
+
+
+class Direction(object):
+    INPUT = 'input'
+    OUTPUT = 'output'
+
+
+class Pull(object):
+    UP = 'up'
+    DOWN = 'down'
+
+
+class DigitalInOut(object):
+    def __init__(self, pin):
+        self._line = pin.line
+        self.direction = Direction.INPUT
+        self.pull = None
+
+    @property
+    def value(self):
+        state.advance()
+        return self._line.value
+
+    @value.setter
+    def value(self, value):
+        self._line.value = bool(value)
+
+    def switch_to_input(self, pull=None):
+        self.direction = Direction.INPUT
+        self.pull = pull
+
+    def switch_to_output(self, value=False):
+        self.direction = Direction.OUTPUT
+        self.value = value
+
+    def deinit(self):
+        pass
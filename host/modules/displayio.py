@@ -0,0 +1,157 @@
+# Host stand-in for displayio.  Groups, palettes and tile grids keep
+# the same attributes as on the device, and host.framebuffer can
+# rasterize a group tree into a 24-bit framebuffer on demand.
+
+import os
+
+from host.models import state
+
+
+def release_displays():
+    state.displays = []
+
+
+class FourWire(object):
+    def __init__(self, spi_bus, command=None, chip_select=None, reset=None, baudrate=24000000):
+        self.spi = spi_bus
+        self.bytes_written = 0
+
+
+class Palette(object):
+    def __init__(self, color_count):
+        self._colors = [0] * color_count
+        self._transparent = [False] * color_count
+
+    def __len__(self):
+        return len(self._colors)
+
+    def __getitem__(self, index):
+        return self._colors[index]
+
+    def __setitem__(self, index, value):
+        if isinstance(value, (tuple, list)):
+            value = (value[0] << 16) | (value[1] << 8) | value[2]
+        self._colors[index] = value
+
+    def make_transparent(self, index):
+        self._transparent[index] = True
+
+    def make_opaque(self, index):
+        self._transparent[index] = False
+
+    def is_transparent(self, index):
+        return self._transparent[index]
+
+
+class ColorConverter(object):
+    def __init__(self):
+        self._transparent = None
+
+    def make_transparent(self, color):
+        self._transparent = color
+
+    def make_opaque(self, color):
+        self._transparent = None
+
+
+class Bitmap(object):
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self._data = [0] * (width * height)
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            index = index[1] * self.width + index[0]
+        return self._data[index]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, tuple):
+            index = index[1] * self.width + index[0]
+        self._data[index] = value
+
+    def fill(self, value):
+        self._data = [value] * (self.width * self.height)
+
+
+class OnDiskBitmap(object):
+    def __init__(self, file):
+        self.width = 16
+        self.height = 16
+        if isinstance(file, str) and os.path.exists(file):
+            with open(file, 'rb') as f:
+                header = f.read(26)
+            if header[:2] == b'BM':
+                self.width = int.from_bytes(header[18:22], 'little')
+                self.height = abs(int.from_bytes(header[22:26], 'little', signed=True))
+        self.pixel_shader = Palette(2)
+        self.pixel_shader[0] = 0x808080
+
+
+class TileGrid(object):
+    def __init__(self, bitmap, pixel_shader, width=1, height=1, tile_width=None,
+                 tile_height=None, default_tile=0, x=0, y=0):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.tile_width = tile_width if tile_width is not None else bitmap.width
+        self.tile_height = tile_height if tile_height is not None else bitmap.height
+        self.width = width
+        self.height = height
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self._tiles = [default_tile] * (width * height)
+
+    def __getitem__(self, index):
+        return self._tiles[index if not isinstance(index, tuple) else index[1] * self.width + index[0]]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, tuple):
+            index = index[1] * self.width + index[0]
+        self._tiles[index] = value
+
+    # Area covered on screen relative to the parent group
+    def _bounds(self):
+        return (self.x, self.y, self.width * self.tile_width, self.height * self.tile_height)
+
+
+class Group(object):
+    def __init__(self, scale=1, x=0, y=0):
+        self.scale = scale
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self._layers = []
+
+    def append(self, layer):
+        self._layers.append(layer)
+
+    def insert(self, index, layer):
+        self._layers.insert(index, layer)
+
+    def remove(self, layer):
+        self._layers.remove(layer)
+
+    def pop(self, i=-1):
+        return self._layers.pop(i)
+
+    def index(self, layer):
+        return self._layers.index(layer)
+
+    def __len__(self):
+        return len(self._layers)
+
+    def __getitem__(self, index):
+        return self._layers[index]
+
+    def __setitem__(self, index, value):
+        self._layers[index] = value
+
+    def __delitem__(self, index):
+        del self._layers[index]
+
+    def __contains__(self, layer):
+        return layer in self._layers
+
+    def __iter__(self):
+        return iter(self._layers)
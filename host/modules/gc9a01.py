@@ -0,0 +1,177 @@
+# Host stand-in for the gc9a01 display driver.  Nothing is drawn
+# until refresh(); every refresh works out what changed per object,
+# like displayio does, and pushes those areas.  When the display's
+# dirty tracker is the area source its windows are pushed instead, so
+# they can be checked against the stand-in's own diff.
+# host.framebuffer can rasterize the root group on demand.
+
+import time
+
+from host import framebuffer
+from host.models import state
+
+
+class GC9A01(object):
+    def __init__(self, bus, width=240, height=240, backlight_pin=None, **kwargs):
+        self.bus = bus
+        self.width = width
+        self.height = height
+        self.brightness = 1.0
+        self.auto_refresh = True
+        self.root_group = None
+        self.refreshes = 0
+        self.skipped = 0
+        self.shows = 0
+        self.pixels_pushed = 0
+        self.windows = []
+        self._last_refresh = None
+        self._last_call = None
+        # Set by GC9A01_Display when it tracks dirty rectangles or
+        # clips to the round panel, refresh() then pushes exactly the
+        # windows it gives
+        self.area_source = None
+        self._source_serial = None
+        # What every visible object looked like at the last refresh,
+        # by id: (object, bounds, appearance)
+        self._drawn = None
+        self._drawn_group = None
+        # The areas the last refresh found changed, worked out
+        # independently of any area source, and their pixels
+        self.changed = []
+        self.changed_pixels = 0
+        state.displays.append(self)
+
+    def show(self, group):
+        self.shows += 1
+        self.root_group = group
+
+    # Push a window of the panel
+    def _push(self, x, y, w, h):
+        self.windows.append((x, y, w, h))
+        self.pixels_pushed += w * h
+        self.bus.bytes_written += w * h * 2
+
+    # Same pacing as displayio, in whole milliseconds like its tick
+    # counter: wait to line up with the target frame rate, skip the
+    # frame (returning False) when the caller is already late, and
+    # raise when real refreshes fall below the minimum rate.
+    def refresh(self, target_frames_per_second=None, minimum_frames_per_second=0):
+        now = int(time.monotonic() * 1000)
+        if target_frames_per_second is not None:
+            frame = 1000 // target_frames_per_second
+            last_call = self._last_call if self._last_call is not None else now
+            self._last_call = now
+            if self._last_refresh is not None:
+                since_refresh = now - self._last_refresh
+                if minimum_frames_per_second and since_refresh > 1000 // minimum_frames_per_second:
+                    raise RuntimeError('Below minimum frame rate')
+                if now - last_call > frame:
+                    self.skipped += 1
+                    return False
+                remaining = frame - (since_refresh % frame)
+                while int(time.monotonic() * 1000) - now < remaining:
+                    time.sleep(0.0005)
+                now = int(time.monotonic() * 1000)
+        self._last_refresh = now
+        self.refreshes += 1
+        self._push_changes()
+        return True
+
+    # Push what changed since the last refresh: the windows the area
+    # source gives for its last frame, or the stand-in's own diff.  A
+    # round area source without tracking clips that diff to the disc.
+    def _push_changes(self):
+        self.changed = self._diff()
+        self.changed_pixels = 0
+        for x, y, w, h in self.changed:
+            self.changed_pixels += w * h
+        source = self.area_source
+        if source is None:
+            for x, y, w, h in self.changed:
+                self._push(x, y, w, h)
+            return
+        if source.dirty_limit:
+            if source.dirty_serial == self._source_serial:
+                return
+            self._source_serial = source.dirty_serial
+            windows = source.pushed_windows()
+        else:
+            windows = source.pushed_windows(self.changed)
+        for x, y, w, h in windows:
+            self._push(x, y, w, h)
+
+    # Work out the areas that changed since the last refresh, one
+    # per changed object like displayio: the union of its old and new
+    # bounds if they overlap, both otherwise.  A new root group
+    # changes the whole panel.
+    # returns: a list of (x, y, w, h) clipped to the panel
+    def _diff(self):
+        drawn = {}
+        _collect(self.root_group, 0, 0, drawn)
+        previous = self._drawn
+        self._drawn = drawn
+        if previous is None or self.root_group is not self._drawn_group:
+            self._drawn_group = self.root_group
+            return [(0, 0, self.width, self.height)]
+        areas = []
+        for key, (obj, bounds, look) in drawn.items():
+            old = previous.get(key)
+            if old is None:
+                areas.append(bounds)
+            elif old[1] != bounds or old[2] != look:
+                if _overlaps(old[1], bounds):
+                    areas.append(_union(old[1], bounds))
+                else:
+                    areas.append(old[1])
+                    areas.append(bounds)
+        for key, (obj, bounds, look) in previous.items():
+            if key not in drawn:
+                areas.append(bounds)
+        changed = []
+        for x, y, w, h in areas:
+            x0 = max(x, 0)
+            y0 = max(y, 0)
+            x1 = min(x + w, self.width)
+            y1 = min(y + h, self.height)
+            if x1 > x0 and y1 > y0:
+                changed.append((x0, y0, x1 - x0, y1 - y0))
+        return changed
+
+    # Rasterize what the panel is showing
+    # returns: a host.framebuffer.Framebuffer
+    def snapshot(self):
+        return framebuffer.render(self.root_group, self.width, self.height)
+
+
+# What an object looks like apart from where it is
+def _appearance(obj):
+    shader = getattr(obj, 'pixel_shader', None)
+    colors = tuple(getattr(shader, '_colors', ()))
+    return (getattr(obj, 'text', None), getattr(obj, 'color', None),
+            getattr(obj, 'color_index', None), colors)
+
+
+# Record the screen bounds and appearance of every visible leaf
+def _collect(group, ox, oy, drawn):
+    if group is None or group.hidden:
+        return
+    for child in group:
+        if getattr(child, 'hidden', False):
+            continue
+        if type(child).__name__ == 'Group':
+            _collect(child, ox + child.x, oy + child.y, drawn)
+            continue
+        x, y, w, h = child._bounds()
+        drawn[id(child)] = (child, (ox + x, oy + y, w, h), _appearance(child))
+
+
+def _overlaps(a, b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def _union(a, b):
+    x0 = min(a[0], b[0])
+    y0 = min(a[1], b[1])
+    x1 = max(a[0] + a[2], b[0] + b[2])
+    y1 = max(a[1] + a[3], b[1] + b[3])
+    return (x0, y0, x1 - x0, y1 - y0)
@@ -0,0 +1,18 @@
+# Host stand-in for microcontroller.  nvm is a plain bytearray shared
+# through host.models so tests can inspect and reset it.
+
+from host.models import state
+
+
+class _NVM(object):
+    def __len__(self):
+        return len(state.nvm)
+
+    def __getitem__(self, index):
+        return state.nvm[index]
+
+    def __setitem__(self, index, value):
+        state.nvm[index] = value
+
+
+nvm = _NVM()
@@ -0,0 +1,13 @@
+# Host stand-in for terminalio.  FONT only carries glyph metrics.
+
+
+class _Font(object):
+    def __init__(self, width=6, height=12):
+        self.glyph_width = width
+        self.glyph_height = height
+
+    def get_bounding_box(self):
+        return (self.glyph_width, self.glyph_height, 0, 0)
+
+
+FONT = _Font()
@@ -0,0 +1,42 @@
+# Host stand-in for vectorio shapes.
+
+
+class _Shape(object):
+    def __init__(self, pixel_shader, x=0, y=0, color_index=0):
+        self.pixel_shader = pixel_shader
+        self.x = x
+        self.y = y
+        self.color_index = color_index
+        self.hidden = False
+
+
+class Rectangle(_Shape):
+    def __init__(self, pixel_shader, width, height, x=0, y=0, color_index=0):
+        super().__init__(pixel_shader, x, y, color_index)
+        self.width = width
+        self.height = height
+
+    def _bounds(self):
+        return (self.x, self.y, self.width, self.height)
+
+
+class Circle(_Shape):
+    def __init__(self, pixel_shader, radius, x=0, y=0, color_index=0):
+        super().__init__(pixel_shader, x, y, color_index)
+        self.radius = radius
+
+    def _bounds(self):
+        r = self.radius
+        return (self.x - r, self.y - r, r * 2 + 1, r * 2 + 1)
+
+
+class Polygon(_Shape):
+    def __init__(self, pixel_shader, points, x=0, y=0, color_index=0):
+        super().__init__(pixel_shader, x, y, color_index)
+        self.points = list(points)
+
+    def _bounds(self):
+        xs = [p[0] for p in self.points]
+        ys = [p[1] for p in self.points]
+        return (self.x + min(xs), self.y + min(ys),
+                max(xs) - min(xs) + 1, max(ys) - min(ys) + 1)
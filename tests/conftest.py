@@ -0,0 +1,20 @@
+# The tests run circuit.py on a PC against the stand-ins for the
+# CircuitPython modules in host/, installed before anything imports
+# circuit.
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import host
+
+host.install()
+
+
+# The simulated board, back at power-on for every test
+@pytest.fixture
+def board_state():
+    return host.reset()
@@ -0,0 +1,59 @@
+# run_async() on the host's asyncio
+
+import asyncio
+
+import circuit
+
+
+# Queue a combo the way the IMU loop does when one is recognized
+# returns: nothing
+def enter_combo(hardware, name):
+    hardware.events.push(circuit.EventQueue.GESTURE, 0, name, circuit.ticks_ms())
+
+
+def test_run_async_runs_every_subsystem(board_state):
+    # Paced, so every display task run refreshes the panel
+    hardware = circuit.wsRP2040128(frameRate=30)
+    display = board_state.displays[0]
+    # Convert on every battery task run rather than serving the cache
+    hardware._battery.ttl = 0
+    hardware._battery.refresh()
+    reads = board_state.imu.reads
+    conversions = board_state.battery.conversions
+    refreshes = display.refreshes
+    seen = {}
+
+    async def watch():
+        await asyncio.sleep(0.15)
+        seen['reads'] = board_state.imu.reads - reads
+        seen['conversions'] = board_state.battery.conversions - conversions
+        seen['refreshes'] = display.refreshes - refreshes
+        # The banner screen leaves on LRL
+        enter_combo(hardware, 'LRL')
+
+    hardware.run_async('banner_demo', ('hello',), tasks=(watch(),))
+    assert seen['reads'] >= 10
+    assert seen['conversions'] > 0
+    assert seen['refreshes'] >= 2
+    assert not hardware._async
+
+
+def test_imu_task_leaves_wake_on_motion_alone(board_state):
+    hardware = circuit.wsRP2040128(initBattery=False)
+    seen = {}
+
+    async def watch():
+        await asyncio.sleep(0.02)
+        hardware._qmi8658.low_power_enable()
+        reads = board_state.imu.reads
+        await asyncio.sleep(0.1)
+        seen['low_power'] = board_state.imu.reads - reads
+        hardware._qmi8658.low_power_disable()
+        reads = board_state.imu.reads
+        await asyncio.sleep(0.05)
+        seen['awake'] = board_state.imu.reads - reads
+        enter_combo(hardware, 'LRL')
+
+    hardware.run_async('banner_demo', ('hello',), tasks=(watch(),))
+    assert seen['low_power'] == 0
+    assert seen['awake'] > 0
@@ -0,0 +1,61 @@
+# Building a frame with GC9A01_Display.batch()
+
+import pytest
+
+import circuit
+
+
+@pytest.fixture
+def display(board_state):
+    return circuit.GC9A01_Display()
+
+
+def test_a_batch_refreshes_once(display):
+    panel = display.display
+    refreshes = panel.refreshes
+    with display.batch():
+        assert not panel.auto_refresh
+        display.draw_rectangle(0, 0, 240, 240, [0x000000])
+        display.draw_circle(120, 120, 20, [0xFFFF00])
+        display.draw_rectangle(0, 0, 240, 40, [0xFF0000])
+        assert panel.refreshes == refreshes
+    assert panel.refreshes == refreshes + 1
+    assert panel.auto_refresh
+    assert panel.root_group is display.root
+
+
+def test_nested_batches_refresh_on_the_outermost_commit(display):
+    panel = display.display
+    refreshes = panel.refreshes
+    with display.batch():
+        with display.batch():
+            display.draw_circle(120, 120, 20, [0xFFFF00])
+        assert panel.refreshes == refreshes
+        assert not panel.auto_refresh
+        display.begin_scene()
+        display.draw_rectangle(0, 0, 10, 10, [0xFF0000])
+        display.commit()
+        assert panel.refreshes == refreshes
+    assert panel.refreshes == refreshes + 1
+
+
+def test_auto_refresh_is_restored_after_an_exception(display):
+    panel = display.display
+    panel.auto_refresh = False
+    with pytest.raises(ValueError):
+        with display.batch():
+            display.draw_circle(120, 120, 20, [0xFFFF00])
+            raise ValueError('drawing failed')
+    assert not panel.auto_refresh
+    panel.auto_refresh = True
+    with pytest.raises(ValueError):
+        with display.batch():
+            with display.batch():
+                raise ValueError('drawing failed')
+    assert panel.auto_refresh
+    assert display._batch_depth == 0
+
+
+def test_commit_without_begin_scene(display):
+    with pytest.raises(Exception):
+        display.commit()
@@ -0,0 +1,246 @@
+# Battery readings on the host's ADC
+
+import random
+
+import pytest
+
+import circuit
+from circuit import Battery
+
+
+# An ADC pin that returns a fixed sequence of reads
+class Reads(object):
+    def __init__(self, values):
+        self.values = values
+        self.i = 0
+
+    @property
+    def value(self):
+        value = self.values[self.i % len(self.values)]
+        self.i += 1
+        return value
+
+
+# The 16-bit ADC value for a battery voltage
+# returns: the raw value
+def raw(voltage):
+    return int(voltage / 2 / 3.3 * 65535)
+
+
+# The smallest ADC value that reads as a number of millivolts
+# returns: the raw value
+def raw_mv(millivolts):
+    return -(-millivolts * 65535 // 6600)
+
+
+# A battery reading a fixed voltage
+# returns: the Battery
+def battery_at(millivolts, **kwargs):
+    battery = Battery(ttl=60, samples=1, **kwargs)
+    battery._pin = Reads((raw_mv(millivolts),))
+    battery.refresh()
+    return battery
+
+
+def test_readings_are_cached_for_the_ttl(board_state):
+    battery = Battery(ttl=60, samples=4)
+    conversions = board_state.battery.conversions
+    first = battery.voltage
+    board_state.battery.voltage = 3.6
+    assert battery.voltage == first
+    assert battery.percent == battery.percent
+    assert board_state.battery.conversions == conversions
+
+
+def test_expired_readings_are_taken_again(board_state):
+    battery = Battery(ttl=0, samples=4)
+    conversions = board_state.battery.conversions
+    board_state.battery.voltage = 3.6
+    assert battery.voltage == pytest.approx(3.6, abs=0.001)
+    assert board_state.battery.conversions == conversions + 4
+
+
+def test_refresh_forces_a_reading(board_state):
+    battery = Battery(ttl=60, samples=4)
+    board_state.battery.voltage = 3.6
+    battery.refresh()
+    assert battery.voltage == pytest.approx(3.6, abs=0.001)
+
+
+def test_mean_of_the_reads(board_state):
+    battery = Battery(ttl=60, samples=4)
+    battery._pin = Reads((raw(3.6), raw(3.6), raw(3.6), raw(4.0)))
+    battery.refresh()
+    assert battery.voltage == pytest.approx(3.7, abs=0.001)
+
+
+def test_median_ignores_a_spike(board_state):
+    battery = Battery(ttl=60, samples=5, median=True)
+    battery._pin = Reads((raw(3.6), 65535, raw(3.61), 0, raw(3.59)))
+    battery.refresh()
+    assert battery.voltage == pytest.approx(3.6, abs=0.001)
+
+
+def test_samples_must_be_positive(board_state):
+    with pytest.raises(Exception):
+        Battery(samples=0)
+
+
+def test_curve_breakpoints(board_state):
+    battery = Battery()
+    for millivolts, percent in Battery.LIPO_CURVE:
+        assert battery._state_of_charge(millivolts) == percent
+
+
+def test_curve_interpolates_between_breakpoints(board_state):
+    battery = Battery()
+    # 40mV into the 3610-3690mV, 5-10% segment
+    assert battery._state_of_charge(3650) == 7
+    # 20mV into the 3910-3950mV, 65-70% segment
+    assert battery._state_of_charge(3930) == 67
+    previous = 0
+    for millivolts in range(3200, 4300):
+        percent = battery._state_of_charge(millivolts)
+        assert previous <= percent <= 100
+        previous = percent
+
+
+def test_curve_clamps_outside_its_range(board_state):
+    battery = Battery()
+    assert battery._state_of_charge(3000) == 0
+    assert battery._state_of_charge(4300) == 100
+
+
+def test_percent_from_the_reading(board_state):
+    battery = battery_at(3840)
+    assert battery.millivolts == 3840
+    assert battery.voltage == pytest.approx(3.84)
+    assert battery.percent == 50
+
+
+def test_voltage_is_split_across_cells(board_state):
+    curve = ((3000, 0), (3300, 100))
+    assert battery_at(6300, cells=2, curve=curve).percent == 50
+    assert battery_at(6300, curve=curve).percent == 100
+
+
+def test_load_current_is_compensated(board_state):
+    # 500mA through 100 milliohms drops the cell 50mV below resting
+    battery = battery_at(3800, resistance=100)
+    assert battery.percent == 40
+    battery.load_current = 500
+    battery.refresh()
+    assert battery.millivolts == 3800
+    assert battery.percent == 55
+
+
+def test_curve_is_checked(board_state):
+    with pytest.raises(Exception):
+        Battery(curve=((3000, 0),))
+    with pytest.raises(Exception):
+        Battery(curve=((3300, 0), (3000, 100)))
+
+
+# Stands in for the time module so readings can be taken every 5 s
+# without waiting
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def monotonic_ns(self):
+        return int(self.now * 1000000000)
+
+
+# Take a reading every 5 s with the voltage following a ramp and the
+# ADC adding uniform noise
+# rate: the ramp in mV per minute
+# noise: the noise amplitude in V
+# returns: (charging, discharging, full) of each reading
+def readings(board_state, monkeypatch, volts, rate=0.0, noise=0.0, count=120, seed=1):
+    clock = Clock()
+    monkeypatch.setattr(circuit, 'time', clock)
+    random.seed(seed)
+    model = board_state.battery
+    model.voltage = volts
+    model.noise = noise
+    battery = Battery(samples=1)
+    states = []
+    for i in range(count):
+        clock.now += 5
+        model.voltage = volts + rate * (i + 1) * 5 / 60000
+        states.append((battery.charging, battery.discharging, battery.full))
+    return states
+
+
+@pytest.mark.parametrize('noise', (0.005, 0.01, 0.02))
+def test_steady_voltage_under_noise_is_not_charging(board_state, monkeypatch, noise):
+    states = readings(board_state, monkeypatch, 3.9, noise=noise)
+    assert not any(charging for charging, _, _ in states)
+    assert all(discharging for _, discharging, _ in states)
+
+
+@pytest.mark.parametrize('noise', (0.005, 0.01, 0.02))
+def test_full_on_the_charger_under_noise(board_state, monkeypatch, noise):
+    states = readings(board_state, monkeypatch, 4.18, noise=noise)
+    assert all(full for _, _, full in states)
+    assert not any(charging or discharging for charging, discharging, _ in states)
+
+
+@pytest.mark.parametrize('noise', (0.005, 0.01, 0.02))
+def test_charging_under_noise(board_state, monkeypatch, noise):
+    states = readings(board_state, monkeypatch, 3.8, rate=20, noise=noise)
+    # Once it has been seen it stays seen
+    first = [charging for charging, _, _ in states].index(True)
+    assert first * 5 <= 150
+    assert all(charging for charging, _, _ in states[first:])
+    assert not any(discharging for _, discharging, _ in states[first:])
+
+
+@pytest.mark.parametrize('noise', (0.005, 0.01, 0.02))
+def test_unplugged_while_full_under_noise(board_state, monkeypatch, noise):
+    # Still above the full voltage at first, but falling
+    states = readings(board_state, monkeypatch, 4.18, rate=-20, noise=noise)
+    assert not any(charging for charging, _, _ in states)
+    assert all(discharging for _, discharging, full in states if not full)
+    assert any(discharging for _, discharging, full in states if full)
+
+
+def test_trend_waits_for_min_span(board_state, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit, 'time', clock)
+    model = board_state.battery
+    model.voltage = 3.8
+    battery = Battery(samples=1, min_span=60)
+    # A clean rise of 60mV a minute, read every 5 s
+    for i in range(11):
+        clock.now += 5
+        model.voltage = 3.8 + (i + 1) * 0.005
+        assert battery.trend == 0.0
+        assert not battery.charging
+    # The 12th reading is a minute after the first
+    clock.now += 5
+    model.voltage += 0.005
+    assert battery.trend == pytest.approx(60, rel=0.05)
+    assert battery.charging
+
+
+def test_minutes_remaining_while_discharging(board_state, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit, 'time', clock)
+    model = board_state.battery
+    model.voltage = 3.84
+    battery = Battery(samples=1)
+    assert battery.minutes_remaining is None
+    # 5mV a minute through the 3800-3840mV, 40-50% segments
+    for i in range(24):
+        clock.now += 5
+        model.voltage = 3.84 - (i + 1) * 5 * 0.005 / 60
+        battery.refresh()
+    assert battery.trend == pytest.approx(-5, rel=0.05)
+    # 47% left at 3830mV, losing 1.25% a minute on the 3820-3840mV
+    # segment
+    assert battery.percent == 47
+    assert battery.minutes_remaining in (36, 37, 38)
@@ -0,0 +1,305 @@
+# Dirty rectangle coalescing, the tracker checked against the host
+# stand-in's own per-object diff, and the round panel clipping
+
+import time
+
+import pytest
+
+import circuit
+
+
+@pytest.fixture
+def display(board_state):
+    return circuit.GC9A01_Display(False, dirty=4)
+
+
+@pytest.fixture
+def round_display(board_state):
+    return circuit.GC9A01_Display(False, dirty=4, circular=True)
+
+
+# Add rectangles and finish the frame
+# rects: (x0, y0, x1, y1) tuples
+# returns: the frame's rectangles as (x, y, w, h), sorted
+def frame(display, *rects):
+    for rect in rects:
+        display._add_dirty(*rect)
+    display.end_frame()
+    return sorted(display.dirty_rects())
+
+
+def test_overlapping_rectangles_merge(display):
+    assert frame(display, (0, 0, 10, 10), (5, 5, 20, 20)) == [(0, 0, 20, 20)]
+
+
+def test_touching_rectangles_merge(display):
+    assert frame(display, (0, 0, 10, 10), (10, 0, 20, 10)) == [(0, 0, 20, 10)]
+
+
+def test_separate_rectangles_stay_separate(display):
+    assert frame(display, (0, 0, 10, 10), (50, 50, 60, 60)) == [(0, 0, 10, 10), (50, 50, 10, 10)]
+
+
+def test_merge_chains_through_other_rectangles(display):
+    # The bridge joins both, and the union then swallows the third
+    rects = frame(display, (0, 0, 10, 10), (20, 0, 30, 10), (0, 5, 30, 30), (8, 0, 22, 10))
+    assert rects == [(0, 0, 30, 30)]
+
+
+def test_full_slots_merge_into_the_cheapest(board_state):
+    display = circuit.GC9A01_Display(False, dirty=2)
+    rects = frame(display, (0, 0, 10, 10), (100, 100, 110, 110), (12, 0, 20, 10))
+    assert rects == [(0, 0, 20, 10), (100, 100, 10, 10)]
+
+
+def test_rectangles_are_clipped_to_the_panel(display):
+    assert frame(display, (-5, -5, 10, 10), (230, 230, 250, 250), (300, 0, 310, 10)) == [(0, 0, 10, 10), (230, 230, 10, 10)]
+    assert display.dirty_area == 200
+
+
+def test_tracking_off_keeps_nothing(board_state):
+    display = circuit.GC9A01_Display(False)
+    assert frame(display, (0, 0, 10, 10)) == []
+    assert display.display.area_source is None
+    assert display.pushed_windows() == [(0, 0, 240, 240)]
+
+
+# Whether the rectangles cover every pixel of an area
+# returns: True if they do
+def covers(rects, area):
+    x, y, w, h = area
+    for row in range(y, y + h):
+        for col in range(x, x + w):
+            for rx, ry, rw, rh in rects:
+                if rx <= col < rx + rw and ry <= row < ry + rh:
+                    break
+            else:
+                return False
+    return True
+
+
+# Draw a frame as a batch, which ends the tracker's frame and refreshes
+# the panel
+# returns: the tracker's rectangles
+def commit(display, change):
+    panel = display.display
+    pushed = len(panel.windows)
+    with display.batch():
+        change()
+    rects = display.dirty_rects()
+    # The stand-in pushes exactly the tracker's rectangles ...
+    assert panel.windows[pushed:] == rects
+    # ... and they cover everything its own diff found changed
+    for area in panel.changed:
+        assert covers(rects, area), (area, rects)
+    return rects
+
+
+@pytest.fixture
+def scene(board_state):
+    display = circuit.GC9A01_Display(dirty=8)
+    display.add_group('overlay')
+    sprites = {}
+
+    def draw():
+        sprites['background'] = display.draw_rectangle(0, 0, 240, 240, [0x000000])
+        sprites['ball'] = display.draw_circle(120, 120, 10, [0xFFFF00])
+        sprites['box'] = display.draw_rectangle(20, 20, 30, 30, [0xFF0000])
+        sprites['star'] = display.draw_polygon([(0, 0), (10, 4), (0, 8)], 180, 60, [0x00FF00])
+        sprites['label'] = display.draw_text(40, 200, 'hello', [0xFFFFFF], circuit.terminalio.FONT)
+        sprites['badge'] = display.draw_rectangle(200, 200, 16, 16, [0x0000FF], 'overlay')
+    commit(display, draw)
+    return display, sprites
+
+
+def test_unchanged_frames_push_nothing(scene):
+    display, sprites = scene
+    assert commit(display, lambda: None) == []
+    assert display.display.changed == []
+
+
+def test_moving_a_sprite_covers_both_positions(scene):
+    display, sprites = scene
+
+    def move():
+        sprites['ball'].x += 3
+    assert commit(display, move) == [(110, 110, 24, 21)]
+
+
+def test_far_moves_and_resizes(scene):
+    display, sprites = scene
+
+    def change():
+        sprites['star'].x = 10
+        sprites['box'].width = 60
+    rects = commit(display, change)
+    assert covers(rects, (180, 60, 11, 9))
+    assert covers(rects, (10, 60, 11, 9))
+    assert covers(rects, (20, 20, 60, 30))
+
+
+def test_text_changes_are_dirty(scene):
+    display, sprites = scene
+
+    def retext():
+        sprites['label'].text = 'hellO'
+    rects = commit(display, retext)
+    assert len(rects) == 1
+    assert display.display.changed
+
+
+def test_removed_sprites_are_dirty(scene):
+    display, sprites = scene
+
+    def remove():
+        display.groups['default'].remove(sprites['box'])
+    assert commit(display, remove) == [(20, 20, 30, 30)]
+
+
+def test_sprites_appended_directly_are_tracked(scene):
+    display, sprites = scene
+    extra = circuit.vectorio.Rectangle(pixel_shader=display._palette([0xFF00FF]), width=5, height=5, x=60, y=60)
+
+    def append():
+        display.groups['default'].append(extra)
+    assert commit(display, append) == [(60, 60, 5, 5)]
+
+
+def test_a_hidden_layer_is_dirty(scene):
+    display, sprites = scene
+
+    def hide():
+        display.hide_layer('overlay')
+    assert commit(display, hide) == [(200, 200, 16, 16)]
+    assert commit(display, lambda: display.show_layer('overlay')) == [(200, 200, 16, 16)]
+
+
+def test_a_raised_layer_is_dirty(scene):
+    display, sprites = scene
+    display.add_group('top')
+    commit(display, lambda: display.draw_rectangle(100, 100, 10, 10, [0xFFFFFF], 'top'))
+    # The stand-in's diff doesn't see z-order, the tracker marks the
+    # raised layer's sprites
+    assert commit(display, lambda: display.raise_layer('overlay')) == [(200, 200, 16, 16)]
+
+
+def test_palette_changes_need_mark_dirty(scene):
+    display, sprites = scene
+
+    def recolor():
+        sprites['box'].pixel_shader[0] = 0x00FFFF
+        display.mark_dirty(20, 20, 30, 30)
+    assert commit(display, recolor) == [(20, 20, 30, 30)]
+
+
+def test_a_dropped_frame_carries_over(board_state):
+    display = circuit.GC9A01_Display(dirty=8)
+    display.pace_frames(50)
+    ball = display.draw_circle(120, 120, 10, [0xFFFF00])
+    display.end_frame()
+    display.frame(time.monotonic())
+    ball.x = 30
+    display.end_frame()
+    # Too late for its slot, nothing is pushed
+    pushed = len(display.display.windows)
+    assert not display.frame(time.monotonic() - 0.1)
+    assert len(display.display.windows) == pushed
+    display.end_frame()
+    assert covers(display.dirty_rects(), (110, 110, 21, 21))
+    assert covers(display.dirty_rects(), (20, 110, 21, 21))
+
+
+def test_without_tracking_the_stand_in_pushes_its_own_diff(board_state):
+    display = circuit.GC9A01_Display()
+    panel = display.display
+    ball = display.draw_circle(120, 120, 10, [0xFFFF00])
+    with display.batch():
+        pass
+    pushed = len(panel.windows)
+    with display.batch():
+        ball.x += 3
+    assert panel.windows[pushed:] == [(110, 110, 24, 21)]
+    assert panel.windows[pushed:] == panel.changed
+
+
+def test_board_screens_stay_covered(board_state):
+    hardware = circuit.wsRP2040128(initAccel=False, initBattery=False, frameRate=30, dirtyRects=8)
+    panel = board_state.displays[0]
+    with hardware.batch():
+        hardware.draw_rectangle('background', 0, 0, 240, 240, hardware.color('black'))
+        hardware.draw_circle('ball', 120, 120, 12, hardware.color('yellow'))
+        hardware.draw_text('score', 100, 20, '0', hardware.color('white'), circuit.terminalio.FONT)
+    for i in range(5):
+        hardware.sprites['ball'].x += 4
+        hardware.sprites['score'].text = str(i)
+        pushed = len(panel.windows)
+        hardware._display_task()
+        rects = hardware._display.dirty_rects()
+        assert panel.windows[pushed:] == rects
+        for area in panel.changed:
+            assert covers(rects, area)
+
+
+def test_visible_spans(round_display):
+    assert round_display.visible_pixels == 45244
+    assert round_display.visible_span(120) == (0, 240)
+    start, end = round_display.visible_span(0)
+    assert 0 < start < end < 240
+    assert end - 120 == 120 - start
+
+
+def test_clip_to_disc(round_display):
+    assert round_display._clip_to_disc(0, 0, 20, 20) is None
+    assert round_display._clip_to_disc(0, 0, 240, 240) == (0, 0, 240, 240)
+    start, end = round_display.visible_span(9)
+    assert round_display._clip_to_disc(0, 0, 240, 10) == (start, 0, end, 10)
+    # A rectangle reaching into the corner only keeps visible rows
+    x0, y0, x1, y1 = round_display._clip_to_disc(200, 0, 240, 60)
+    assert x0 == 200 and x1 <= 240
+    assert y0 > 0 and y1 == 60
+
+
+def test_round_corners_are_never_dirty(round_display):
+    assert frame(round_display, (0, 0, 20, 20), (220, 220, 240, 240)) == []
+    assert round_display.dirty_area == 0
+
+
+def test_round_dirty_area_counts_visible_pixels(round_display):
+    frame(round_display, (0, 0, 240, 240))
+    assert round_display.dirty_area == 45244
+
+
+def test_pushed_windows_cover_only_the_disc(round_display):
+    frame(round_display, (0, 0, 240, 240))
+    windows = round_display.pushed_windows()
+    assert sum(w * h for x, y, w, h in windows) == 45244
+    for x, y, w, h in windows:
+        for row in range(y, y + h):
+            start, end = round_display.visible_span(row)
+            assert start <= x and x + w <= end
+
+
+def test_round_panel_pushes_visible_pixels(board_state):
+    hardware = circuit.wsRP2040128(roundDisplay=True, frameRate=30, dirtyRects=8)
+    panel = board_state.displays[0]
+    before = panel.pixels_pushed
+    with hardware.batch():
+        hardware.draw_rectangle('background', 0, 0, 240, 240, hardware.color('blue'))
+    assert type(hardware.sprites['background']).__name__ == 'Rectangle'
+    assert panel.pixels_pushed - before == 45244
+
+
+def test_round_panel_without_tracking_clips_the_stand_ins_diff(board_state):
+    display = circuit.GC9A01_Display(circular=True)
+    panel = display.display
+    corner = display.draw_rectangle(0, 0, 20, 20, [0xFF0000])
+    ball = display.draw_circle(120, 120, 10, [0xFFFF00])
+    with display.batch():
+        pass
+    pushed = len(panel.windows)
+    with display.batch():
+        corner.x = 2
+        ball.x += 3
+    # The corner moved where the panel can't show it
+    assert panel.changed == [(0, 0, 22, 20), (110, 110, 24, 21)]
+    assert panel.windows[pushed:] == [(110, 110, 24, 21)]
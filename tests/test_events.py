@@ -0,0 +1,81 @@
+# EventQueue and the InputEvent it fills in
+
+from circuit import EventQueue
+
+
+def test_poll_returns_events_oldest_first():
+    events = EventQueue(4)
+    events.push(EventQueue.COMMAND, 1, 'left', 10)
+    events.push(EventQueue.GESTURE, 2, 'LRL', 20)
+    assert len(events) == 2
+    event = events.poll()
+    assert (event.kind, event.code, event.name, event.time) == (EventQueue.COMMAND, 1, 'left', 10)
+    event = events.poll()
+    assert (event.kind, event.code, event.name, event.time) == (EventQueue.GESTURE, 2, 'LRL', 20)
+    assert events.poll() is None
+
+
+def test_full_queue_drops_the_oldest():
+    events = EventQueue(3)
+    for i in range(5):
+        events.push(EventQueue.COMMAND, i, 'c%d' % i, i)
+    assert len(events) == 3
+    assert events.dropped == 2
+    assert [events.poll().code for _ in range(3)] == [2, 3, 4]
+    assert events.poll() is None
+    assert events.dropped == 2
+
+
+def test_poll_filters_by_kind():
+    events = EventQueue(4)
+    events.push(EventQueue.COMMAND, 1, 'left', 1)
+    events.push(EventQueue.GESTURE, 2, 'LRL', 2)
+    events.push(EventQueue.COMMAND, 3, 'right', 3)
+    # The command ahead of the gesture is discarded
+    assert events.poll(EventQueue.GESTURE).name == 'LRL'
+    assert len(events) == 1
+    assert events.poll(EventQueue.GESTURE) is None
+    assert len(events) == 0
+
+
+def test_poll_fills_the_event_passed_in():
+    events = EventQueue(2)
+    events.push(EventQueue.COMMAND, 1, 'left', 5)
+    mine = events.event.__class__()
+    assert events.poll(event=mine) is mine
+    assert mine.name == 'left'
+
+
+def test_kinds_not_queued_still_reach_subscribers():
+    events = EventQueue(4, kinds=EventQueue.COMMAND | EventQueue.GESTURE)
+    seen = []
+    events.subscribe(lambda event: seen.append(event.name), EventQueue.TILT)
+    events.push(EventQueue.TILT, 5, 'flat', 1)
+    assert len(events) == 0
+    assert seen == ['flat']
+
+
+def test_subscribe_and_unsubscribe():
+    events = EventQueue(4)
+    seen = []
+    callback = lambda event: seen.append((event.kind, event.name))
+    events.subscribe(callback, EventQueue.GESTURE)
+    # Subscribing again replaces the kinds rather than calling twice
+    events.subscribe(callback, EventQueue.GESTURE | EventQueue.COMMAND)
+    events.push(EventQueue.COMMAND, 1, 'left', 1)
+    events.push(EventQueue.GESTURE, 2, 'LRL', 2)
+    events.push(EventQueue.TILT, 3, 'flat', 3)
+    assert seen == [(EventQueue.COMMAND, 'left'), (EventQueue.GESTURE, 'LRL')]
+    events.unsubscribe(callback)
+    events.push(EventQueue.GESTURE, 2, 'LRL', 4)
+    assert len(seen) == 2
+    # Subscribers don't take events from the queue
+    assert len(events) == 4
+
+
+def test_clear_drops_queued_events():
+    events = EventQueue(2)
+    events.push(EventQueue.COMMAND, 1, 'left', 1)
+    events.clear()
+    assert len(events) == 0
+    assert events.poll() is None
@@ -0,0 +1,96 @@
+# Frame pacing in GC9A01_Display and the display task
+
+import time
+
+import pytest
+
+import circuit
+
+
+@pytest.fixture
+def display(board_state):
+    display = circuit.GC9A01_Display(False)
+    display.pace_frames(50, minimum_fps=10)
+    return display
+
+
+def test_pacing_turns_auto_refresh_off(display):
+    assert not display.display.auto_refresh
+    display.pace_frames(None)
+    assert display.display.auto_refresh
+
+
+def test_a_frame_on_time_is_refreshed(display):
+    refreshes = display.display.refreshes
+    assert display.frame(time.monotonic())
+    assert display.display.refreshes == refreshes + 1
+    stats = display.frame_stats()
+    assert (stats['frames'], stats['dropped'], stats['late']) == (1, 0, 0)
+
+
+def test_a_frame_past_its_slot_is_dropped(display):
+    refreshes = display.display.refreshes
+    # More than a 20ms frame late
+    assert not display.frame(time.monotonic() - 0.05)
+    assert display.display.refreshes == refreshes
+    stats = display.frame_stats()
+    assert (stats['frames'], stats['dropped']) == (0, 1)
+
+
+def test_a_slow_frame_is_late(display):
+    display.last_frame = time.monotonic() - 0.2
+    assert display.frame(time.monotonic())
+    assert display.frame_stats()['late'] == 1
+
+
+def test_a_skipped_refresh_counts_as_dropped(display):
+    display.display.refresh = lambda **kwargs: False
+    assert not display.frame()
+    stats = display.frame_stats()
+    assert (stats['frames'], stats['dropped']) == (0, 1)
+
+
+def test_below_the_minimum_rate_the_frame_is_pushed_anyway(display):
+    panel = display.display
+    refresh = panel.refresh
+
+    def below_minimum(**kwargs):
+        if kwargs:
+            raise RuntimeError('Below minimum frame rate')
+        return refresh()
+    panel.refresh = below_minimum
+    refreshes = panel.refreshes
+    assert display.frame()
+    assert panel.refreshes == refreshes + 1
+    stats = display.frame_stats()
+    assert (stats['frames'], stats['dropped'], stats['late']) == (1, 0, 1)
+
+
+def test_displayio_skips_frames_when_the_caller_is_late(board_state):
+    display = circuit.GC9A01_Display(False)
+    display.pace_frames(100)
+    assert display.frame()
+    time.sleep(0.03)
+    assert not display.frame()
+    assert display.frame_stats()['dropped'] == 1
+    assert display.display.skipped == 1
+
+
+def test_reset_frame_stats(display):
+    display.frame(time.monotonic() - 0.05)
+    display.frame(time.monotonic())
+    display.reset_frame_stats()
+    stats = display.frame_stats()
+    assert (stats['frames'], stats['dropped'], stats['late']) == (0, 0, 0)
+
+
+def test_display_task_keeps_frames_on_a_grid(board_state):
+    hardware = circuit.wsRP2040128(initAccel=False, initBattery=False, frameRate=50)
+    start = hardware._next_frame
+    assert hardware._display_task() == pytest.approx(start + 0.02)
+    # A stall of several frames skips their slots rather than bunching
+    # them up
+    hardware._next_frame = time.monotonic() - 0.1
+    next_due = hardware._display_task()
+    assert time.monotonic() < next_due <= time.monotonic() + 0.02
+    assert hardware._display.dropped_frames == 1
@@ -0,0 +1,100 @@
+# GestureRecognizer, including combos that start with other combos
+
+import circuit
+from circuit import GestureRecognizer
+
+SYMBOLS = ('U', 'D', 'L', 'R')
+
+
+def codes(commands):
+    return [SYMBOLS.index(c) for c in commands]
+
+
+# Feed commands 100 ms apart from start
+# returns: the names the recognizer fired, in order
+def feed(recognizer, commands, start=0, step=100):
+    fired = []
+    t = start
+    for code in codes(commands):
+        name = recognizer.advance(code, t & circuit.TICKS_MASK)
+        if name is not None:
+            fired.append(name)
+        name = recognizer.expire(t & circuit.TICKS_MASK)
+        if name is not None:
+            fired.append(name)
+        t += step
+    return fired
+
+
+def test_single_combo_fires_on_its_last_command():
+    recognizer = GestureRecognizer(SYMBOLS)
+    seen = []
+    recognizer.register_combo('lr', ['L', 'R'], callback=seen.append)
+    assert feed(recognizer, 'ULR') == ['lr']
+    assert seen == ['lr']
+
+
+def test_combo_outside_its_window_does_not_fire():
+    recognizer = GestureRecognizer(SYMBOLS)
+    recognizer.register_combo('lr', ['L', 'R'], window=0.5)
+    assert feed(recognizer, 'LR', step=600) == []
+
+
+def test_unregister_combo():
+    recognizer = GestureRecognizer(SYMBOLS)
+    recognizer.register_combo('lr', ['L', 'R'])
+    recognizer.unregister_combo('lr')
+    assert feed(recognizer, 'LR') == []
+
+
+def test_longer_combo_wins_over_its_start():
+    recognizer = GestureRecognizer(SYMBOLS)
+    recognizer.register_combo('udu', ['U', 'D', 'U'])
+    recognizer.register_combo('udud', ['U', 'D', 'U', 'D'])
+    assert feed(recognizer, 'UDUD') == ['udud']
+
+
+def test_held_combo_fires_once_the_longer_one_times_out():
+    recognizer = GestureRecognizer(SYMBOLS)
+    recognizer.register_combo('udu', ['U', 'D', 'U'], window=1.0)
+    recognizer.register_combo('udud', ['U', 'D', 'U', 'D'], window=1.0)
+    assert feed(recognizer, 'UDU') == []
+    assert recognizer.expire(900) is None
+    assert recognizer.expire(1000) == 'udu'
+    assert recognizer.expire(1100) is None
+
+
+def test_held_combo_fires_when_the_next_command_leaves_the_path():
+    recognizer = GestureRecognizer(SYMBOLS)
+    recognizer.register_combo('udu', ['U', 'D', 'U'])
+    recognizer.register_combo('udud', ['U', 'D', 'U', 'D'])
+    recognizer.register_combo('lrl', ['L', 'R', 'L'])
+    assert feed(recognizer, 'UDULRL') == ['udu', 'lrl']
+
+
+def test_held_combo_fires_when_the_longer_one_misses_its_window():
+    recognizer = GestureRecognizer(SYMBOLS)
+    recognizer.register_combo('udu', ['U', 'D', 'U'], window=1.0)
+    recognizer.register_combo('udud', ['U', 'D', 'U', 'D'], window=0.5)
+    assert feed(recognizer, 'UDU') == []
+    # Nothing called expire() in between, the late command settles it
+    assert recognizer.advance(SYMBOLS.index('D'), 600) == 'udu'
+
+
+def test_suffix_combo_does_not_replace_the_held_one():
+    recognizer = GestureRecognizer(SYMBOLS)
+    recognizer.register_combo('udu', ['U', 'D', 'U'])
+    recognizer.register_combo('udul', ['U', 'D', 'U', 'L'])
+    recognizer.register_combo('du', ['D', 'U'])
+    # 'du' ends inside the held 'udu', it isn't a separate gesture
+    assert feed(recognizer, 'UDUL') == ['udul']
+
+
+def test_combos_across_the_ticks_wrap():
+    recognizer = GestureRecognizer(SYMBOLS)
+    recognizer.register_combo('udu', ['U', 'D', 'U'], window=1.0)
+    recognizer.register_combo('udud', ['U', 'D', 'U', 'D'], window=1.0)
+    start = circuit.TICKS_MASK - 150
+    assert feed(recognizer, 'UDUD', start=start) == ['udud']
+    assert feed(recognizer, 'UDU', start=start) == []
+    assert recognizer.expire((start + 1000) & circuit.TICKS_MASK) == 'udu'
@@ -0,0 +1,134 @@
+# RingBuffer, the ticks_ms() timestamps kept in it and TrendTracker
+
+import random
+
+import pytest
+
+import circuit
+from circuit import RingBuffer, TrendTracker
+
+
+def test_ring_buffer_wraps_and_reads_by_age():
+    ring = RingBuffer(3)
+    for value in (1, 2, 3, 4):
+        ring.append(value)
+    assert len(ring) == 3
+    assert [ring.get(age) for age in range(3)] == [4, 3, 2]
+
+
+def test_ring_buffer_entries_and_times():
+    ring = RingBuffer(2, 'l', width=2, timed=True)
+    values = (10, 11, 20, 21, 30, 31)
+    for i in range(3):
+        ring.append_from(values, t=i * 5, start=i * 2)
+    assert (ring.get(0, 0), ring.get(0, 1)) == (30, 31)
+    assert (ring.get(1, 0), ring.get(1, 1)) == (20, 21)
+    assert (ring.time(0), ring.time(1)) == (10, 5)
+
+
+def test_ring_buffer_untimed_time_is_zero():
+    ring = RingBuffer(2)
+    ring.append(7)
+    assert ring.time() == 0
+
+
+def test_ring_buffer_clear_and_fill():
+    ring = RingBuffer(4, timed=True)
+    ring.append(5, 1)
+    ring.clear()
+    assert len(ring) == 0
+    ring.fill(9, 123)
+    assert len(ring) == 4
+    assert [ring.get(age) for age in range(4)] == [9, 9, 9, 9]
+    assert ring.time(3) == 123
+
+
+def test_ring_buffer_times_stay_exact():
+    # Days into a run a float32 could only tell these apart by ~0.1s
+    ring = RingBuffer(2, timed=True)
+    t = circuit.TICKS_MASK - 1
+    ring.append(1, t)
+    ring.append(2, t + 1)
+    assert ring.time(0) - ring.time(1) == 1
+
+
+def test_ticks_ms_wraps():
+    now = circuit.ticks_ms()
+    assert 0 <= now <= circuit.TICKS_MASK
+
+
+def test_ticks_diff_across_the_wrap():
+    older = circuit.TICKS_MASK - 10
+    newer = (older + 30) & circuit.TICKS_MASK
+    assert circuit.ticks_diff(newer, older) == 30
+    assert circuit.ticks_diff(older, newer) == -30
+
+
+def test_trend_tracker_needs_two_readings():
+    with pytest.raises(Exception):
+        TrendTracker(1)
+    trend = TrendTracker(4)
+    assert trend.slope == 0.0
+    trend.add(100, 5)
+    assert trend.slope == 0.0
+    assert trend.span == 0
+
+
+def test_trend_tracker_slope_of_a_line():
+    trend = TrendTracker(8)
+    for i in range(5):
+        trend.add(1000 + i * 250, 4000 - i * 10)
+    assert trend.slope == pytest.approx(-0.04)
+    assert trend.span == 1000
+
+
+def test_trend_tracker_window_drops_old_readings():
+    trend = TrendTracker(3)
+    # A flat start, then a rise that's all the window still holds
+    for t, value in ((0, 0), (10, 0), (20, 0), (30, 10), (40, 20)):
+        trend.add(t, value)
+    assert len(trend) == 3
+    assert trend.slope == pytest.approx(1.0)
+    assert trend.span == 20
+
+
+def test_trend_tracker_rebases_large_times():
+    trend = TrendTracker(4)
+    start = 0x3FFFFFF0
+    for i in range(6):
+        trend.add(i * start // 4, i * 100)
+    assert trend.slope == pytest.approx(100 / (start // 4), rel=1e-6)
+
+
+def test_trend_tracker_reset():
+    trend = TrendTracker(4)
+    trend.add(0, 0)
+    trend.add(10, 10)
+    trend.reset()
+    assert len(trend) == 0
+    assert trend.slope == 0.0
+
+
+def test_trend_tracker_stderr_of_a_line_is_zero():
+    trend = TrendTracker(8)
+    for i in range(6):
+        trend.add(i * 5000, 4000 + i * 3)
+    assert trend.stderr == pytest.approx(0.0, abs=1e-12)
+
+
+def test_trend_tracker_stderr_matches_a_direct_fit():
+    rng = random.Random(3)
+    trend = TrendTracker(12)
+    points = [(i * 5000, 4000 + rng.randint(-20, 20)) for i in range(20)]
+    for t, value in points:
+        trend.add(t, value)
+    # Fit the 12 readings still in the window the long way round
+    points = points[-12:]
+    n = len(points)
+    mean_t = sum(t for t, _ in points) / n
+    mean_v = sum(v for _, v in points) / n
+    stt = sum((t - mean_t) ** 2 for t, _ in points)
+    slope = sum((t - mean_t) * (v - mean_v) for t, v in points) / stt
+    residual = sum((v - mean_v - slope * (t - mean_t)) ** 2 for t, v in points)
+    assert trend.slope == pytest.approx(slope)
+    assert trend.stderr == pytest.approx((residual / (n - 2) / stt) ** 0.5)
@@ -0,0 +1,80 @@
+# The host stand-ins for the CircuitPython modules
+
+import time
+
+import pytest
+
+import analogio
+import board
+import busio
+import countio
+import displayio
+import microcontroller
+import vectorio
+
+import circuit
+
+
+def test_reset_gives_a_fresh_board(board_state):
+    board_state.nvm[0] = 1
+    board_state.battery.voltage = 3.5
+    board_state.imu.regs[0x02] = 0xFF
+    import host
+    state = host.reset()
+    assert state is board_state
+    assert state.nvm[0] == 0
+    assert state.battery.voltage == 3.9
+    assert state.imu.regs[0x02] == 0
+
+
+def test_i2c_reaches_the_imu_model(board_state):
+    bus = busio.I2C(board.GP7, board.GP6)
+    who = bytearray(1)
+    bus.writeto_then_readfrom(0x6B, bytes([0x00]), who)
+    assert who[0] == 0x05
+    with pytest.raises(OSError):
+        bus.writeto(0x10, bytes([0x00]))
+
+
+def test_adc_reads_half_the_cell(board_state):
+    board_state.battery.voltage = 3.3
+    adc = analogio.AnalogIn(board.BAT_ADC)
+    assert adc.value == 32767
+
+
+def test_nvm_is_the_board_state(board_state):
+    microcontroller.nvm[0:2] = b'ab'
+    assert bytes(board_state.nvm[0:2]) == b'ab'
+
+
+def test_countio_only_counts_odd_pins(board_state):
+    counter = countio.Counter(board.GP23, edge=countio.Edge.RISE)
+    board_state.line('GP23').pulse(3)
+    assert counter.count == 3
+    counter.reset()
+    assert counter.count == 0
+    # Like the RP2040, only PWM channel B pins can count edges
+    with pytest.raises(ValueError):
+        countio.Counter(board.GP24)
+
+
+def test_snapshot_renders_the_root_group(board_state):
+    display = circuit.GC9A01_Display()
+    palette = displayio.Palette(1)
+    palette[0] = 0xFF0000
+    group = displayio.Group()
+    group.append(vectorio.Rectangle(pixel_shader=palette, width=10, height=20, x=5, y=5))
+    display.display.show(group)
+    frame = board_state.displays[0].snapshot()
+    assert frame.count(0xFF0000) == 200
+    assert frame.pixel(5, 5) == 0xFF0000
+    assert frame.pixel(4, 5) == 0
+
+
+def test_board_runs_on_the_host(board_state):
+    hardware = circuit.wsRP2040128()
+    hardware.calibrate(samples=8)
+    board_state.imu.gyro = [0, 0, 120]
+    time.sleep(0.005)
+    hardware.update()
+    assert hardware.tilt_state == circuit.wsRP2040128.TILT_STATES[5]
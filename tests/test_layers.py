@@ -0,0 +1,70 @@
+# Layers in GC9A01_Display
+
+import circuit
+
+RED = 0xFF0000
+BLUE = 0x0000FF
+
+
+# A display with a red 'low' layer under a blue 'high' one, both
+# covering the same square
+def layered(board_state):
+    display = circuit.GC9A01_Display()
+    display.add_group('low')
+    display.add_group('high')
+    display.draw_rectangle(100, 100, 20, 20, [RED], 'low')
+    display.draw_rectangle(100, 100, 20, 20, [BLUE], 'high')
+    return display
+
+
+def test_layers_draw_bottom_first(board_state):
+    display = layered(board_state)
+    assert display.layers == ['default', 'low', 'high']
+    assert display.display.root_group is display.root
+    assert display.display.snapshot().pixel(110, 110) == BLUE
+
+
+def test_raise_layer_changes_the_z_order(board_state):
+    display = layered(board_state)
+    display.raise_layer('low')
+    assert display.layers == ['default', 'high', 'low']
+    assert display.root[2] is display.groups['low']
+    assert display.display.snapshot().pixel(110, 110) == RED
+    # Raising the top layer leaves it where it is
+    display.raise_layer('low')
+    assert display.layers == ['default', 'high', 'low']
+
+
+def test_hidden_layers_are_not_drawn(board_state):
+    display = layered(board_state)
+    display.hide_layer('high')
+    assert display.display.snapshot().pixel(110, 110) == RED
+    display.hide_layer('low')
+    assert display.display.snapshot().count(RED) == 0
+    display.show_layer('high')
+    assert display.display.snapshot().pixel(110, 110) == BLUE
+
+
+def test_add_group_hidden_and_replaced(board_state):
+    display = layered(board_state)
+    display.add_group('overlay', hidden=True)
+    display.draw_rectangle(100, 100, 20, 20, [RED], 'overlay')
+    assert display.display.snapshot().pixel(110, 110) == BLUE
+    # Adding it again empties it in place
+    low = display.groups['low']
+    replaced = display.add_group('low')
+    assert replaced is not low
+    assert len(replaced) == 0
+    assert display.layers == ['default', 'low', 'high', 'overlay']
+    assert display.root[1] is replaced
+
+
+def test_a_layer_change_is_picked_up_by_the_batch(board_state):
+    display = layered(board_state)
+    panel = display.display
+    refreshes = panel.refreshes
+    with display.batch():
+        display.hide_layer('high')
+        assert display._batch_group == 'high'
+    assert panel.refreshes == refreshes + 1
+    assert panel.snapshot().pixel(110, 110) == RED
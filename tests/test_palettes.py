@@ -0,0 +1,34 @@
+# Palette reuse in GC9A01_Display
+
+import circuit
+
+
+def test_one_color_shares_one_palette(board_state):
+    display = circuit.GC9A01_Display(False)
+    rectangle = display.draw_rectangle(0, 0, 10, 10, [0xFF0000])
+    circle = display.draw_circle(50, 50, 5, [0xFF0000])
+    polygon = display.draw_polygon([(0, 0), (5, 0), (0, 5)], 20, 20, [0xFF0000])
+    assert rectangle.pixel_shader is circle.pixel_shader is polygon.pixel_shader
+    assert (display.palette_misses, display.palette_hits) == (1, 2)
+    other = display.draw_rectangle(0, 0, 10, 10, [0x00FF00])
+    assert other.pixel_shader is not rectangle.pixel_shader
+    assert other.pixel_shader[0] == 0x00FF00
+
+
+def test_least_recently_used_palette_is_evicted(board_state):
+    display = circuit.GC9A01_Display(False, palettes=2)
+    red = display._palette([0xFF0000])
+    green = display._palette([0x00FF00])
+    # Using red again makes green the oldest
+    assert display._palette([0xFF0000]) is red
+    display._palette([0x0000FF])
+    assert len(display._palettes) == 2
+    assert display._palette([0xFF0000]) is red
+    assert display._palette([0x00FF00]) is not green
+
+
+def test_no_cache_gives_every_shape_its_own(board_state):
+    display = circuit.GC9A01_Display(False, palettes=0)
+    first = display._palette([0xFF0000])
+    assert display._palette([0xFF0000]) is not first
+    assert len(display._palettes) == 0
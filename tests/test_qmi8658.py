@@ -0,0 +1,313 @@
+# The QMI8658 driver against the register model
+
+import pytest
+
+import board
+import circuit
+
+
+# Have the model produce samples on its next bus access
+# imu: the QMI8658Model
+# count: the number of samples
+# returns: nothing
+def produce(imu, count):
+    imu._pending = float(count)
+    imu._advance()
+
+
+# At 31.25 Hz the model's clock hardly adds samples of its own
+# between produce() and the reads
+@pytest.fixture
+def imu(board_state):
+    imu = circuit.QMI8658_Accelerometer(profile='low-power')
+    # The model has no offsets, replace the hand-measured defaults
+    produce(board_state.imu, 1)
+    imu.calibrate(samples=1, keep_gravity=True, save=False)
+    return imu
+
+
+def test_read_sample_is_one_burst(board_state, imu):
+    model = board_state.imu
+    model.accel = [0.25, 0.5, 1.0]
+    model.gyro = [10.0, 20.0, 30.0]
+    model.temperature = 31.5
+    produce(model, 1)
+    reads = model.reads
+    sample = imu.read_sample()
+    assert model.reads == reads + 1
+    assert sample.timestamp == model.counter
+    assert sample.temperature == 31.5
+    assert list(sample.raw) == model.counts(model.physical())
+    assert list(imu.read_raw_xyz()) == list(sample.raw)
+
+
+def test_read_sample_decodes_negative_axes(board_state, imu):
+    model = board_state.imu
+    model.accel = [-0.25, -1.0, -8.0]
+    model.gyro = [-1.0, -512.0, 0.0]
+    model.temperature = -4.25
+    produce(model, 1)
+    sample = imu.read_sample()
+    assert list(sample.raw) == [-1024, -4096, -32768, -64, -32768, 0]
+    assert sample.temperature == -4.25
+
+
+def test_read_xyz_scales_into_the_callers_array(board_state, imu):
+    model = board_state.imu
+    model.accel = [-0.5, 0.0, 1.0]
+    model.gyro = [-32.0, 64.0, 0.0]
+    produce(model, 1)
+    out = circuit.array('f', (0.0,) * 6)
+    assert imu.read_xyz(out) is out
+    assert list(out) == [-0.5, 0.0, 1.0, -32.0, 64.0, 0.0]
+
+
+def test_fifo_drains_samples_in_order(board_state, imu):
+    model = board_state.imu
+    model.accel = [0.0, 0.5, 1.0]
+    imu.fifo_enable(watermark=8, size=16)
+    assert imu.fifo_enabled
+    produce(model, 5)
+    batch = imu.read_fifo()
+    assert 5 <= batch.count <= 16
+    for i in range(batch.count):
+        assert list(batch.raw[i * 6:i * 6 + 3]) == [0, 2048, 4096]
+    for i in range(1, batch.count):
+        assert batch.timestamps[i] == batch.timestamps[i - 1] + 1
+    assert batch.timestamps[batch.count - 1] <= model.counter
+
+
+def test_fifo_stream_mode_keeps_the_newest(board_state, imu):
+    model = board_state.imu
+    imu.fifo_enable(watermark=8, size=16, stream=True)
+    produce(model, 40)
+    counter = model.counter
+    batch = imu.read_fifo()
+    assert batch.count == 16
+    # Only the newest samples are left, up to the read itself
+    assert batch.timestamps[0] >= counter - 15
+
+
+def test_fifo_mode_stops_when_full(board_state, imu):
+    imu.fifo_enable(watermark=8, size=16, stream=False)
+    produce(board_state.imu, 40)
+    assert imu.read_fifo().count == 16
+
+
+def test_fifo_size_must_be_supported(imu):
+    with pytest.raises(Exception):
+        imu.fifo_enable(size=20)
+
+
+def test_fifo_disable(board_state, imu):
+    imu.fifo_enable(watermark=8, size=16)
+    imu.fifo_disable()
+    assert not imu.fifo_enabled
+    produce(board_state.imu, 5)
+    assert board_state.imu.fifo == bytearray()
+
+
+def test_fifo_batch_scales_like_read_xyz(board_state, imu):
+    board_state.imu.accel = [-0.5, 0.25, 1.0]
+    board_state.imu.gyro = [16.0, -8.0, 0.0]
+    imu.fifo_enable(watermark=8, size=16)
+    produce(board_state.imu, 3)
+    batch = imu.read_fifo()
+    out = circuit.array('f', (0.0,) * 6)
+    assert list(imu.batch_xyz(batch, 0, out)) == [-0.5, 0.25, 1.0, 16.0, -8.0, 0.0]
+
+
+def test_data_ready_interrupt(board_state, imu):
+    assert imu.data_ready()
+    imu.interrupt_enable()
+    assert board_state.imu.regs[0x02] & 0x10
+    imu.read_sample()
+    assert not imu.data_ready()
+    produce(board_state.imu, 1)
+    assert imu.data_ready()
+    imu.read_sample()
+    assert not imu.data_ready()
+    imu.interrupt_disable()
+    assert not board_state.imu.regs[0x02] & 0x18
+    assert imu.data_ready()
+
+
+def test_data_ready_falls_back_to_the_pin_level(board_state, imu):
+    # GP24 isn't on a PWM channel B, countio can't count it
+    imu.interrupt_enable()
+    assert imu._int_counter is None
+    assert imu._int_pin is not None
+
+
+def test_fifo_watermark_interrupt(board_state, imu):
+    imu.fifo_enable(watermark=8, size=16)
+    imu.interrupt_enable()
+    assert board_state.imu.regs[0x02] & 0x08
+    # INT1 is on GP23, its edges are counted
+    assert imu._int_counter is not None
+    imu.read_fifo()
+    imu.data_ready()
+    produce(board_state.imu, 4)
+    assert not imu.data_ready()
+    produce(board_state.imu, 4)
+    assert imu.data_ready()
+    assert imu.read_fifo().count >= 8
+
+
+@pytest.mark.parametrize('name, ctrl2, ctrl3', [
+    ('low-power', 0x28, 0x58),
+    ('ui', 0x26, 0x56),
+    ('motion', 0x23, 0x53),
+])
+def test_profiles_write_their_registers(board_state, imu, name, ctrl2, ctrl3):
+    imu.apply_profile(name)
+    regs = board_state.imu.regs
+    assert (regs[0x03], regs[0x04], regs[0x06]) == (ctrl2, ctrl3, 0x11)
+    assert imu.profile == name
+    assert imu._acc_scale == 8 / 32768
+    assert imu._gyro_scale == 512 / 32768
+
+
+def test_configure_ranges_and_filter(board_state, imu):
+    imu.configure(acc_range=2, acc_odr=250, gyro_range=2048, gyro_odr=500, lpf=None)
+    regs = board_state.imu.regs
+    assert (regs[0x03], regs[0x04], regs[0x06]) == (0x05, 0x74, 0x00)
+    assert imu.profile is None
+    imu.configure(lpf=3)
+    assert regs[0x06] == 0x77
+
+
+def test_scale_follows_the_range(board_state, imu):
+    imu.configure(acc_range=2, acc_odr=31.25, gyro_range=2048, gyro_odr=31.25)
+    board_state.imu.accel = [1.5, -0.5, 1.0]
+    board_state.imu.gyro = [1000.0, -2000.0, 0.0]
+    produce(board_state.imu, 1)
+    assert list(imu.read_xyz()) == [1.5, -0.5, 1.0, 1000.0, -2000.0, 0.0]
+    assert list(imu.sample.raw[:3]) == [24576, -8192, 16384]
+
+
+def test_configure_rejects_unsupported_settings(imu):
+    with pytest.raises(Exception):
+        imu.configure(acc_range=3)
+    with pytest.raises(Exception):
+        imu.configure(gyro_range=100)
+    with pytest.raises(Exception):
+        imu.configure(acc_odr=100)
+
+
+def test_wake_on_motion(board_state, imu):
+    model = board_state.imu
+    imu.interrupt_enable()
+    imu.low_power_enable(threshold=100)
+    assert imu.low_power
+    assert imu.interrupt_pin is None
+    # Accelerometer only at the 3 Hz low-power rate
+    assert model.regs[0x08] == 0x01
+    assert model.odr() == 3.0
+    assert model.wom_threshold == 100
+    edges = model.int1.edges
+    # The first sample is the baseline, small changes don't count
+    produce(model, 1)
+    model.accel = [0.05, 0.0, -1.0]
+    produce(model, 1)
+    assert not imu.motion_detected()
+    assert model.int1.edges == edges
+    model.accel = [0.5, 0.0, -1.0]
+    produce(model, 1)
+    assert model.int1.edges == edges + 1
+    assert imu.motion_detected()
+    # STATUS1 clears on read
+    assert not imu.motion_detected()
+
+
+def test_wait_for_motion_times_out(board_state, imu):
+    imu.low_power_enable()
+    assert not imu.wait_for_motion(timeout=0.05)
+
+
+def test_low_power_disable_restores_sampling(board_state, imu):
+    model = board_state.imu
+    imu.fifo_enable(watermark=8, size=16)
+    imu.interrupt_enable()
+    imu.low_power_enable()
+    imu.low_power_disable()
+    assert not imu.low_power
+    assert model.wom_threshold == 0
+    assert (model.regs[0x03], model.regs[0x04], model.regs[0x08]) == (0x28, 0x58, 0x03)
+    assert model.regs[0x14] == imu._fifo_ctrl
+    assert imu.interrupt_pin is board.GP23
+    produce(model, 3)
+    assert imu.read_fifo().count >= 3
+
+
+def at_rest(model):
+    model.accel = [0.01, -0.02, -1.0]
+    model.gyro = [1.0, 2.0, -1.0]
+    produce(model, 1)
+
+
+def test_defaults_without_calibration(board_state):
+    imu = circuit.QMI8658_Accelerometer()
+    assert not imu.calibrated
+    assert tuple(imu._cal) == circuit.QMI8658_Accelerometer.DEFAULT_BIAS
+
+
+def test_calibration_round_trips_through_nvm(board_state):
+    at_rest(board_state.imu)
+    imu = circuit.QMI8658_Accelerometer()
+    assert imu.calibrate(samples=4) == [41, -82, -4096, 64, 128, -64]
+    assert imu.calibrated
+    assert bytes(board_state.nvm[:2]) == circuit.QMI8658_Accelerometer.NVM_MAGIC
+    # A fresh driver picks the offsets up and reads zero at rest
+    imu = circuit.QMI8658_Accelerometer()
+    assert imu.calibrated
+    assert list(imu._cal) == [41, -82, -4096, 64, 128, -64]
+    produce(board_state.imu, 1)
+    assert list(imu.read_xyz()) == [0.0] * 6
+
+
+def test_calibration_can_keep_gravity(board_state):
+    at_rest(board_state.imu)
+    imu = circuit.QMI8658_Accelerometer()
+    assert imu.calibrate(samples=4, keep_gravity=True, save=False) == [41, -82, 0, 64, 128, -64]
+    assert not circuit.QMI8658_Accelerometer().calibrated
+
+
+@pytest.mark.parametrize('data', [
+    b'XX\x01\x02\x05' + bytes(12),
+    b'QC\x02\x02\x05' + bytes(12),
+    bytes(range(17)),
+])
+def test_corrupt_nvm_keeps_the_defaults(board_state, data):
+    board_state.nvm[:len(data)] = data
+    imu = circuit.QMI8658_Accelerometer()
+    assert not imu.calibrated
+    assert tuple(imu._cal) == circuit.QMI8658_Accelerometer.DEFAULT_BIAS
+
+
+def test_offsets_follow_the_range(board_state):
+    at_rest(board_state.imu)
+    imu = circuit.QMI8658_Accelerometer()
+    imu.calibrate(samples=4, save=False)
+    imu.configure(acc_range=2, gyro_range=128)
+    assert list(imu._bias) == [164, -328, -16384, 256, 512, -256]
+
+
+def test_fixed_truncates_towards_zero_like_int(imu):
+    out = circuit.array('i', (0,) * 6)
+    for value in (-32768, -4097, -410, -409, -1, 0, 1, 409, 410, 4097, 32767):
+        raw = circuit.array('h', (value,) * 6)
+        imu._fixed(raw, out)
+        acc = int(value * imu._acc_scale * 10)
+        gyro = int(value * imu._gyro_scale)
+        assert list(out) == [acc] * 3 + [gyro] * 3
+    # A count short of a unit is 0, not -1 as a shift would floor it
+    imu._fixed(circuit.array('h', (-1,) * 6), out)
+    assert list(out) == [0] * 6
+
+
+def test_read_fixed_against_the_model(board_state, imu):
+    board_state.imu.accel = [-0.55, 0.25, 1.0]
+    board_state.imu.gyro = [-3.5, 100.25, 0.0]
+    produce(board_state.imu, 1)
+    assert list(imu.read_fixed()) == [-5, 2, 10, -3, 100, 0]
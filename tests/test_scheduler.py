@@ -0,0 +1,90 @@
+# Scheduler and the wsRP2040128 loop that runs it
+
+import time
+
+import pytest
+
+import circuit
+from circuit import Scheduler
+
+
+# A scheduler with tasks that record when they ran
+# returns: the scheduler, the log of names and a time they're all
+#          due at
+def scheduler_with(*tasks):
+    scheduler = Scheduler()
+    log = []
+    for name, period in tasks:
+        scheduler.add(name, period, lambda name=name: log.append(name))
+    return scheduler, log, time.monotonic()
+
+
+def test_new_tasks_are_due_straight_away():
+    scheduler, log, start = scheduler_with(('a', 0.1), ('b', 0.5))
+    assert len(scheduler) == 2
+    next_due = scheduler.run_due(start)
+    assert log == ['a', 'b']
+    assert next_due == pytest.approx(start + 0.1, abs=0.01)
+
+
+def test_only_due_tasks_run():
+    scheduler, log, start = scheduler_with(('a', 0.1), ('b', 0.5))
+    scheduler.run_due(start)
+    del log[:]
+    scheduler.run_due(start + 0.05)
+    assert log == []
+    scheduler.run_due(start + 0.15)
+    assert log == ['a']
+    scheduler.run_due(start + 0.6)
+    assert log == ['a', 'a', 'b']
+
+
+def test_on_time_tasks_keep_their_phase():
+    scheduler, log, start = scheduler_with(('a', 0.1))
+    scheduler.run_due(start)
+    assert scheduler.run_due(start + 0.12) == pytest.approx(start + 0.2)
+
+
+def test_overrun_reschedules_without_catching_up():
+    scheduler, log, start = scheduler_with(('a', 0.1))
+    scheduler.run_due(start)
+    # Ten periods late, the task runs once and is due a period on
+    next_due = scheduler.run_due(start + 1.0)
+    assert log == ['a', 'a']
+    assert next_due == pytest.approx(start + 1.1)
+    scheduler.run_due(start + 1.05)
+    assert log == ['a', 'a']
+
+
+def test_set_period_reschedules_the_next_run():
+    scheduler, log, start = scheduler_with(('a', 0.1))
+    scheduler.run_due(start)
+    scheduler.set_period('a', 0.5)
+    assert scheduler.period('a') == 0.5
+    assert scheduler.run_due(start + 0.2) == pytest.approx(start + 0.5)
+    assert log == ['a']
+    with pytest.raises(Exception):
+        scheduler.set_period('a', 0)
+
+
+def test_remove_and_replace():
+    scheduler, log, start = scheduler_with(('a', 0.1), ('b', 0.1))
+    scheduler.remove('a')
+    scheduler.add('b', 0.2, lambda: log.append('c'))
+    assert len(scheduler) == 1
+    assert scheduler.period('b') == 0.2
+    scheduler.run_due(time.monotonic())
+    assert log == ['c']
+    assert Scheduler().run_due() is None
+
+
+def test_run_for_runs_tasks_at_their_rate(board_state):
+    hardware = circuit.wsRP2040128(initBattery=False)
+    log = []
+    hardware.scheduler.add('count', 0.02, lambda: log.append(time.monotonic()))
+    hardware.run_for(0.1)
+    assert 4 <= len(log) <= 7
+    hardware.scheduler.set_period('count', 10)
+    del log[:]
+    hardware.run_for(0)
+    assert log == []